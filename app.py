@@ -1,6 +1,8 @@
 from social_media_application import create_app
 import os
-app = create_app()
 
+# the app is only built when run: the password hashing processes import
+# this module again, as __mp_main__
 if __name__ == "__main__":
+    app = create_app()
     app.run(debug=eval(os.environ.get("DEBUG")))
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Measures what response compression costs and saves on list payloads shaped
+like /posts: compressed size and per-response CPU time of each available
+coding and level, for several response sizes.
+
+    python benchmarks/compression.py --sizes 10,100,1000 --repeat 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from social_media_application.helpers.compression import CODINGS  # noqa: E402
+
+
+def payload(posts):
+    now = datetime(2026, 1, 1)
+    rows = [
+        {
+            "archive": False,
+            "content": "lorem ipsum dolor sit amet " * 4,
+            "creator": str(uuid.uuid4()),
+            "id": str(uuid.uuid4()),
+            "post_type": "text",
+            "pub_date": (now - timedelta(minutes=i)).isoformat(),
+            "tags": "text,hashtag,user{}".format(i % 50),
+            "title": "post number {}".format(i),
+            "url": None,
+        }
+        for i in range(posts)
+    ]
+    return json.dumps(rows, sort_keys=True, separators=(",", ":")).encode()
+
+
+def compress(coding, level, data):
+    compressor = CODINGS[coding](level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="10,100,1000", help="posts per response")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    levels = {"gzip": (1, 5, 9), "br": (1, 4, 11), "zstd": (1, 3, 9)}
+
+    print("codings available: {}".format(", ".join(CODINGS)))
+    print(
+        "{:>7}{:>10}{:>8}{:>7}{:>11}{:>9}{:>11}".format(
+            "posts", "bytes", "coding", "level", "compressed", "ratio", "p50 us"
+        )
+    )
+    for posts in (int(size) for size in args.sizes.split(",")):
+        data = payload(posts)
+        for coding in CODINGS:
+            for level in levels[coding]:
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    compressed = compress(coding, level, data)
+                    timings.append(time.perf_counter() - start)
+                print(
+                    "{:>7}{:>10}{:>8}{:>7}{:>11}{:>9.1f}{:>11.0f}".format(
+                        posts,
+                        len(data),
+                        coding,
+                        level,
+                        len(compressed),
+                        len(data) / len(compressed),
+                        statistics.median(timings) * 1e6,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
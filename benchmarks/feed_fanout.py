@@ -0,0 +1,122 @@
+"""
+Compares pure push, pure pull and hybrid feed strategies on a synthetic,
+skewed connection graph.
+
+Timelines and post lists are kept in memory, so the numbers measure the
+work each strategy does (rows written per post, index seeks and rows read
+per feed page) rather than database latency. Feed pages are merged with the
+same k-way merge the application uses.
+
+    python benchmarks/feed_fanout.py --users 20000 --edges 200000 --threshold 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from social_media_application.helpers.feed import merge_runs  # noqa: E402
+
+
+def skewed_graph(users, edges, skew, rng):
+    """Undirected graph whose degrees follow a Zipf-like distribution."""
+    weights = [1.0 / (rank + 1) ** skew for rank in range(users)]
+    ends = rng.choices(range(users), weights=weights, k=edges * 2)
+    graph = defaultdict(set)
+    for a, b in zip(ends[::2], ends[1::2]):
+        if a != b:
+            graph[a].add(b)
+            graph[b].add(a)
+    return graph
+
+
+def simulate(graph, users, posts, page_size, threshold, rng):
+    pulled = {u for u in range(users) if len(graph[u]) > threshold}
+    timelines = defaultdict(list)
+    by_author = defaultdict(list)
+    written = worst = 0
+    start = time.perf_counter()
+    now = datetime(2026, 1, 1)
+    for i in range(posts):
+        author = rng.randrange(users)
+        entry = (now + timedelta(seconds=i), uuid.uuid4(), author)
+        by_author[author].append(entry)
+        if author not in pulled:
+            for reader in graph[author]:
+                timelines[reader].append(entry)
+            written += len(graph[author])
+            worst = max(worst, len(graph[author]))
+    write_time = time.perf_counter() - start
+
+    readers = rng.sample(range(users), min(users, 2000))
+    seeks = rows = 0
+    start = time.perf_counter()
+    for reader in readers:
+        runs = [timelines[reader][: -page_size - 2 : -1]]
+        seeks += 1
+        for author in graph[reader] & pulled:
+            runs.append(by_author[author][: -page_size - 2 : -1])
+            seeks += 1
+        rows += sum(len(run) for run in runs)
+        merge_runs(runs, page_size + 1)
+    read_time = time.perf_counter() - start
+    return {
+        "rows written / post": written / posts,
+        "max rows / post": worst,
+        "seeks / read": seeks / len(readers),
+        "rows scanned / read": rows / len(readers),
+        "write ms (total)": write_time * 1000,
+        "read us / page": read_time / len(readers) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--edges", type=int, default=200000)
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--threshold", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    graph = skewed_graph(args.users, args.edges, args.skew, random.Random(args.seed))
+    degrees = sorted((len(graph[u]) for u in range(args.users)), reverse=True)
+    print(
+        "users={} edges={} max degree={} median degree={} above threshold={}".format(
+            args.users,
+            sum(degrees) // 2,
+            degrees[0],
+            degrees[len(degrees) // 2],
+            sum(1 for d in degrees if d > args.threshold),
+        )
+    )
+    strategies = {
+        "push": args.users + 1,  # nobody is above the threshold
+        "pull": -1,  # everybody is above the threshold
+        "hybrid": args.threshold,
+    }
+    results = {
+        name: simulate(
+            graph, args.users, args.posts, args.page_size, threshold,
+            random.Random(args.seed),
+        )
+        for name, threshold in strategies.items()
+    }
+    metrics = list(next(iter(results.values())))
+    print("{:<22}".format("") + "".join("{:>14}".format(n) for n in results))
+    for metric in metrics:
+        print(
+            "{:<22}".format(metric)
+            + "".join("{:>14.1f}".format(results[n][metric]) for n in results)
+        )
+
+
+if __name__ == "__main__":
+    main()
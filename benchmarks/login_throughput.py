@@ -0,0 +1,112 @@
+"""
+Measures login throughput and the latency of cheap requests while bcrypt
+runs inline on the request threads versus on the password hasher's process pool.
+
+Each client thread loops over password verifications, as /login does; a probe
+thread meanwhile times a small pure Python task standing in for a request that
+does not hash, to show how much hashing slows down the rest of the worker.
+
+    python benchmarks/login_throughput.py --clients 16 --rounds 12 --seconds 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from social_media_application.helpers.hashing import (  # noqa: E402
+    HashingBusy,
+    PasswordHasher,
+)
+
+
+def probe_task():
+    return sum(i * i for i in range(2000))
+
+
+def run(hasher, password_hash, clients, seconds):
+    stop = threading.Event()
+    logins = []
+    rejected = []
+    probes = []
+
+    def client():
+        done = busy = 0
+        while not stop.is_set():
+            try:
+                hasher.verify("Test@Abcd", password_hash)
+                done += 1
+            except HashingBusy:
+                busy += 1
+        logins.append(done)
+        rejected.append(busy)
+
+    def probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            probe_task()
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    probes.sort()
+    return {
+        "logins / s": sum(logins) / elapsed,
+        "rejected / s": sum(rejected) / elapsed,
+        "probe p50 ms": statistics.median(probes) * 1000,
+        "probe p99 ms": probes[int(len(probes) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    max_concurrency = args.max_concurrency or 2 * max(args.workers, 1)
+
+    password_hash = PasswordHasher(args.rounds, 0, 1, 1).hash("Test@Abcd")
+    hashers = {
+        "inline": PasswordHasher(args.rounds, 0, args.clients, args.timeout),
+        "pool": PasswordHasher(
+            args.rounds, args.workers, max_concurrency, args.timeout
+        ),
+    }
+    print(
+        "clients={} rounds={} workers={} max concurrency={}".format(
+            args.clients, args.rounds, args.workers, max_concurrency
+        )
+    )
+    results = {}
+    for name, hasher in hashers.items():
+        # start the pool outside of the measured window
+        hasher.verify("Test@Abcd", password_hash)
+        results[name] = run(hasher, password_hash, args.clients, args.seconds)
+        hasher.shutdown()
+    metrics = list(next(iter(results.values())))
+    print("{:<16}".format("") + "".join("{:>12}".format(n) for n in results))
+    for metric in metrics:
+        print(
+            "{:<16}".format(metric)
+            + "".join("{:>12.1f}".format(results[n][metric]) for n in results)
+        )
+
+
+if __name__ == "__main__":
+    main()
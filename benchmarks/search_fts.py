@@ -0,0 +1,163 @@
+"""
+Compares the former search queries (tags LIKE '%tag%', title equality) and
+a content LIKE scan with the full text search of /search?q= on a synthetic
+corpus of posts in PostgreSQL, answered by both search backends (Postgres
+full text search, in-process inverted index).
+
+The corpus is written into the post table of the given database, which must
+be a scratch database (the tables are created if missing). Posts are made of
+words drawn from a small vocabulary with a skewed frequency, and only
+generated once: later runs reuse them.
+
+    python benchmarks/search_fts.py --db-uri postgresql://user:pw@localhost/bench --posts 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text  # noqa: E402
+
+from social_media_application import create_app, db  # noqa: E402
+from social_media_application.models import Post  # noqa: E402
+from social_media_application.helpers.search import (  # noqa: E402
+    SQLSearchBackend,
+    IndexSearchBackend,
+)
+
+VOCABULARY = (
+    "alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima "
+    "mike november oscar papa quebec romeo sierra tango uniform victor whiskey "
+    "xray yankee zulu amber basil cedar dune ember fern granite harbor iris "
+    "jasper kelp lagoon meadow nectar orchid pebble quartz river sage tundra"
+).split()
+
+
+def populate(count, batch):
+    existing = db.session.execute(db.select(db.func.count(Post.id))).scalar()
+    if existing >= count:
+        return existing
+    db.session.execute(
+        text(
+            "INSERT INTO \"user\" (id, email, password_hash, username, archive, token_version, posts_version, pull_posts) "
+            "VALUES (gen_random_uuid(), 'bench@example.com', 'x', 'bench', false, 0, 0, false) "
+            "ON CONFLICT DO NOTHING"
+        )
+    )
+    db.session.execute(
+        text(
+            "INSERT INTO posttype (id, name) VALUES (gen_random_uuid(), 'text') "
+            "ON CONFLICT DO NOTHING"
+        )
+    )
+    # words are picked with probability decreasing with their rank (skew),
+    # the correlated g % 1 keeps the subqueries evaluated once per row
+    words = (
+        "(SELECT string_agg((:words)[1 + floor(power(random(), 2) * :size)::int], ' ') "
+        "FROM generate_series(1, {} + g % 1))"
+    )
+    for start in range(existing, count, batch):
+        db.session.execute(
+            text(
+                "INSERT INTO post (id, creator, title, content, tags, pub_date, post_type, archive) "
+                "SELECT gen_random_uuid(), (SELECT id FROM \"user\" WHERE username = 'bench'), "
+                "{}, {}, replace({}, ' ', ','), "
+                "now() - random() * interval '365 days', 'text', false "
+                "FROM generate_series(:start, :stop) AS g".format(
+                    words.format(4), words.format(40), words.format(3)
+                )
+            ),
+            {
+                "words": VOCABULARY,
+                "size": len(VOCABULARY),
+                "start": start,
+                "stop": min(start + batch, count) - 1,
+            },
+        )
+        db.session.commit()
+        print("  {} posts".format(min(start + batch, count)), flush=True)
+    db.session.execute(text("ANALYZE post"))
+    db.session.commit()
+    return count
+
+
+def measure(fn, repeat):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db-uri", required=True)
+    parser.add_argument("--posts", type=int, default=1000000)
+    parser.add_argument("--batch", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app(db_uri=args.db_uri)
+    with app.app_context():
+        db.create_all()
+        count = populate(args.posts, args.batch)
+        title = db.session.execute(db.select(Post.title).limit(1)).scalar()
+        common, rare = VOCABULARY[0], VOCABULARY[-1]
+        sql = SQLSearchBackend()
+        index = IndexSearchBackend()
+        start = time.perf_counter()
+        index.rebuild()
+        print("index built in {:.1f}s".format(time.perf_counter() - start))
+
+        cases = {
+            "tag LIKE (common)": lambda: len(
+                Post.query.filter(Post.tags.like("%" + common + "%")).all()
+            ),
+            "tag LIKE (rare)": lambda: len(
+                Post.query.filter(Post.tags.like("%" + rare + "%")).all()
+            ),
+            "title equality": lambda: len(
+                Post.query.filter(Post.title == title).all()
+            ),
+            "content LIKE, page": lambda: len(
+                Post.query.filter(Post.content.like("%" + rare + "%"))
+                .order_by(Post.pub_date.desc())
+                .limit(args.limit)
+                .all()
+            ),
+            "sql (common), page": lambda: len(
+                sql.rank_posts(common, datetime.utcnow(), args.limit)
+            ),
+            "sql (rare), page": lambda: len(
+                sql.rank_posts(rare, datetime.utcnow(), args.limit)
+            ),
+            "sql (two words), page": lambda: len(
+                sql.rank_posts("{} {}".format(rare, common), datetime.utcnow(), args.limit)
+            ),
+            "index (common), page": lambda: len(
+                index.rank_posts(common, datetime.utcnow(), args.limit)
+            ),
+            "index (rare), page": lambda: len(
+                index.rank_posts(rare, datetime.utcnow(), args.limit)
+            ),
+            "index (two words), page": lambda: len(
+                index.rank_posts("{} {}".format(rare, common), datetime.utcnow(), args.limit)
+            ),
+        }
+        print("posts={} (median of {})".format(count, args.repeat))
+        print("{:<24}{:>12}{:>10}".format("", "ms", "rows"))
+        for name, fn in cases.items():
+            elapsed, rows = measure(fn, args.repeat)
+            db.session.rollback()
+            print("{:<24}{:>12.1f}{:>10}".format(name, elapsed * 1000, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Compares the cost of rendering large list responses with marshmallow +
+Flask's default JSON provider against the compiled schemas + orjson provider,
+and checks that both produce the same bytes.
+
+Rows are transient model instances, no database is involved.
+
+    python benchmarks/serialization.py --rows 5000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from marshmallow import Schema  # noqa: E402
+
+from social_media_application.helpers.hashing import PasswordHasher  # noqa: E402
+from social_media_application.helpers.json_provider import ORJSONProvider  # noqa: E402
+from social_media_application.helpers.loader import usernames  # noqa: E402
+from social_media_application.models import (  # noqa: E402
+    Connection,
+    Notification,
+    Post,
+    Profile,
+    User,
+)
+from social_media_application.serializers import (  # noqa: E402
+    connections_schema,
+    notifications_schema,
+    posts_schema,
+    users_schema,
+)
+
+
+def make_rows(count):
+    now = datetime(2026, 1, 1)
+    users = []
+    for i in range(count):
+        user = User(
+            email="user{}@example.com".format(i),
+            password="secret",
+            username="user{}".format(i),
+        )
+        user.id = uuid.uuid4()
+        user.profile = Profile(
+            user=user.id,
+            first_name="First {}".format(i),
+            last_name="Last",
+            bio="bio of user {}".format(i),
+            profile_pic="https://example.com/{}.png".format(i),
+        )
+        users.append(user)
+    posts = [
+        Post(
+            id=uuid.uuid4(),
+            creator=users[i].id,
+            title="post {}".format(i),
+            url="https://example.com/posts/{}".format(i),
+            content="content " * 20,
+            tags="a,b,c",
+            pub_date=now - timedelta(minutes=i),
+            post_type="text",
+            archive=False,
+        )
+        for i in range(count)
+    ]
+    connections = []
+    notifications = []
+    for i in range(count):
+        connection = Connection(users[i].id, users[(i + 1) % count].id, True)
+        connection.id = uuid.uuid4()
+        connections.append(connection)
+        notification = Notification(users[i].id, "message {}".format(i))
+        notification.id = uuid.uuid4()
+        notifications.append(notification)
+    return users, {
+        "posts": (posts_schema, posts),
+        "users": (users_schema, users),
+        "connections": (connections_schema, connections),
+        "notifications": (notifications_schema, notifications),
+    }
+
+
+def measure(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = Flask("baseline")
+    baseline.json = DefaultJSONProvider(baseline)
+    fast = Flask("fast")
+    fast.json = ORJSONProvider(fast)
+    for app in (baseline, fast):
+        app.extensions["password_hasher"] = PasswordHasher(4, 0, 1, 1)
+
+    with fast.app_context():
+        users, cases = make_rows(args.rows)
+
+    def marshmallow_dump(schema, rows):
+        # the generic Schema.dump the compiled schemas replace (nested
+        # profiles are still dumped by the compiled ProfileSchema)
+        return Schema.dump(schema, rows, many=True)
+
+    def compiled_dump(schema, rows):
+        return schema.dump(rows)
+
+    print("rows={} (best of {})".format(args.rows, args.repeat))
+    print("{:<16}{:>14}{:>14}{:>10}".format("", "baseline ms", "fast ms", "speedup"))
+    for name, (schema, rows) in cases.items():
+        results = {}
+        timings = {}
+        for label, app, dump in (
+            ("baseline", baseline, marshmallow_dump),
+            ("fast", fast, compiled_dump),
+        ):
+
+            def run():
+                with app.test_request_context():
+                    loader = usernames()
+                    for user in users:
+                        loader.prime(user.id, user.username)
+                    results[label] = app.json.response(dump(schema, rows)).get_data()
+
+            timings[label] = measure(run, args.repeat)
+        if results["baseline"] != results["fast"]:
+            sys.exit("{}: outputs differ".format(name))
+        print(
+            "{:<16}{:>14.1f}{:>14.1f}{:>9.1f}x".format(
+                name,
+                timings["baseline"] * 1000,
+                timings["fast"] * 1000,
+                timings["baseline"] / timings["fast"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""revoked tokens stored by jti or token hash, with their expiry
+
+Revision ID: e93f1b7a5c20
+Revises: c4e81a93d2b7
+Create Date: 2026-10-18 15:21:09.774410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e93f1b7a5c20'
+down_revision = 'c4e81a93d2b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('blacklist_tokens', sa.Column('jti', sa.String(length=64), nullable=True))
+    op.add_column('blacklist_tokens', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    # tokens issued before the jti claim are keyed by their sha256,
+    # they were valid for one day at most
+    op.execute(
+        "UPDATE blacklist_tokens "
+        "SET jti = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+        "expires_at = blacklisted_on + interval '1 day'"
+    )
+    op.alter_column('blacklist_tokens', 'jti', nullable=False)
+    op.alter_column('blacklist_tokens', 'expires_at', nullable=False)
+    op.create_unique_constraint('blacklist_tokens_jti_key', 'blacklist_tokens', ['jti'])
+    op.create_index(op.f('ix_blacklist_tokens_expires_at'), 'blacklist_tokens', ['expires_at'], unique=False)
+    op.drop_constraint('blacklist_tokens_token_key', 'blacklist_tokens', type_='unique')
+    op.drop_column('blacklist_tokens', 'token')
+
+
+def downgrade():
+    # revoked tokens cannot be recovered from their hash, the jti is kept in their place
+    op.add_column('blacklist_tokens', sa.Column('token', sa.VARCHAR(length=500), nullable=True))
+    op.execute("UPDATE blacklist_tokens SET token = jti")
+    op.alter_column('blacklist_tokens', 'token', nullable=False)
+    op.create_unique_constraint('blacklist_tokens_token_key', 'blacklist_tokens', ['token'])
+    op.drop_index(op.f('ix_blacklist_tokens_expires_at'), table_name='blacklist_tokens')
+    op.drop_constraint('blacklist_tokens_jti_key', 'blacklist_tokens', type_='unique')
+    op.drop_column('blacklist_tokens', 'expires_at')
+    op.drop_column('blacklist_tokens', 'jti')
@@ -2,9 +2,17 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 import os
+import json
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from flask_migrate import Migrate
 
+from social_media_application.helpers.cache import TTLCache
+from social_media_application.helpers.object_cache import make_object_cache
+from social_media_application.helpers.revocation import RevocationFilter
+from social_media_application.helpers.hashing import PasswordHasher
+from social_media_application.helpers.json_provider import ORJSONProvider
+from social_media_application.helpers.compression import CompressionMiddleware
+
 
 db = SQLAlchemy()
 ma = Marshmallow()
@@ -14,12 +22,103 @@ db_uri = os.environ.get("DB_URL")
 def create_app(db_uri=db_uri):
     """Construct the core application."""
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     # Configs
     app.config['SECRET_KEY'] = os.environ.get("SECRET_KEY")
     app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
     app.config['SQLALCHEMY_COMMIT_ON_TEARDOWN'] = True
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # For not complaining in the console
-    app.wsgi_app = DispatcherMiddleware(app.wsgi_app,{"/api":app})
+    app.config['FEED_PAGE_SIZE'] = int(os.environ.get("FEED_PAGE_SIZE", 20))
+    app.config['FEED_MAX_PAGE_SIZE'] = int(os.environ.get("FEED_MAX_PAGE_SIZE", 100))
+    app.config['FEED_FANOUT_THRESHOLD'] = int(os.environ.get("FEED_FANOUT_THRESHOLD", 1000))
+    # ranked feed (/feed?mode=ranked) scoring
+    app.config['FEED_RANK_CANDIDATES'] = int(os.environ.get("FEED_RANK_CANDIDATES", 500))
+    app.config['FEED_RANK_RECENCY_WEIGHT'] = float(os.environ.get("FEED_RANK_RECENCY_WEIGHT", 1.0))
+    app.config['FEED_RANK_RECENCY_HALF_LIFE'] = float(os.environ.get("FEED_RANK_RECENCY_HALF_LIFE", 24))  # hours
+    app.config['FEED_RANK_AFFINITY_WEIGHT'] = float(os.environ.get("FEED_RANK_AFFINITY_WEIGHT", 0.5))
+    app.config['FEED_RANK_AFFINITY_DAYS'] = float(os.environ.get("FEED_RANK_AFFINITY_DAYS", 30))
+    app.config['FEED_RANK_POST_TYPE_WEIGHTS'] = json.loads(os.environ.get("FEED_RANK_POST_TYPE_WEIGHTS", "{}"))
+    # lifetime in seconds of access tokens, and of the refresh tokens exchanged at /token/refresh
+    app.config['ACCESS_TOKEN_TTL'] = int(os.environ.get("ACCESS_TOKEN_TTL", 15 * 60))
+    app.config['REFRESH_TOKEN_TTL'] = int(os.environ.get("REFRESH_TOKEN_TTL", 14 * 24 * 3600))
+    # most posts accepted by one POST /posts/bulk request
+    app.config['POST_BULK_MAX_SIZE'] = int(os.environ.get("POST_BULK_MAX_SIZE", 500))
+    # hours after which the full text relevance of a post (/search?q=) is halved
+    app.config['SEARCH_RECENCY_HALF_LIFE'] = float(os.environ.get("SEARCH_RECENCY_HALF_LIFE", 7 * 24))
+    # users suggested by /search/users unless limit asks otherwise, and the largest limit accepted
+    app.config['SEARCH_USERS_LIMIT'] = int(os.environ.get("SEARCH_USERS_LIMIT", 10))
+    app.config['SEARCH_USERS_MAX_LIMIT'] = int(os.environ.get("SEARCH_USERS_MAX_LIMIT", 50))
+    # engine answering /search?q=: "sql" (Postgres full text search) or "index" (in-process
+    # inverted index), its snapshot file (flask search-index), and the seconds between two
+    # refreshes of the index from the post table
+    app.config['SEARCH_BACKEND'] = os.environ.get("SEARCH_BACKEND", "sql")
+    app.config['SEARCH_INDEX_PATH'] = os.environ.get("SEARCH_INDEX_PATH")
+    app.config['SEARCH_INDEX_REFRESH'] = float(os.environ.get("SEARCH_INDEX_REFRESH", 30))
+    # bytes of serialized /search responses cached, 0 disables the cache, and the seconds
+    # an entry is served for at most (bounds the recency drift of /search?q= rankings)
+    app.config['SEARCH_CACHE_BYTES'] = int(os.environ.get("SEARCH_CACHE_BYTES", 16 * 1024 * 1024))
+    app.config['SEARCH_CACHE_TTL'] = float(os.environ.get("SEARCH_CACHE_TTL", 60))
+    # rows per page of the list endpoints (?limit=, ?cursor=), and the largest limit accepted
+    app.config['PAGE_SIZE'] = int(os.environ.get("PAGE_SIZE", 100))
+    app.config['MAX_PAGE_SIZE'] = int(os.environ.get("MAX_PAGE_SIZE", 1000))
+    # rows fetched per round trip when a list is streamed (?stream=true, Accept: application/x-ndjson)
+    app.config['STREAM_BATCH_SIZE'] = int(os.environ.get("STREAM_BATCH_SIZE", 500))
+    # seconds a decoded token -> user is cached across requests, 0 disables the cache
+    app.config['AUTH_CACHE_TTL'] = float(os.environ.get("AUTH_CACHE_TTL", 0))
+    app.config['AUTH_CACHE_SIZE'] = int(os.environ.get("AUTH_CACHE_SIZE", 10000))
+    app.extensions['principal_cache'] = TTLCache(
+        app.config['AUTH_CACHE_SIZE'], app.config['AUTH_CACHE_TTL']
+    )
+    # read-through cache of GET /posts/<id> and /users/<id> bodies: seconds they are cached for
+    # (0 disables it), entries kept per worker, and the shared backend keeping workers consistent
+    # (redis://host:port/db), with which a worker keeps entries to itself OBJECT_CACHE_LOCAL_TTL seconds
+    app.config['OBJECT_CACHE_TTL'] = float(os.environ.get("OBJECT_CACHE_TTL", 60))
+    app.config['OBJECT_CACHE_SIZE'] = int(os.environ.get("OBJECT_CACHE_SIZE", 10000))
+    app.config['OBJECT_CACHE_URL'] = os.environ.get("OBJECT_CACHE_URL")
+    app.config['OBJECT_CACHE_LOCAL_TTL'] = float(os.environ.get(
+        "OBJECT_CACHE_LOCAL_TTL", 1 if app.config['OBJECT_CACHE_URL'] else app.config['OBJECT_CACHE_TTL']
+    ))
+    app.extensions['object_cache'] = make_object_cache(app.config)
+    # revoked tokens filter, refreshed from blacklist_tokens every REVOCATION_FILTER_REFRESH seconds
+    app.config['REVOCATION_FILTER_CAPACITY'] = int(os.environ.get("REVOCATION_FILTER_CAPACITY", 100000))
+    app.config['REVOCATION_FILTER_REFRESH'] = float(os.environ.get("REVOCATION_FILTER_REFRESH", 5))
+    # bcrypt cost, and the process pool hashing passwords off the request threads
+    app.config['BCRYPT_ROUNDS'] = int(os.environ.get("BCRYPT_ROUNDS", 12))
+    # the cpus are shared by the WEB_CONCURRENCY web server processes, each having its own pool
+    app.config['BCRYPT_WORKERS'] = int(os.environ.get(
+        "BCRYPT_WORKERS", max(1, (os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY", 1)))
+    ))
+    app.config['BCRYPT_MAX_CONCURRENCY'] = int(
+        os.environ.get("BCRYPT_MAX_CONCURRENCY", 2 * max(app.config['BCRYPT_WORKERS'], 1))
+    )
+    app.config['BCRYPT_TIMEOUT'] = float(os.environ.get("BCRYPT_TIMEOUT", 10))
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['BCRYPT_ROUNDS'],
+        app.config['BCRYPT_WORKERS'],
+        app.config['BCRYPT_MAX_CONCURRENCY'],
+        app.config['BCRYPT_TIMEOUT'],
+    )
+    # response compression, codings in preference order (zstd and br only when installed)
+    app.config['COMPRESS_ENCODINGS'] = os.environ.get("COMPRESS_ENCODINGS", "zstd,br,gzip").split(",")
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get("COMPRESS_LEVEL", 5))  # gzip
+    app.config['COMPRESS_BR_LEVEL'] = int(os.environ.get("COMPRESS_BR_LEVEL", 4))
+    app.config['COMPRESS_ZSTD_LEVEL'] = int(os.environ.get("COMPRESS_ZSTD_LEVEL", 3))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))  # bytes
+    app.config['COMPRESS_MIMETYPES'] = os.environ.get(
+        "COMPRESS_MIMETYPES",
+        "application/json,application/x-ndjson,text/html,text/plain,text/css,text/javascript",
+    ).split(",")
+    app.wsgi_app = CompressionMiddleware(
+        DispatcherMiddleware(app.wsgi_app,{"/api":app}),
+        app.config['COMPRESS_ENCODINGS'],
+        {
+            "gzip": app.config['COMPRESS_LEVEL'],
+            "br": app.config['COMPRESS_BR_LEVEL'],
+            "zstd": app.config['COMPRESS_ZSTD_LEVEL'],
+        },
+        app.config['COMPRESS_MIMETYPES'],
+        app.config['COMPRESS_MIN_SIZE'],
+    )
     
     db.init_app(app)
     Migrate(app,db)
@@ -27,5 +126,24 @@ def create_app(db_uri=db_uri):
 
     with app.app_context():
         from . import views  # Import routes
+        from . import commands  # Register cli commands
         db.create_all()  # Create sql tables for our data models
+        from .models import BlacklistToken
+
+        app.extensions['revocation_filter'] = RevocationFilter(
+            app.config['REVOCATION_FILTER_CAPACITY'],
+            app.config['REVOCATION_FILTER_REFRESH'],
+            BlacklistToken.revoked_since,
+        )
+        app.extensions['revocation_filter'].refresh()  # warm it up
+
+        from .helpers.search import make_search_backend
+
+        app.extensions['search_backend'] = make_search_backend(app.config)
+        if app.config['SEARCH_CACHE_BYTES']:
+            from .helpers.search_cache import SearchCache
+
+            app.extensions['search_cache'] = SearchCache(
+                app.config['SEARCH_CACHE_BYTES'], app.config['SEARCH_CACHE_TTL']
+            )
     return app
@@ -0,0 +1,40 @@
+import click
+from flask import current_app as app
+
+from social_media_application.models import db, BlacklistToken
+from social_media_application.helpers.feed import backfill_timelines
+from social_media_application.helpers.search import IndexSearchBackend
+
+
+@app.cli.command("backfill-timeline")
+def backfill_timeline():
+    """
+    Rebuilds the materialized feed timelines from existing connections and posts
+    """
+    written = backfill_timelines()
+    db.session.commit()
+    click.echo("{} timeline entries written".format(written))
+
+
+@app.cli.command("purge-revoked-tokens")
+@click.option("--batch-size", default=1000, show_default=True)
+def purge_revoked_tokens(batch_size):
+    """
+    Deletes the blacklisted tokens that expired, in batches
+    """
+    deleted = BlacklistToken.purge_expired(batch_size)
+    click.echo("{} expired tokens purged".format(deleted))
+
+
+@app.cli.command("search-index")
+@click.option("--path", default=None, help="snapshot file, SEARCH_INDEX_PATH by default")
+def search_index(path):
+    """
+    Rebuilds the snapshot of the full text search index (SEARCH_BACKEND=index)
+    from the post table; running workers load it at their next refresh
+    """
+    path = path or app.config["SEARCH_INDEX_PATH"]
+    if not path:
+        raise click.UsageError("no --path given and SEARCH_INDEX_PATH is not set")
+    indexed = IndexSearchBackend(path).rebuild()
+    click.echo("{} posts indexed into {}".format(indexed, path))
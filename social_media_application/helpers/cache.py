@@ -0,0 +1,298 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread safe, size bounded LRU mapping whose entries expire ttl seconds
+    after they were set
+    """
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for key, or default when missing or expired
+        :param key: hashable
+        :param default: object
+        :return: object
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= self.timer():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores value for key, evicting the least recently used entry when full
+        :param key: hashable
+        :param value: object
+        :param ttl: float, overrides the cache ttl for this entry
+        """
+        with self._lock:
+            self._data[key] = (self.timer() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Removes key and returns its value
+        :param key: hashable
+        :param default: object
+        :return: object
+        """
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def discard_where(self, predicate):
+        """
+        Removes every entry whose value matches predicate
+        :param predicate: callable
+        :return: int, number of entries removed
+        """
+        with self._lock:
+            keys = [k for k, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _FrequencySketch:
+    """
+    Count-min sketch estimating how often keys were seen, with 4 bit counters
+    halved every `sample_size` increments so that old popularity fades
+    """
+
+    DEPTH = 4
+    SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+
+    def __init__(self, width):
+        self.width = width
+        self.sample_size = 10 * width
+        self.additions = 0
+        self._counters = [bytearray(width) for _ in range(self.DEPTH)]
+
+    def _slots(self, key):
+        h = hash(key) & 0xFFFFFFFF
+        return [(((h * seed) & 0xFFFFFFFF) >> 8) % self.width for seed in self.SEEDS]
+
+    def frequency(self, key):
+        return min(row[slot] for row, slot in zip(self._counters, self._slots(key)))
+
+    def increment(self, key):
+        for row, slot in zip(self._counters, self._slots(key)):
+            if row[slot] < 15:
+                row[slot] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            for i, row in enumerate(self._counters):
+                self._counters[i] = bytearray(count >> 1 for count in row)
+            self.additions //= 2
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "topics", "segment")
+
+    def __init__(self, value, size, expires_at, topics):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.topics = topics
+        self.segment = None
+
+
+class TinyLFUCache:
+    """
+    Thread safe mapping bounded by the total size of its values, evicting
+    with W-TinyLFU: new entries go through a small LRU window (1% of the
+    size), then are admitted to the main SLRU (probation, protected 80%) only
+    if they are requested more often than the entry they would evict, as
+    estimated by a frequency sketch of the recent requests. One-off keys thus
+    never push out the popular ones. Entries expire ttl seconds after they
+    were set, and can be dropped by topic.
+    """
+
+    WINDOW = 0.01
+    PROTECTED = 0.8
+
+    def __init__(self, max_bytes, ttl, sketch_width=4096, timer=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = self.misses = self.evictions = self.rejections = 0
+        self._budgets = {
+            "window": max(int(max_bytes * self.WINDOW), 1),
+            "protected": int(max_bytes * (1 - self.WINDOW) * self.PROTECTED),
+        }
+        self._segments = {
+            "window": OrderedDict(),
+            "probation": OrderedDict(),
+            "protected": OrderedDict(),
+        }
+        self._bytes = dict.fromkeys(self._segments, 0)
+        self._topics = {}
+        self._sketch = _FrequencySketch(sketch_width)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for key, or default when missing or expired
+        :param key: hashable
+        :param default: object
+        :return: object
+        """
+        with self._lock:
+            self._sketch.increment(key)
+            entry = self._find(key)
+            if entry is None or entry.expires_at <= self.timer():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self.hits += 1
+            segment = self._segments[entry.segment]
+            if entry.segment == "probation":
+                # requested again, promoted
+                del segment[key]
+                self._bytes["probation"] -= entry.size
+                self._place(key, entry, "protected")
+                self._demote_protected()
+            else:
+                segment.move_to_end(key)
+            return entry.value
+
+    def set(self, key, value, size, topics=(), ttl=None):
+        """
+        Stores value for key. Values larger than the cache are not stored.
+        :param key: hashable
+        :param value: object
+        :param size: int, bytes taken by value
+        :param topics: iterable, hashables naming what value was derived from
+        :param ttl: float, overrides the cache ttl for this entry
+        """
+        with self._lock:
+            if self._find(key) is not None:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            expires_at = self.timer() + (self.ttl if ttl is None else ttl)
+            entry = _Entry(value, size, expires_at, frozenset(topics))
+            for topic in entry.topics:
+                self._topics.setdefault(topic, set()).add(key)
+            self._place(key, entry, "window")
+            window = self._segments["window"]
+            while self._bytes["window"] > self._budgets["window"]:
+                candidate, candidate_entry = window.popitem(last=False)
+                self._bytes["window"] -= candidate_entry.size
+                self._admit(candidate, candidate_entry)
+
+    def discard_topics(self, topics):
+        """
+        Removes the entries stored with any of topics
+        :param topics: iterable
+        :return: int, number of entries removed
+        """
+        with self._lock:
+            keys = set()
+            for topic in topics:
+                keys.update(self._topics.get(topic, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            for segment in self._segments.values():
+                segment.clear()
+            self._bytes = dict.fromkeys(self._segments, 0)
+            self._topics.clear()
+
+    @property
+    def size(self):
+        """
+        Total bytes of the values stored
+        """
+        return sum(self._bytes.values())
+
+    def __len__(self):
+        return sum(len(segment) for segment in self._segments.values())
+
+    def _find(self, key):
+        for segment in self._segments.values():
+            entry = segment.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def _place(self, key, entry, name):
+        entry.segment = name
+        self._segments[name][key] = entry
+        self._bytes[name] += entry.size
+
+    def _remove(self, key):
+        entry = self._find(key)
+        del self._segments[entry.segment][key]
+        self._bytes[entry.segment] -= entry.size
+        self._forget(key, entry)
+
+    def _forget(self, key, entry):
+        for topic in entry.topics:
+            keys = self._topics[topic]
+            keys.discard(key)
+            if not keys:
+                del self._topics[topic]
+
+    def _demote_protected(self):
+        protected = self._segments["protected"]
+        while self._bytes["protected"] > self._budgets["protected"] and len(protected) > 1:
+            key, entry = protected.popitem(last=False)
+            self._bytes["protected"] -= entry.size
+            self._place(key, entry, "probation")
+
+    def _victims(self):
+        # probation first, least recently used first, then protected
+        for name in ("probation", "protected"):
+            yield from self._segments[name].items()
+
+    def _admit(self, candidate, entry):
+        main_budget = self.max_bytes - self._budgets["window"]
+        excess = self._bytes["probation"] + self._bytes["protected"] + entry.size - main_budget
+        victims = []
+        if excess > 0:
+            frequency = self._sketch.frequency(candidate)
+            for key, victim in self._victims():
+                if excess <= 0:
+                    break
+                if frequency <= self._sketch.frequency(key):
+                    break
+                victims.append(key)
+                excess -= victim.size
+        if excess > 0:
+            self.rejections += 1
+            self._forget(candidate, entry)
+            return
+        for key in victims:
+            self._remove(key)
+            self.evictions += 1
+        self._place(candidate, entry, "probation")
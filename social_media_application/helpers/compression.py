@@ -0,0 +1,206 @@
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_set_header
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover, optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover, optional
+    zstandard = None
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# content codings by name, the ones whose module is missing are left out
+CODINGS = {
+    name: coding
+    for name, coding, available in (
+        ("zstd", _Zstd, zstandard is not None),
+        ("br", _Brotli, brotli is not None),
+        ("gzip", _Gzip, True),
+    )
+    if available
+}
+
+# statuses whose body is empty or must not be transformed
+_UNTOUCHED_STATUSES = {204, 206, 304}
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing response bodies with the best coding the
+    client accepts (Accept-Encoding) among `codings`, in server preference order.
+    Only responses of the listed mimetypes are compressed, when they are at
+    least min_size bytes long: buffered bodies are compressed at once,
+    streamed ones chunk by chunk, each chunk being flushed to the client.
+    Bodies already encoded, or sent with Cache-Control: no-transform, are
+    left alone.
+    """
+
+    def __init__(self, app, codings, levels, mimetypes, min_size):
+        """
+        :param app: WSGI application
+        :param codings: iterable, names of the codings to offer, preferred first
+        :param levels: dict, coding name -> compression level
+        :param mimetypes: iterable, mimetypes worth compressing
+        :param min_size: int, bodies below this size in bytes are sent as is
+        """
+        self.app = app
+        self.codings = [name for name in codings if name in CODINGS]
+        self.levels = levels
+        self.mimetypes = set(mimetypes)
+        self.min_size = min_size
+
+    def negotiate(self, accept_encoding):
+        """
+        Returns the coding to use for an Accept-Encoding header, or None
+        :param accept_encoding: str
+        :return: str | None
+        """
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        best, best_quality = None, 0
+        for name in self.codings:
+            quality = accepted.quality(name)
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def _eligible(self, environ, status, headers):
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return False
+        if int(status.split(" ", 1)[0]) in _UNTOUCHED_STATUSES:
+            return False
+        if "Content-Encoding" in headers:
+            return False
+        if "no-transform" in headers.get("Cache-Control", ""):
+            return False
+        mimetype = headers.get("Content-Type", "").split(";", 1)[0].strip()
+        return mimetype in self.mimetypes
+
+    def __call__(self, environ, start_response):
+        response = {}
+        written = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            if exc_info is not None and response.get("started"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"], response["headers"] = status, headers
+            return written.append
+
+        body = self.app(environ, capture_start_response)
+        return self._respond(environ, body, response, written, start_response)
+
+    def _respond(self, environ, body, response, written, start_response):
+        try:
+            chunks = iter(body)
+            # the status and headers are known once the first chunk is produced
+            first = next(chunks, None)
+            chunks = _chain(written, first, chunks)
+            status = response["status"]
+            headers = Headers(response["headers"])
+            if not self._eligible(environ, status, headers):
+                response["started"] = True
+                start_response(status, response["headers"])
+                yield from chunks
+                return
+
+            vary = parse_set_header(headers.get("Vary"))
+            vary.add("Accept-Encoding")
+            headers["Vary"] = vary.to_header()
+            coding = self.negotiate(environ.get("HTTP_ACCEPT_ENCODING"))
+
+            buffered, size = [], 0
+            if coding is not None:
+                for chunk in chunks:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    if size >= self.min_size:
+                        break
+            if coding is None or size < self.min_size:
+                response["started"] = True
+                start_response(status, headers.to_wsgi_list())
+                yield from buffered
+                yield from chunks
+                return
+
+            compressor = CODINGS[coding](self.levels.get(coding))
+            headers["Content-Encoding"] = coding
+            etag = headers.get("ETag")
+            if etag and not etag.startswith("W/"):
+                # the encoded body is no longer byte for byte the tagged one
+                headers["ETag"] = "W/" + etag
+            length = headers.get("Content-Length")
+            del headers["Content-Length"]
+            if length is not None and size >= int(length):
+                # a buffered body, it was read whole
+                data = compressor.compress(b"".join(buffered)) + compressor.finish()
+                headers["Content-Length"] = str(len(data))
+                response["started"] = True
+                start_response(status, headers.to_wsgi_list())
+                yield data
+                return
+
+            response["started"] = True
+            start_response(status, headers.to_wsgi_list())
+            yield compressor.compress(b"".join(buffered)) + compressor.flush()
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush()
+            yield compressor.finish()
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+
+
+def _chain(written, first, chunks):
+    yield from written
+    if first is not None:
+        yield first
+    yield from chunks
@@ -0,0 +1,440 @@
+"""
+Hybrid feed engine.
+
+Posts are pushed into the timeline of every connection of their creator when
+they are written (fan-out on write). Creators having more than
+FEED_FANOUT_THRESHOLD accepted connections are flagged with `User.pull_posts`:
+their posts are not pushed but pulled from the post table when a feed is read,
+and merged with the timeline page on (pub_date, id).
+"""
+from flask import current_app as app
+
+import hashlib
+import heapq
+from itertools import islice
+from sqlalchemy import (
+    String,
+    or_,
+    case,
+    cast,
+    func,
+    exists,
+    literal,
+    tuple_,
+    union_all,
+    insert,
+    update,
+    delete,
+)
+
+from social_media_application.models import db, User, Post, Connection, Timeline
+
+
+def _accepted_connections():
+    return (
+        db.select(Connection.sender, Connection.receiver)
+        .where(Connection.accepted == True)
+        .where(Connection.archive == False)
+    )
+
+
+def connected_user_ids(user_id, limit=None):
+    """
+    Returns ids of every user having an accepted, non archived connection with user_id
+    :param user_id: uuid
+    :param limit: int, maximum number of ids to load
+    :return: set
+    """
+    rows = db.session.execute(
+        _accepted_connections()
+        .where(or_(Connection.sender == user_id, Connection.receiver == user_id))
+        .limit(limit)
+    ).all()
+    return {
+        receiver if sender == user_id else sender for sender, receiver in rows
+    }
+
+
+def connected_since(user_id):
+    """
+    Returns when each connection of user_id was accepted
+    :param user_id: uuid
+    :return: dict, user id -> datetime | None
+    """
+    rows = db.session.execute(
+        db.select(Connection.sender, Connection.receiver, Connection.accepted_at)
+        .where(Connection.accepted == True)
+        .where(or_(Connection.sender == user_id, Connection.receiver == user_id))
+        .where(Connection.archive == False)
+    ).all()
+    return {
+        receiver if sender == user_id else sender: accepted_at
+        for sender, receiver, accepted_at in rows
+    }
+
+
+def pulled_user_ids(user_id):
+    """
+    Returns ids of the connections of user_id whose posts are pulled at read time
+    :param user_id: uuid
+    :return: set
+    """
+    connections = (
+        _accepted_connections()
+        .where(or_(Connection.sender == user_id, Connection.receiver == user_id))
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(User.id)
+        .join(
+            connections,
+            or_(User.id == connections.c.sender, User.id == connections.c.receiver),
+        )
+        .where(User.id != user_id)
+        .where(User.pull_posts == True)
+    ).scalars()
+    return set(rows)
+
+
+def fan_out_post(post, author):
+    """
+    Pushes a freshly written post into the timeline of every connection of its creator,
+    unless the creator's posts are pulled at read time
+    :param post: Post
+    :param author: User
+    """
+    fan_out_posts([post], author)
+
+
+def fan_out_posts(posts, author):
+    """
+    Pushes freshly written posts of one creator into the timeline of every
+    connection of theirs, in a single insert, unless the creator's posts are
+    pulled at read time
+    :param posts: list of Post
+    :param author: User
+    """
+    if author.pull_posts or not posts:
+        return
+    threshold = app.config["FEED_FANOUT_THRESHOLD"]
+    readers = connected_user_ids(author.id, limit=threshold + 1)
+    if len(readers) > threshold:
+        # the author crossed the threshold since the flag was last refreshed
+        author.pull_posts = True
+        return
+    if readers:
+        db.session.execute(
+            insert(Timeline),
+            [
+                {"user_id": reader, "post_id": post.id, "pub_date": post.pub_date}
+                for post in posts
+                for reader in readers
+            ],
+        )
+
+
+def retract_post(post_id):
+    """
+    Removes a post from every timeline it was pushed to
+    :param post_id: uuid
+    """
+    db.session.execute(delete(Timeline).where(Timeline.post_id == post_id))
+
+
+def touch_posts_of(creator):
+    """
+    Records that a post of creator was edited or deleted, which changes the
+    ETag of the feeds showing their posts
+    :param creator: uuid
+    """
+    db.session.execute(
+        update(User)
+        .where(User.id == creator)
+        .values(posts_version=User.posts_version + 1)
+    )
+
+
+def _push_posts_of(creator, reader):
+    db.session.execute(
+        insert(Timeline).from_select(
+            ["user_id", "post_id", "pub_date"],
+            db.select(literal(reader, Timeline.user_id.type), Post.id, Post.pub_date)
+            .where(Post.creator == creator)
+            .where(
+                ~exists()
+                .where(Timeline.user_id == reader)
+                .where(Timeline.post_id == Post.id)
+            ),
+        )
+    )
+
+
+def refresh_fanout_mode(user):
+    """
+    Flags a user's posts as pulled once their connection count crosses
+    FEED_FANOUT_THRESHOLD. It is re-evaluated whenever one of their connections
+    is accepted or removed. When the flag is cleared, their posts are pushed to
+    every connection, so that timelines are complete again.
+    :param user: User
+    """
+    threshold = app.config["FEED_FANOUT_THRESHOLD"]
+    readers = connected_user_ids(user.id, limit=threshold + 1)
+    pull_posts = len(readers) > threshold
+    if user.pull_posts and not pull_posts:
+        for reader in readers:
+            _push_posts_of(user.id, reader)
+    user.pull_posts = pull_posts
+
+
+def refresh_fanout_modes(user_ids):
+    """
+    Re-evaluates the flag of the users among user_ids whose posts are pulled,
+    once they lost connections
+    :param user_ids: iterable of uuid
+    """
+    users = db.session.execute(
+        db.select(User).where(User.id.in_(user_ids)).where(User.pull_posts == True)
+    ).scalars()
+    for user in users.all():
+        refresh_fanout_mode(user)
+
+
+def link_connection(connection):
+    """
+    Pushes the existing posts of both sides of a newly accepted connection
+    into the other side's timeline
+    :param connection: Connection
+    """
+    for creator, reader in (
+        (connection.sender, connection.receiver),
+        (connection.receiver, connection.sender),
+    ):
+        author = db.session.get(User, creator)
+        refresh_fanout_mode(author)
+        if not author.pull_posts:
+            _push_posts_of(creator, reader)
+
+
+def unlink_connection(connection):
+    """
+    Removes the posts of both sides of a connection from the other side's
+    timeline. Call it once the connection is deleted or archived, so that both
+    sides can fall back below FEED_FANOUT_THRESHOLD
+    :param connection: Connection
+    """
+    for creator, reader in (
+        (connection.sender, connection.receiver),
+        (connection.receiver, connection.sender),
+    ):
+        db.session.execute(
+            delete(Timeline)
+            .where(Timeline.user_id == reader)
+            .where(
+                Timeline.post_id.in_(
+                    db.select(Post.id).where(Post.creator == creator)
+                )
+            )
+        )
+    refresh_fanout_modes([connection.sender, connection.receiver])
+
+
+def retract_user(user_id):
+    """
+    Removes the timeline of a user along with every entry pointing to their posts
+    :param user_id: uuid
+    """
+    db.session.execute(
+        delete(Timeline).where(
+            or_(
+                Timeline.user_id == user_id,
+                Timeline.post_id.in_(db.select(Post.id).where(Post.creator == user_id)),
+            )
+        )
+    )
+
+
+def backfill_timelines():
+    """
+    Rebuilds every timeline from the accepted connections and existing posts
+    :return: int, number of timeline rows written
+    """
+    db.session.execute(delete(Timeline))
+    accepted = _accepted_connections().subquery()
+    ends = union_all(
+        db.select(accepted.c.sender.label("user_id")),
+        db.select(accepted.c.receiver.label("user_id")),
+    ).subquery()
+    db.session.execute(
+        update(User).values(
+            pull_posts=User.id.in_(
+                db.select(ends.c.user_id)
+                .group_by(ends.c.user_id)
+                .having(func.count() > app.config["FEED_FANOUT_THRESHOLD"])
+            )
+        )
+    )
+    written = 0
+    for creator_column, reader_column in (
+        (Connection.sender, Connection.receiver),
+        (Connection.receiver, Connection.sender),
+    ):
+        result = db.session.execute(
+            insert(Timeline).from_select(
+                ["user_id", "post_id", "pub_date"],
+                db.select(reader_column, Post.id, Post.pub_date)
+                .join(Connection, creator_column == Post.creator)
+                .join(User, User.id == Post.creator)
+                .where(User.pull_posts == False)
+                .where(Connection.accepted == True)
+                .where(Connection.archive == False),
+            )
+        )
+        written += result.rowcount
+    return written
+
+
+def merge_runs(runs, limit):
+    """
+    k-way merges runs of (pub_date, post_id, item) sorted newest first,
+    dropping posts present in more than one run
+    :param runs: list of iterables
+    :param limit: int
+    :return: list
+    """
+    seen = set()
+    merged = (
+        entry
+        for entry in heapq.merge(
+            *runs, key=lambda entry: (entry[0], entry[1]), reverse=True
+        )
+        if not (entry[1] in seen or seen.add(entry[1]))
+    )
+    return list(islice(merged, limit))
+
+
+def _bounded(query, pub_date, post_id, after=None, since=None):
+    if after:
+        query = query.where(tuple_(pub_date, post_id) < tuple_(*after))
+    if since:
+        query = query.where(tuple_(pub_date, post_id) > tuple_(*since))
+    return query.order_by(pub_date.desc(), post_id.desc())
+
+
+def _pulled_post_ids(authors, limit, after=None, since=None):
+    # one index seek on post(creator, pub_date, id) per author, in a single query
+    return union_all(
+        *[
+            db.select(
+                _bounded(
+                    db.select(Post.pub_date, Post.id).where(Post.creator == author),
+                    Post.pub_date,
+                    Post.id,
+                    after,
+                    since,
+                )
+                .limit(limit)
+                .subquery()
+            )
+            for author in authors
+        ]
+    )
+
+
+def read_feed(user_id, limit, after=None, since=None, pulled=None, options=()):
+    """
+    Returns up to limit + 1 feed posts of user_id, newest first.
+    The pushed timeline and the posts of every pulled connection are
+    each read with an index seek and merged on (pub_date, id).
+    :param user_id: uuid
+    :param limit: int
+    :param after: tuple, (pub_date, post_id) keyset of the previous page
+    :param since: tuple, (pub_date, post_id) only posts newer than this are returned
+    :param pulled: set, ids of the pulled connections when already known
+    :param options: loader options of the posts, they must load creator and pub_date
+    :return: list of (pub_date, post_id, Post)
+    """
+    rows = db.session.execute(
+        _bounded(
+            db.select(Post, Timeline.pub_date)
+            .options(*options)
+            .join(Timeline, Timeline.post_id == Post.id)
+            .where(Timeline.user_id == user_id),
+            Timeline.pub_date,
+            Timeline.post_id,
+            after,
+            since,
+        ).limit(limit + 1)
+    ).all()
+    runs = [[(row.pub_date, row.Post.id, row.Post) for row in rows]]
+
+    authors = pulled_user_ids(user_id) if pulled is None else pulled
+    if authors:
+        ids = _pulled_post_ids(authors, limit + 1, after, since).subquery()
+        posts = db.session.execute(
+            db.select(Post)
+            .options(*options)
+            .where(Post.id.in_(db.select(ids.c.id)))
+        ).scalars()
+        by_author = {}
+        for post in posts:
+            by_author.setdefault(post.creator, []).append(
+                (post.pub_date, post.id, post)
+            )
+        runs.extend(
+            sorted(run, key=lambda entry: (entry[0], entry[1]), reverse=True)
+            for run in by_author.values()
+        )
+    return merge_runs(runs, limit + 1)
+
+
+def feed_etag(user_id, *params):
+    """
+    Returns a validator of the feed of user_id, derived from aggregates of
+    its connection set and of the posts_version of the connections (edits
+    and deletions of their posts), computed in SQL, and from its newest
+    visible post, without loading any post.
+    Returns it along with the ids of the pulled connections.
+    :param user_id: uuid
+    :param params: values of the request parameters shaping the response
+    :return: tuple, (str, set)
+    """
+    other = case(
+        (Connection.sender == user_id, Connection.receiver), else_=Connection.sender
+    )
+    # any connection added or removed changes the count or the newest one,
+    # any post edited or deleted the sum of the versions
+    connections = db.session.execute(
+        db.select(
+            func.count(),
+            func.sum(User.posts_version),
+            func.max(Connection.accepted_at),
+            func.max(cast(Connection.id, String)),
+        )
+        .join(User, User.id == other)
+        .where(Connection.accepted == True)
+        .where(or_(Connection.sender == user_id, Connection.receiver == user_id))
+        .where(Connection.archive == False)
+    ).one()
+    pulled = pulled_user_ids(user_id)
+
+    heads = [
+        db.select(Timeline.pub_date, Timeline.post_id.label("id"))
+        .where(Timeline.user_id == user_id)
+        .order_by(Timeline.pub_date.desc(), Timeline.post_id.desc())
+        .limit(1)
+        .subquery()
+    ]
+    if pulled:
+        heads.append(_pulled_post_ids(pulled, 1).subquery())
+    candidates = union_all(*[db.select(head) for head in heads]).subquery()
+    newest = db.session.execute(
+        db.select(candidates)
+        .order_by(candidates.c.pub_date.desc(), candidates.c.id.desc())
+        .limit(1)
+    ).first()
+
+    digest = hashlib.sha1(str(user_id).encode())
+    digest.update(repr(tuple(connections)).encode())
+    digest.update(repr(sorted(str(author) for author in pulled)).encode())
+    digest.update(repr((tuple(newest) if newest else None, params)).encode())
+    return digest.hexdigest(), pulled
@@ -0,0 +1,87 @@
+from flask import request
+
+from functools import lru_cache
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+def requested_fields(allowed):
+    """
+    Returns the field names listed by the `fields` query parameter
+    (?fields=id,title), or None when it is absent
+    :param allowed: iterable, names the client may ask for
+    :return: tuple | None
+    """
+    value = request.args.get("fields")
+    if value is None:
+        return None
+    names = tuple(
+        dict.fromkeys(name.strip() for name in value.split(",") if name.strip())
+    )
+    allowed = set(allowed)
+    unknown = [name for name in names if name not in allowed]
+    if unknown or not names:
+        raise FieldsetError(
+            "invalid fields: {}, expected some of {}".format(
+                ",".join(unknown), ",".join(sorted(allowed))
+            )
+        )
+    return names
+
+
+def expand_fields(names, aliases):
+    """
+    Returns names where the fields a view derives itself are replaced by the
+    schema fields it derives them from
+    :param names: tuple | None
+    :param aliases: dict, view field -> tuple of schema fields
+    :return: tuple | None
+    """
+    if names is None:
+        return None
+    expanded = []
+    for name in names:
+        expanded.extend(aliases.get(name, (name,)))
+    return tuple(dict.fromkeys(expanded))
+
+
+@lru_cache(maxsize=256)
+def _schema(schema_class, names, many):
+    return schema_class(only=names, many=many)
+
+
+def sparse_schema(schema, names):
+    """
+    Returns a schema like `schema` dumping only the fields in names.
+    Instances are shared between requests, so each one compiles its
+    serializer once.
+    :param schema: Schema
+    :param names: iterable | None, every field when None
+    :return: Schema
+    """
+    if names is None:
+        return schema
+    return _schema(type(schema), tuple(sorted(set(names))), schema.many)
+
+
+def load_columns(model, names, *required):
+    """
+    Returns the loader options restricting the columns of model loaded from
+    the database to the ones behind names (plus required and the primary key).
+    Names that are not columns (relationships, computed fields) are skipped.
+    :param model: db.Model class
+    :param names: iterable | None, every column when None
+    :param required: str, columns the caller itself reads
+    :return: list
+    """
+    if names is None:
+        return []
+    mapper = inspect(model)
+    columns = mapper.column_attrs.keys()
+    keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+    keys += [name for name in (*names, *required) if name in columns]
+    return [load_only(*(getattr(model, key) for key in dict.fromkeys(keys)))]
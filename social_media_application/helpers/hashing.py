@@ -0,0 +1,115 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from passlib.hash import bcrypt
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _hash(password, rounds):
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _verify(password, password_hash):
+    return bcrypt.verify(password, password_hash)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded process pool, so that CPU bound hashing does not
+    hold the WSGI workers (and their GIL) while it runs. At most
+    `max_concurrency` hashes are queued or running at once; callers wait
+    `timeout` seconds for a slot, then as long for the hash, before
+    HashingBusy is raised.
+    With workers=0 hashing runs inline, still bounded by max_concurrency.
+    Pool processes are started by a forkserver, never forked from a
+    (multithreaded) request thread, and a pool broken by a killed process
+    is replaced. The forkserver only preloads this module; pool processes
+    import the main module again, as __mp_main__, so it must not build the
+    application at import time (see app.py).
+    """
+
+    def __init__(self, rounds, workers, max_concurrency, timeout):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else "spawn"
+                )
+                if context.get_start_method() == "forkserver":
+                    # instead of __main__, which would build the application
+                    context.set_forkserver_preload([__name__])
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context
+                )
+            return self._pool
+
+    def _discard(self, pool):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingBusy("too many password hashes in progress, try again")
+        try:
+            if not self.workers:
+                return fn(*args)
+            for retry in (False, True):
+                pool = self._executor()
+                try:
+                    future = pool.submit(fn, *args)
+                    return future.result(timeout=self.timeout)
+                except BrokenProcessPool:
+                    # a pool process died (killed by the OOM killer...),
+                    # retried once on a new pool
+                    self._discard(pool)
+                    if retry:
+                        raise
+                except TimeoutError:
+                    future.cancel()
+                    raise HashingBusy("password hashing timed out, try again")
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """
+        Returns the bcrypt hash of password at the configured cost
+        :param password: str
+        :return: str
+        """
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, password_hash):
+        """
+        Returns true when password matches password_hash
+        :param password: str
+        :param password_hash: str
+        :return: boolean
+        """
+        return self._run(_verify, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """
+        Returns true when password_hash was computed at a lower cost than the configured one
+        :param password_hash: str
+        :return: boolean
+        """
+        return bcrypt.from_string(password_hash).rounds < self.rounds
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,48 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover, the stdlib encoder is used instead
+    orjson = None
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider encoding responses with orjson, byte for byte like
+    DefaultJSONProvider: keys sorted, compact separators, dates through
+    the default hook (http_date). Payloads orjson renders differently are
+    encoded by the stdlib: non-ASCII text (escaped with ensure_ascii),
+    integers over 64 bits, objects the default hook rejects.
+    Float formatting can still differ on exponents (1e16 vs 1e+16) and
+    NaN/Infinity (null vs NaN), none of the models has float columns.
+    """
+
+    def _options(self):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def encode(self, obj):
+        """
+        Returns obj as compact JSON bytes, as found in a response body
+        :param obj: object
+        :return: bytes
+        """
+        if orjson is not None:
+            try:
+                body = orjson.dumps(obj, default=self.default, option=self._options())
+            except TypeError:
+                body = None
+            if body is not None and (body.isascii() or not self.ensure_ascii):
+                return body
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self.encode(obj) + b"\n", mimetype=self.mimetype
+        )
@@ -0,0 +1,84 @@
+from flask import g
+
+from social_media_application.models import db, User
+
+
+class BatchLoader:
+    """
+    Resolves keys to values in batches: keys queued while dumping a collection
+    are loaded together by one call of load_many, on the first load().
+    Values are kept for the lifetime of the loader (the request, see loader()).
+    """
+
+    def __init__(self, load_many):
+        """
+        :param load_many: callable(list of keys) -> dict, missing keys map to None
+        """
+        self.load_many = load_many
+        self._values = {}
+        self._queued = set()
+
+    def queue(self, keys):
+        """
+        Queues keys for the next batch
+        :param keys: iterable
+        """
+        self._queued.update(
+            key for key in keys if key is not None and key not in self._values
+        )
+
+    def prime(self, key, value):
+        """
+        Stores a value that is already known
+        :param key: hashable
+        :param value: object
+        """
+        self._values[key] = value
+        self._queued.discard(key)
+
+    def load(self, key):
+        """
+        Returns the value of key, loading the queued keys with it when missing
+        :param key: hashable
+        :return: object
+        """
+        if key not in self._values:
+            self._queued.add(key)
+            self._dispatch()
+        return self._values.get(key)
+
+    def _dispatch(self):
+        if not self._queued:
+            return
+        keys = list(self._queued)
+        self._queued.clear()
+        found = self.load_many(keys)
+        for key in keys:
+            self._values[key] = found.get(key)
+
+
+def loader(name, load_many):
+    """
+    Returns the BatchLoader called name of the current request, kept on flask.g
+    :param name: str
+    :param load_many: callable, used when the loader is created
+    :return: BatchLoader
+    """
+    if "loaders" not in g:
+        g.loaders = {}
+    if name not in g.loaders:
+        g.loaders[name] = BatchLoader(load_many)
+    return g.loaders[name]
+
+
+def _load_usernames(ids):
+    rows = db.session.execute(db.select(User.id, User.username).where(User.id.in_(ids)))
+    return dict(rows.all())
+
+
+def usernames():
+    """
+    Returns the request's loader of usernames by user id
+    :return: BatchLoader
+    """
+    return loader("usernames", _load_usernames)
@@ -0,0 +1,202 @@
+from flask import current_app as app
+
+import threading
+import uuid
+
+from social_media_application.helpers.cache import TTLCache
+
+try:
+    import redis
+except ImportError:  # pragma: no cover, optional
+    redis = None
+
+
+class RedisBackend:
+    """
+    Shared object cache backend storing bodies in Redis, so that every worker
+    sees the entries the others cached and the keys they invalidated.
+    Redis errors are ignored: lookups miss and the database answers.
+    """
+
+    def __init__(self, url, prefix="objects:"):
+        """
+        :param url: str, redis://host:port/db
+        :param prefix: str, prepended to every key
+        """
+        if redis is None:
+            raise RuntimeError("OBJECT_CACHE_URL needs the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except redis.RedisError:
+            return None
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+        except redis.RedisError:
+            pass
+
+    def add(self, key, value, ttl):
+        # set only when the key is absent
+        try:
+            self.client.set(self.prefix + key, value, px=int(ttl * 1000), nx=True)
+        except redis.RedisError:
+            pass
+
+
+# shared backends by url scheme
+BACKENDS = {"redis": RedisBackend, "rediss": RedisBackend}
+
+# stored in place of an invalidated body, an empty body is never cached
+TOMBSTONE = b""
+
+
+class ObjectCache:
+    """
+    Read-through cache of the serialized bodies of GET /posts/<id> and
+    GET /users/<id>: a size bounded in-process LRU in front of an optional
+    shared backend (get, set and add, i.e. set if absent, with a ttl).
+    Entries expire ttl seconds after they were cached; the in-process ones
+    after local_ttl, which bounds how long a worker can serve a body another
+    worker invalidated.
+
+    Invalidation stores a tombstone for TOMBSTONE_TTL seconds, and bodies are
+    only added where there is none, so that a lookup which read the object
+    before a write was committed cannot cache it after the invalidation.
+    """
+
+    TOMBSTONE_TTL = 10.0
+
+    def __init__(self, maxsize, ttl, local_ttl=None, shared=None):
+        """
+        :param maxsize: int, entries kept in process
+        :param ttl: float, seconds an entry is cached for
+        :param local_ttl: float, seconds an entry is kept in process, ttl by default
+        :param shared: object | None, shared backend
+        """
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl if local_ttl is None else local_ttl)
+        self.shared = shared
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, id):
+        try:
+            id = uuid.UUID(str(id))
+        except ValueError:
+            pass
+        return "{}:{}".format(kind, id)
+
+    def _add_local(self, key, body):
+        with self._lock:
+            if self.local.get(key) is None:
+                self.local.set(key, body)
+
+    def get(self, kind, id):
+        """
+        Returns the body cached for an object, or None
+        :param kind: str, "post" | "user"
+        :param id: str | uuid
+        :return: bytes | None
+        """
+        key = self.key(kind, id)
+        body = self.local.get(key)
+        if body is None and self.shared is not None:
+            body = self.shared.get(key)
+            if body:
+                self._add_local(key, body)
+        return body or None
+
+    def set(self, kind, id, body):
+        """
+        Caches the body of an object, unless it was invalidated meanwhile
+        :param kind: str
+        :param id: str | uuid
+        :param body: bytes
+        """
+        key = self.key(kind, id)
+        self._add_local(key, body)
+        if self.shared is not None:
+            self.shared.add(key, body, self.ttl)
+
+    def invalidate(self, kind, ids):
+        """
+        Drops the bodies of objects that were written, once committed
+        :param kind: str
+        :param ids: iterable of str | uuid
+        """
+        for id in ids:
+            key = self.key(kind, id)
+            with self._lock:
+                self.local.set(key, TOMBSTONE, ttl=self.TOMBSTONE_TTL)
+            if self.shared is not None:
+                self.shared.set(key, TOMBSTONE, self.TOMBSTONE_TTL)
+
+
+def make_object_cache(config):
+    """
+    Returns the object cache described by the OBJECT_CACHE_* settings, or None
+    when disabled
+    :param config: dict, the application config
+    :return: ObjectCache | None
+    """
+    if not config["OBJECT_CACHE_TTL"]:
+        return None
+    url = config["OBJECT_CACHE_URL"]
+    shared = None
+    if url:
+        scheme = url.split("://", 1)[0]
+        if scheme not in BACKENDS:
+            raise ValueError("unknown OBJECT_CACHE_URL scheme {}".format(scheme))
+        shared = BACKENDS[scheme](url)
+    return ObjectCache(
+        config["OBJECT_CACHE_SIZE"],
+        config["OBJECT_CACHE_TTL"],
+        config["OBJECT_CACHE_LOCAL_TTL"],
+        shared,
+    )
+
+
+def object_cache():
+    return app.extensions.get("object_cache")
+
+
+def cached_body(kind, id):
+    """
+    Returns the body cached for an object, or None (also when the cache is disabled)
+    :param kind: str
+    :param id: str | uuid
+    :return: bytes | None
+    """
+    cache = object_cache()
+    return cache.get(kind, id) if cache is not None else None
+
+
+def cache_body(kind, id, body):
+    cache = object_cache()
+    if cache is not None:
+        cache.set(kind, id, body)
+
+
+def invalidate_objects(kind, ids):
+    """
+    Drops the cached bodies of objects, once the writes are committed
+    :param kind: str
+    :param ids: iterable of str | uuid
+    """
+    cache = object_cache()
+    if cache is not None:
+        cache.invalidate(kind, ids)
+
+
+def body_response(body):
+    """
+    Returns a json response sending a cached body
+    :param body: bytes
+    :return: Response
+    """
+    return app.response_class(body, mimetype=app.json.mimetype)
@@ -0,0 +1,151 @@
+from flask import request, url_for
+from flask import current_app as app
+
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from social_media_application.models import db
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    """
+    Returns an opaque url-safe cursor from the keyset values of the last row of a page
+    :param values: datetime | uuid | str | int
+    :return: str
+    """
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """
+    Returns the keyset values stored in a cursor, converted to the given types
+    :param cursor: str
+    :param types: datetime | uuid.UUID | str | int
+    :return: tuple
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            raise PaginationError("invalid cursor")
+        return tuple(_convert(t, v) for t, v in zip(types, values))
+    except (ValueError, TypeError):
+        raise PaginationError("invalid cursor")
+
+
+def page_args(default_limit, max_limit):
+    """
+    Returns the (limit, cursor) requested through the query string,
+    limit is capped to max_limit
+    :param default_limit: int
+    :param max_limit: int
+    :return: tuple
+    """
+    try:
+        limit = int(request.args.get("limit", default_limit))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, max_limit), request.args.get("cursor")
+
+
+def set_next_cursor(response, next_cursor):
+    """
+    Adds the X-Next-Cursor and Link headers pointing to the next page, if any
+    :param response: Response
+    :param next_cursor: str | None
+    :return: Response
+    """
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        next_url = url_for(request.endpoint, **(request.view_args or {}), **args)
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = '<{}>; rel="next"'.format(next_url)
+    return response
+
+
+def seek(query, columns, cursor=None, descending=False):
+    """
+    Returns query ordered by the keyset columns, starting after the row
+    the cursor was taken from. The last column must be unique, so that
+    the order is total and no row is skipped or repeated across pages.
+    :param query: sqlalchemy Select
+    :param columns: tuple of model attributes
+    :param cursor: str | None
+    :param descending: boolean
+    :return: sqlalchemy Select
+    """
+    if cursor:
+        values = decode_cursor(cursor, *(column.type.python_type for column in columns))
+        if len(columns) == 1:
+            key, values = columns[0], values[0]
+        else:
+            key, values = tuple_(*columns), tuple_(*values)
+        query = query.where(key < values if descending else key > values)
+    return query.order_by(
+        *(column.desc() if descending else column.asc() for column in columns)
+    )
+
+
+def paginate(query, columns, descending=False):
+    """
+    Returns one page of the rows of a select, following the limit and cursor
+    query parameters, and the cursor of the next page (None on the last one).
+    Pages hold PAGE_SIZE rows unless limit asks otherwise, MAX_PAGE_SIZE at most.
+    :param query: sqlalchemy Select
+    :param columns: tuple of model attributes, the keyset (see seek)
+    :param descending: boolean
+    :return: tuple
+    """
+    limit, cursor = page_args(app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+    return fetch_page(query, columns, limit, cursor, descending)
+
+
+def fetch_page(query, columns, limit, cursor=None, descending=False):
+    """
+    Returns the limit rows of a select following the cursor, and the cursor
+    of the next page (None on the last one)
+    :param query: sqlalchemy Select
+    :param columns: tuple of model attributes, the keyset (see seek)
+    :param limit: int
+    :param cursor: str | None
+    :param descending: boolean
+    :return: tuple
+    """
+    # one more row than asked tells whether there is a next page
+    rows = (
+        db.session.execute(seek(query, columns, cursor, descending).limit(limit + 1))
+        .scalars()
+        .all()
+    )
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*(getattr(rows[-1], column.key) for column in columns))
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _convert(type_, value):
+    if type_ is datetime:
+        return datetime.fromisoformat(value)
+    if type_ is uuid.UUID:
+        return uuid.UUID(value)
+    return type_(value)
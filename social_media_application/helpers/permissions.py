@@ -1,75 +1,153 @@
-from flask import request, jsonify
+from flask import request, jsonify, g
+from flask import current_app as app
 
+import time
 from functools import wraps
 
-from social_media_application.models import User, Post
+from social_media_application.models import db, User, Post, BlacklistToken
+from social_media_application.helpers.loader import usernames
 
 
-def authenticate_user(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            # Check if Authorization header is present in the request
-            if "Authorization" not in request.headers.keys():
-                return jsonify({"error": "Unauthenticated"}), 401
+def _principal_cache():
+    if app.config.get("AUTH_CACHE_TTL"):
+        return app.extensions.get("principal_cache")
+    return None
 
-            # Extract the token from the Authorization header
-            auth_header = request.headers.get("Authorization")
-            # Extract the token value
-            token = auth_header.split(" ")[1]
 
+def resolve_principal(token):
+    """
+    Returns the user an access token authenticates, or None.
+    The token is checked in memory (signature, expiry, revocation filter),
+    then the user is loaded by primary key and its token_version compared
+    with the token's. Decoded tokens are kept in the principal cache
+    (token -> user id, version, expiry, revocation key) for AUTH_CACHE_TTL
+    seconds, when enabled; cached ones are still checked against the
+    revocation filter, which learns of the logouts of other processes.
+    :param token: str
+    :return: User | None
+    """
+    cache = _principal_cache()
+    principal = cache.get(token) if cache is not None else None
+    if principal is not None and BlacklistToken.is_revoked(principal[3]):
+        cache.pop(token)
+        return None
+    if principal is None:
+        principal = User.verify_auth_token(token)
+        if principal is None:
+            return None
+        if cache is not None:
+            # never outlive the token itself
+            ttl = min(app.config["AUTH_CACHE_TTL"], principal[2] - time.time())
+            principal += (BlacklistToken.key_for(token)[0],)
+            cache.set(token, principal, ttl=ttl)
+
+    user = db.session.get(User, principal[0])
+    if user is None or user.token_version != principal[1]:
+        return None
+    return user
+
+
+def invalidate_principal(token=None, user_id=None):
+    """
+    Drops cached principals of a blacklisted token (logout) or of every token
+    of a user whose token_version was bumped (password change, archive)
+    :param token: str
+    :param user_id: uuid
+    """
+    if token is not None:
+        revocation_filter = app.extensions.get("revocation_filter")
+        if revocation_filter is not None:
+            revocation_filter.add(BlacklistToken.key_for(token)[0])
+    cache = app.extensions.get("principal_cache")
+    if cache is None:
+        return
+    if token is not None:
+        cache.pop(token)
+    if user_id is not None:
+        cache.discard_where(lambda principal: principal[0] == user_id)
+
+
+def current_user():
+    """
+    Returns the user authenticated by the Authorization header of the current request.
+    It is resolved once per request and kept on flask.g.
+    :return: User | None
+    """
+    if "current_user" not in g:
+        g.current_user = None
+        if "Authorization" in request.headers.keys():
+            # Extract the token value from the Authorization header
+            token = request.headers.get("Authorization").split(" ")[1]
             if token:
-                username = User.verify_auth_token(token)
-                if User.query.filter_by(username=username).first():
-                    # If the token is valid, proceed with the original function
-                    kwargs["current_user"] = User.query.filter_by(
-                        username=username
-                    ).first()
-                    return f(*args, **kwargs)
-                else:
+                g.current_user = resolve_principal(token)
+            if g.current_user is not None:
+                usernames().prime(g.current_user.id, g.current_user.username)
+    return g.current_user
+
+
+def requires(policy):
+    """
+    Returns a decorator running the auth pipeline in front of a view:
+    the principal is resolved once per request (current_user) and handed to
+    the view as `current_user`, then policy(user, kwargs) is evaluated.
+    A policy returns None to let the request through, or an error response.
+    It may add what it loaded to kwargs for the view.
+    Stacked policies share the resolved principal.
+    :param policy: callable
+    :return: decorator
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            try:
+                # Check if Authorization header is present in the request
+                if "Authorization" not in request.headers.keys():
                     return jsonify({"error": "Unauthenticated"}), 401
-        except Exception as e:
-            return jsonify({"error": str(e)}), 400
-
-    return decorated_function
-
-
-def is_owner(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            if "Authorization" not in request.headers.keys():
-                return jsonify({"error": "Unauthenticated"}), 401
-            auth_header = request.headers.get("Authorization")
-            token = auth_header.split(" ")[1]
-            username = User.verify_auth_token(token)
-            user = User.query.filter_by(username=username).first()
-            if user and str(user.id) == kwargs.get("id"):
+
+                user = current_user()
+                if not user:
+                    return jsonify({"error": "Unauthenticated"}), 401
+                kwargs["current_user"] = user
+                error = policy(user, kwargs)
+                if error is not None:
+                    return error
+                # If the request is authorized, proceed with the original function
                 return f(*args, **kwargs)
-            return jsonify({"error": "Unauthorized"}), 403
-        except Exception as e:
-            return jsonify({"error": str(e)}), 400
-
-    return decorated_function
-
-
-def is_post_owner(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            if "Authorization" not in request.headers.keys():
-                return jsonify({"error": "Unauthenticated"}), 401
-            auth_header = request.headers.get("Authorization")
-            token = auth_header.split(" ")[1]
-            username = User.verify_auth_token(token)
-            post_id = kwargs.get("id")
-            post = Post.query.filter_by(id=post_id).first()
-            if post:
-                if User.query.filter_by(username=username).first().id == post.creator:
-                    return f(*args, **kwargs)
-                return jsonify({"error": "Unauthorized"}), 403
-            return jsonify({"error": "Invalid post id"}), 400
-        except Exception as e:
-            return jsonify({"error": str(e)}), 400
-
-    return decorated_function
+            except Exception as e:
+                return jsonify({"error": str(e)}), 400
+
+        return decorated_function
+
+    return decorator
+
+
+def _authenticated(user, kwargs):
+    return None
+
+
+def _owns_user(user, kwargs):
+    if str(user.id) == kwargs.get("id"):
+        return None
+    return jsonify({"error": "Unauthorized"}), 403
+
+
+def _owns_post(user, kwargs):
+    post = kwargs.get("post") or Post.query.filter_by(id=kwargs.get("id")).first()
+    if not post:
+        return jsonify({"error": "Invalid post id"}), 400
+    if user.id != post.creator:
+        return jsonify({"error": "Unauthorized"}), 403
+    kwargs["post"] = post
+    return None
+
+
+# any authenticated user
+authenticate_user = requires(_authenticated)
+
+# the authenticated user is the one addressed by the `id` url parameter
+is_owner = requires(_owns_user)
+
+# the authenticated user created the post addressed by the `id` url parameter,
+# the post is handed to the view as `post`
+is_post_owner = requires(_owns_post)
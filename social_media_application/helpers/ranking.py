@@ -0,0 +1,79 @@
+from flask import current_app as app
+
+import numpy as np
+from datetime import datetime as dt
+
+
+def score_posts(
+    ages, affinities, type_weights, half_life, recency_weight, affinity_weight
+):
+    """
+    Returns the score of every candidate post, computed over whole arrays
+    score = type_weight * (recency_weight * 2^(-age / half_life) + affinity_weight * affinity)
+    :param ages: np.ndarray, age of each post in hours
+    :param affinities: np.ndarray, affinity in [0, 1] between the reader and each post creator
+    :param type_weights: np.ndarray, weight of each post's post_type
+    :param half_life: float, hours after which the recency signal is halved
+    :param recency_weight: float
+    :param affinity_weight: float
+    :return: np.ndarray
+    """
+    recency = np.exp2(-np.maximum(ages, 0.0) / half_life)
+    return type_weights * (recency_weight * recency + affinity_weight * affinities)
+
+
+def rank_posts(posts, connected_since, now=None):
+    """
+    Returns posts ordered by score, best first. The scoring weights are read
+    from the FEED_RANK_* settings.
+    :param posts: list of Post
+    :param connected_since: dict, creator id -> datetime the connection was accepted, or None
+    :param now: datetime
+    :return: list of Post
+    """
+    if not posts:
+        return []
+    config = app.config
+    now = (now or dt.utcnow()).timestamp()
+    count = len(posts)
+
+    pub_dates = np.fromiter((p.pub_date.timestamp() for p in posts), np.float64, count)
+
+    # per-creator and per-type signals are computed once, then broadcast to
+    # the posts through index arrays, numbered in order of appearance
+    creators, types = {}, {}
+    creator_index = np.fromiter(
+        (creators.setdefault(p.creator, len(creators)) for p in posts), np.intp, count
+    )
+    type_index = np.fromiter(
+        (types.setdefault(p.post_type or "", len(types)) for p in posts), np.intp, count
+    )
+
+    # connections accepted before accepted_at was recorded have none, they
+    # are long established: -inf gives them an affinity of 1
+    since_by_creator = {
+        str(creator): accepted_at.timestamp() if accepted_at else -np.inf
+        for creator, accepted_at in connected_since.items()
+    }
+    since = np.fromiter(
+        (since_by_creator.get(str(c), now) for c in creators), np.float64, len(creators)
+    )
+    affinities = 1.0 - np.exp(
+        -(now - since) / 86400.0 / config["FEED_RANK_AFFINITY_DAYS"]
+    )
+
+    post_type_weights = config["FEED_RANK_POST_TYPE_WEIGHTS"]
+    weights = np.fromiter(
+        (post_type_weights.get(t, 1.0) for t in types), np.float64, len(types)
+    )
+
+    scores = score_posts(
+        (now - pub_dates) / 3600.0,
+        affinities[creator_index],
+        weights[type_index],
+        config["FEED_RANK_RECENCY_HALF_LIFE"],
+        config["FEED_RANK_RECENCY_WEIGHT"],
+        config["FEED_RANK_AFFINITY_WEIGHT"],
+    )
+    order = np.argsort(-scores, kind="stable")
+    return [posts[i] for i in order]
@@ -0,0 +1,132 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta as td
+
+
+class BloomFilter:
+    """
+    Fixed size set membership filter: no false negatives, and false positives
+    at about error_rate once `capacity` keys were added. `count` is the number
+    of distinct keys added, keys it already holds are not counted again.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(
+            8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # double hashing: the k positions are derived from two 64 bits hashes
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        new = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationFilter:
+    """
+    Per-process filter of revoked tokens, answering "definitely not revoked"
+    without a query. It is warmed from the blacklist_tokens table, then kept
+    current with the rows written by this process (add) and, every
+    `refresh_interval` seconds, the rows written by other processes (refresh).
+    """
+
+    # rows are read back this far before the newest one seen, so that rows
+    # committed late by other workers are not missed
+    OVERLAP = td(minutes=1)
+
+    def __init__(self, capacity, refresh_interval, load_since):
+        """
+        :param capacity: int, expected number of revoked tokens
+        :param refresh_interval: float, seconds between two refreshes
+        :param load_since: callable(datetime | None) -> iterable of (token, blacklisted_on)
+        """
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.load_since = load_since
+        self.bloom = None
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Loads the tokens revoked since the last refresh, and everything on the
+        first one. A new filter is built aside and swapped in, so that
+        concurrent readers always see a complete one.
+        """
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        bloom, watermark = self.bloom, self.watermark
+        if bloom is not None:
+            since = watermark - self.OVERLAP if watermark else None
+            rows = list(self.load_since(since))
+            # the rows of the overlap window read again are already in the filter
+            added = sum(1 for token, _ in rows if token not in bloom)
+            if bloom.count + added > bloom.capacity:
+                # too full to stay selective, rebuild from scratch twice as large
+                self.capacity = (bloom.count + added) * 2
+                bloom = None
+        if bloom is None:
+            rows = list(self.load_since(None))
+            bloom = BloomFilter(max(self.capacity, len(rows) * 2))
+            watermark = None
+        for token, blacklisted_on in rows:
+            bloom.add(token)
+            if watermark is None or blacklisted_on > watermark:
+                watermark = blacklisted_on
+        self.bloom, self.watermark = bloom, watermark
+        self.refreshed_at = time.monotonic()
+
+    def add(self, token):
+        """
+        Records a token revoked by this process
+        :param token: str
+        """
+        with self._lock:
+            bloom = self.bloom
+            if bloom is not None:
+                bloom.add(token)
+
+    def might_be_revoked(self, token):
+        """
+        Returns False when the token is definitely not revoked, True when the
+        database has to be consulted
+        :param token: str
+        :return: boolean
+        """
+        bloom = self.bloom
+        if bloom is None or self._stale():
+            with self._lock:
+                # unless refreshed by a thread this one waited for
+                if self.bloom is None or self._stale():
+                    self._refresh()
+            bloom = self.bloom
+        return token in bloom
+
+    def _stale(self):
+        return time.monotonic() - self.refreshed_at >= self.refresh_interval
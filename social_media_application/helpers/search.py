@@ -0,0 +1,444 @@
+"""
+Search backends.
+
+/search and /search/users run their queries through the backend in
+app.extensions["search_backend"], chosen by SEARCH_BACKEND:
+- "sql": SQLSearchBackend, everything answered by Postgres (full text search
+  on Post.search_vector, tag index, trigram indexes),
+- "index": IndexSearchBackend, full text search answered by an in-process
+  BM25 inverted index of the posts, everything else like "sql".
+Views tell the backend about the posts they write or remove once committed.
+"""
+from flask import current_app as app
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime as dt
+from datetime import timedelta as td
+from sqlalchemy import Float, cast, extract, func, literal, or_, tuple_, union
+from sqlalchemy.orm import joinedload
+
+from social_media_application.models import db, Post, User, Profile, Tag, PostTag
+from social_media_application.models.post import SEARCH_LANGUAGE
+from social_media_application.helpers.pagination import (
+    encode_cursor,
+    decode_cursor,
+    fetch_page,
+)
+from social_media_application.helpers.search_index import InvertedIndex
+from social_media_application.helpers.tags import normalize_tag
+
+
+def search_backend():
+    """
+    Returns the search backend of the application
+    :return: SearchBackend
+    """
+    return app.extensions["search_backend"]
+
+
+class SearchBackend:
+    """
+    Interface of the search backends. Paginated searches take and return
+    opaque cursors, like the list endpoints.
+    """
+
+    def find_user(self, username):
+        """
+        Returns the user having this exact username, or None
+        :param username: str
+        :return: User | None
+        """
+        raise NotImplementedError
+
+    def suggest_users(self, prefix, limit):
+        """
+        Returns the users whose username, first or last name starts with
+        prefix or looks like it, best matches first
+        :param prefix: str
+        :param limit: int
+        :return: list, of objects with id, username, first_name, last_name, profile_pic
+        """
+        raise NotImplementedError
+
+    def titled_posts(self, title):
+        """
+        Returns the posts having this exact title
+        :param title: str
+        :return: list of Post
+        """
+        raise NotImplementedError
+
+    def tagged_posts(self, tag, limit, cursor=None):
+        """
+        Returns a page of the posts having this tag, newest first, and the
+        cursor of the next page
+        :param tag: str
+        :param limit: int
+        :param cursor: str | None
+        :return: tuple
+        """
+        raise NotImplementedError
+
+    def rank_posts(self, text, as_of, limit, after=None):
+        """
+        Returns the posts matching a full text query, best first, with their
+        score. Scores depend on as_of (recency), not on the time of the call.
+        :param text: str
+        :param as_of: datetime, utc
+        :param limit: int
+        :param after: tuple | None, (score, id) of the last post of the previous page
+        :return: list of (Post, float)
+        """
+        raise NotImplementedError
+
+    def search_posts(self, text, limit, cursor=None):
+        """
+        Returns a page of the posts matching a full text query, best first,
+        and the cursor of the next page. The cursor keeps the time the first
+        page was ranked at, so that later pages follow the same order.
+        :param text: str
+        :param limit: int
+        :param cursor: str | None
+        :return: tuple
+        """
+        if cursor:
+            as_of, *after = decode_cursor(cursor, dt, float, uuid.UUID)
+        else:
+            as_of, after = dt.utcnow(), None
+        results = self.rank_posts(text, as_of, limit + 1, after)
+        if len(results) <= limit:
+            return [post for post, _ in results], None
+        results = results[:limit]
+        post, score = results[-1]
+        return [post for post, _ in results], encode_cursor(as_of, score, post.id)
+
+    def posts_written(self, posts):
+        """
+        Called with the posts created or updated by a committed transaction
+        :param posts: list of Post
+        """
+
+    def posts_removed(self, post_ids):
+        """
+        Called with the ids of the posts deleted or archived by a committed transaction
+        :param post_ids: list of uuid
+        """
+
+
+def _prefix_pattern(text):
+    # LIKE pattern matching strings starting with text, taken literally
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+class SQLSearchBackend(SearchBackend):
+    """
+    Searches answered by Postgres, through the indexes of the searched columns.
+    Postgres keeps them current, so writes need no notification.
+    """
+
+    def find_user(self, username):
+        return User.query.filter_by(username=username).first()
+
+    def suggest_users(self, prefix, limit):
+        """
+        Prefix matches are case insensitive, similar names are the ones above
+        pg_trgm.similarity_threshold (pg_trgm `%`). Candidates are looked up per
+        table through the trigram GIN indexes, then joined to their profile in
+        the same statement.
+        """
+        pattern = _prefix_pattern(prefix)
+
+        def matches(column):
+            return or_(column.ilike(pattern, escape="\\"), column.op("%")(prefix))
+
+        candidates = union(
+            db.select(User.id).where(matches(User.username)),
+            db.select(Profile.user.label("id")).where(
+                or_(matches(Profile.first_name), matches(Profile.last_name))
+            ),
+        ).subquery()
+        is_prefix = or_(
+            User.username.ilike(pattern, escape="\\"),
+            Profile.first_name.ilike(pattern, escape="\\"),
+            Profile.last_name.ilike(pattern, escape="\\"),
+        )
+        similarity = func.greatest(
+            func.similarity(User.username, prefix),
+            func.similarity(func.coalesce(Profile.first_name, ""), prefix),
+            func.similarity(func.coalesce(Profile.last_name, ""), prefix),
+        )
+        statement = (
+            db.select(
+                User.id,
+                User.username,
+                Profile.first_name,
+                Profile.last_name,
+                Profile.profile_pic,
+            )
+            .join(candidates, candidates.c.id == User.id)
+            .outerjoin(Profile, Profile.user == User.id)
+            .where(User.archive == False)
+            .order_by(is_prefix.desc(), similarity.desc(), User.username)
+            .limit(limit)
+        )
+        return db.session.execute(statement).all()
+
+    def titled_posts(self, title):
+        return Post.query.filter(Post.title == title).all()
+
+    def tagged_posts(self, tag, limit, cursor=None):
+        post_tags, next_cursor = fetch_page(
+            db.select(PostTag)
+            .join(Tag)
+            .where(Tag.name == normalize_tag(tag))
+            .options(joinedload(PostTag.post)),
+            (PostTag.pub_date, PostTag.post_id),
+            limit,
+            cursor,
+            descending=True,
+        )
+        return [post_tag.post for post_tag in post_tags], next_cursor
+
+    def rank_posts(self, text, as_of, limit, after=None):
+        """
+        The query follows the web search syntax ("quoted phrase", or, -word).
+        score = ts_rank / (1 + age / SEARCH_RECENCY_HALF_LIFE), age in hours at as_of
+        """
+        query = func.websearch_to_tsquery(SEARCH_LANGUAGE, text)
+        age = cast(extract("epoch", literal(as_of) - Post.pub_date), Float) / 3600.0
+        decay = 1.0 + func.greatest(age, 0.0, type_=Float) / float(
+            app.config["SEARCH_RECENCY_HALF_LIFE"]
+        )
+        score = cast(func.ts_rank(Post.search_vector, query), Float) / decay
+        statement = (
+            db.select(Post, score)
+            .where(Post.search_vector.bool_op("@@")(query))
+            .where(Post.archive == False)
+        )
+        if after is not None:
+            statement = statement.where(tuple_(score, Post.id) < tuple_(*after))
+        statement = statement.order_by(score.desc(), Post.id.desc()).limit(limit)
+        return db.session.execute(statement).all()
+
+
+class IndexSearchBackend(SQLSearchBackend):
+    """
+    Full text search answered by an in-process InvertedIndex of the posts,
+    matching the query like SQLSearchBackend does (same web search syntax,
+    stemming and stop words; phrases require their words in any order),
+    scored by BM25 / (1 + age / SEARCH_RECENCY_HALF_LIFE). Other searches
+    run in SQL.
+
+    The index is loaded by the first search, from the snapshot at
+    SEARCH_INDEX_PATH when there is one (see `flask search-index`), otherwise
+    built from the post table; concurrent searches wait for that one load.
+    The posts written or removed by this process are applied to it at once,
+    and journaled: when a newer snapshot is loaded, the journaled posts are
+    read again from the post table, so that the snapshot does not undo them.
+    Every `refresh_interval` seconds, the index also takes the posts other
+    processes published since its newest one, and the snapshot if it was
+    rebuilt. Edits and removals made by other processes show up at the next
+    snapshot; removed posts are never returned meanwhile, posts are read from
+    the database.
+    """
+
+    # posts are read back this far before the newest one indexed, so that
+    # posts committed late by other workers are not missed
+    OVERLAP = td(minutes=1)
+    # journaled writes are kept this long after a snapshot was written,
+    # longer than a snapshot takes to build
+    JOURNAL_RETENTION = td(hours=1)
+
+    def __init__(self, path=None, refresh_interval=30.0):
+        """
+        :param path: str | None, snapshot file
+        :param refresh_interval: float, seconds between two refreshes
+        """
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self.loaded_at = None  # modification time of the snapshot loaded
+        self.refreshed_at = 0.0
+        # post id -> pub_date of the posts read by the last refresh, which
+        # the next one reads again through OVERLAP
+        self._refreshed = {}
+        self._journal = {}  # post id -> time it was written by this process
+        self._lock = threading.Lock()
+        # held by the thread loading, building or refreshing the index
+        self._build_lock = threading.RLock()
+
+    @staticmethod
+    def _rows(query):
+        return db.session.execute(
+            query.with_only_columns(
+                Post.id, Post.title, Post.content, Post.tags, Post.pub_date
+            )
+            .where(Post.archive == False)
+            .execution_options(yield_per=app.config["STREAM_BATCH_SIZE"])
+        )
+
+    def _prune(self, since):
+        # forgets the posts journaled before `since` (epoch seconds), returns the others
+        with self._lock:
+            self._journal = {
+                post_id: written
+                for post_id, written in self._journal.items()
+                if written >= since
+            }
+            return list(self._journal)
+
+    def _replay(self, index, since):
+        # reads again the journaled posts written since `since` into index
+        post_ids = self._prune(since)
+        if not post_ids:
+            return
+        rows = {
+            row.id: row
+            for row in self._rows(db.select(Post).where(Post.id.in_(post_ids)))
+        }
+        for post_id in post_ids:
+            if post_id in rows:
+                index.add(*rows[post_id])
+            else:
+                index.remove(post_id)
+
+    def rebuild(self):
+        """
+        Builds the index from the post table, written to the snapshot file if any
+        :return: int, number of posts indexed
+        """
+        with self._build_lock:
+            started = time.time()
+            index = InvertedIndex.from_posts(self._rows(db.select(Post)), self.path)
+            with self._lock:
+                self.index = index
+                self._refreshed = {}
+                self.refreshed_at = time.monotonic()
+                if self.path:
+                    self.loaded_at = os.path.getmtime(self.path)
+            self._replay(index, started - self.OVERLAP.total_seconds())
+            return len(index)
+
+    def refresh(self):
+        """
+        Loads the snapshot if it changed, and indexes the posts published
+        since the newest one of the index
+        """
+        with self._build_lock:
+            if self.path and os.path.exists(self.path):
+                modified = os.path.getmtime(self.path)
+                if modified != self.loaded_at:
+                    try:
+                        index = InvertedIndex.load(self.path)
+                    except ValueError:
+                        # written by a version indexing other terms, replaced
+                        self.rebuild()
+                        return
+                    with self._lock:
+                        self.index = index
+                        self._refreshed = {}
+                        self.loaded_at = modified
+                    self._replay(
+                        index, modified - self.JOURNAL_RETENTION.total_seconds()
+                    )
+            self.refreshed_at = time.monotonic()
+            # the next snapshot will be newer than the one loaded
+            self._prune(
+                (self.loaded_at or time.time()) - self.JOURNAL_RETENTION.total_seconds()
+            )
+            index = self.index
+            if index is None:
+                return
+            since = dt.utcfromtimestamp(index.watermark) - self.OVERLAP
+            refreshed = {}
+            for row in self._rows(db.select(Post).where(Post.pub_date >= since)):
+                refreshed[row.id] = row.pub_date
+                # already indexed by the previous refresh
+                if self._refreshed.get(row.id) != row.pub_date:
+                    index.add(*row)
+            self._refreshed = refreshed
+
+    def _ready(self):
+        if self.index is None:
+            with self._build_lock:
+                if self.index is None:
+                    if self.path and os.path.exists(self.path):
+                        self.refresh()
+                    else:
+                        self.rebuild()
+        elif time.monotonic() - self.refreshed_at > self.refresh_interval:
+            # one thread refreshes, the others search the current index
+            if self._build_lock.acquire(blocking=False):
+                try:
+                    self.refresh()
+                finally:
+                    self._build_lock.release()
+        return self.index
+
+    def rank_posts(self, text, as_of, limit, after=None):
+        index = self._ready()
+        half_life = app.config["SEARCH_RECENCY_HALF_LIFE"]
+        results = []
+        while len(results) < limit:
+            hits = index.search(text, as_of, limit - len(results), after, half_life)
+            if not hits:
+                break
+            posts = {
+                post.id: post
+                for post in Post.query.filter(Post.id.in_([id for id, _ in hits]))
+                .filter(Post.archive == False)
+                .all()
+            }
+            for post_id, score in hits:
+                if post_id in posts:
+                    results.append((posts[post_id], score))
+                else:
+                    # removed by another process
+                    index.remove(post_id)
+            post_id, score = hits[-1]
+            after = (score, post_id)
+        return results
+
+    def _journal_writes(self, post_ids):
+        written = time.time()
+        with self._lock:
+            for post_id in post_ids:
+                self._journal[post_id] = written
+            return self.index
+
+    def posts_written(self, posts):
+        index = self._journal_writes([post.id for post in posts])
+        if index is None:
+            return
+        for post in posts:
+            if post.archive:
+                index.remove(post.id)
+            else:
+                index.add(post.id, post.title, post.content, post.tags, post.pub_date)
+
+    def posts_removed(self, post_ids):
+        index = self._journal_writes(post_ids)
+        if index is None:
+            return
+        for post_id in post_ids:
+            index.remove(post_id)
+
+
+def make_search_backend(config):
+    """
+    Returns the search backend named by SEARCH_BACKEND
+    :param config: dict, the application config
+    :return: SearchBackend
+    """
+    name = config["SEARCH_BACKEND"]
+    if name == "sql":
+        return SQLSearchBackend()
+    if name == "index":
+        return IndexSearchBackend(
+            config["SEARCH_INDEX_PATH"], config["SEARCH_INDEX_REFRESH"]
+        )
+    raise ValueError("unknown SEARCH_BACKEND {}".format(name))
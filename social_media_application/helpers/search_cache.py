@@ -0,0 +1,228 @@
+from flask import request
+from flask import current_app as app
+
+import re
+import threading
+import time
+from functools import wraps
+
+from social_media_application.helpers.cache import TinyLFUCache
+from social_media_application.helpers.tags import normalize_tag, parse_tags
+
+# response headers kept with a cached body
+_CACHED_HEADERS = ("Content-Type", "X-Next-Cursor", "Link")
+
+
+class SearchCache:
+    """
+    Serialized responses of /search and /search/users, keyed on the
+    normalized query, in a TinyLFUCache bounded in bytes. Each entry is
+    stored with the topics its results depend on (see search_topics),
+    through which writes invalidate it. A response is computed under a fill
+    (see reserve), an invalidation of its topics meanwhile makes complete
+    drop it, it may have been read before the write committed. Keeps the hit
+    ratio and the time saved by hits, the time the response took to compute
+    when it was cached.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        """
+        :param max_bytes: int, total size of the bodies kept
+        :param ttl: float, seconds an entry is served for at most
+        """
+        self.cache = TinyLFUCache(max_bytes, ttl)
+        self.saved = 0.0
+        self._lock = threading.Lock()
+        # fill -> topics of the responses being computed, and the fills
+        # whose topics were invalidated since
+        self._filling = {}
+        self._stale = set()
+        self._fills = 0
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is not None:
+            with self._lock:
+                self.saved += entry[3]
+        return entry
+
+    def set(self, key, response, elapsed, topics):
+        body = response.get_data()
+        headers = [
+            (name, response.headers[name])
+            for name in _CACHED_HEADERS
+            if name in response.headers
+        ]
+        self.cache.set(
+            key, (body, response.status_code, headers, elapsed), len(body), topics
+        )
+
+    def reserve(self, topics):
+        """
+        Registers a response about to be computed, to pass to complete
+        :param topics: set, the topics its results depend on
+        :return: int, the fill
+        """
+        with self._lock:
+            self._fills += 1
+            self._filling[self._fills] = topics
+            return self._fills
+
+    def complete(self, fill, key, response, elapsed):
+        """
+        Ends a fill, storing response unless its topics were invalidated since
+        reserve
+        :param fill: int, from reserve
+        :param key: the cache key
+        :param response: Response | None, None stores nothing
+        :param elapsed: float, seconds the response took to compute
+        :return: bool, whether response was stored
+        """
+        with self._lock:
+            topics = self._filling.pop(fill)
+            if fill in self._stale:
+                self._stale.discard(fill)
+                return False
+            if response is None:
+                return False
+            self.set(key, response, elapsed, topics)
+            return True
+
+    def invalidate(self, topics):
+        with self._lock:
+            for fill, fill_topics in self._filling.items():
+                if not fill_topics.isdisjoint(topics):
+                    self._stale.add(fill)
+            return self.cache.discard_topics(topics)
+
+    def stats(self):
+        """
+        Returns the counters of the cache
+        :return: dict
+        """
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "hit_ratio": self.cache.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": self.saved,
+            "entries": len(self.cache),
+            "bytes": self.cache.size,
+            "max_bytes": self.cache.max_bytes,
+            "evictions": self.cache.evictions,
+            "rejections": self.cache.rejections,
+        }
+
+
+def search_cache():
+    return app.extensions.get("search_cache")
+
+
+def _limit(default_limit, max_limit):
+    # the limit page_args would settle on, None when it would reject it
+    try:
+        limit = int(request.args.get("limit", default_limit))
+    except ValueError:
+        return None
+    return min(limit, max_limit) if limit >= 1 else None
+
+
+def search_query():
+    """
+    Returns the cache key of the current search request and the topics its
+    results depend on, or None when the request is not cacheable. The key
+    only keeps what the view reads, normalized the way the view does.
+    :return: tuple | None
+    """
+    args = request.args
+    if request.path == "/search/users":
+        prefix = args.get("prefix", "").strip().lower()
+        limit = _limit(
+            app.config["SEARCH_USERS_LIMIT"], app.config["SEARCH_USERS_MAX_LIMIT"]
+        )
+        if not prefix or limit is None:
+            return None
+        return ("users", prefix, limit), {("users",)}
+    if args.get("username"):
+        username = args.get("username")
+        return ("username", username), {("user", username)}
+    limit = _limit(app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+    if limit is None:
+        return None
+    cursor = args.get("cursor")
+    if args.get("tag"):
+        tag = normalize_tag(args.get("tag"))
+        return ("tag", tag, limit, cursor), {("tag", tag)}
+    if args.get("post"):
+        title = args.get("post")
+        return ("post", title), {("title", title)}
+    if args.get("q"):
+        text = " ".join(re.split(r"\s+", args.get("q").strip().lower()))
+        return ("q", text, limit, cursor), {("text",)}
+    return None
+
+
+def cached_search(f):
+    """
+    Serves the search view from the search cache, and caches its successful
+    responses
+    """
+
+    @wraps(f)
+    def decorator(*args, **kwargs):
+        cache = search_cache()
+        query = search_query() if cache is not None else None
+        if query is None:
+            return f(*args, **kwargs)
+        key, topics = query
+        entry = cache.get(key)
+        if entry is not None:
+            body, status, headers, _ = entry
+            return app.response_class(body, status=status, headers=headers)
+        fill = cache.reserve(topics)
+        response = None
+        start = time.perf_counter()
+        try:
+            response = app.make_response(f(*args, **kwargs))
+        finally:
+            cache.complete(
+                fill,
+                key,
+                response
+                if response is not None and response.status_code == 200
+                else None,
+                time.perf_counter() - start,
+            )
+        return response
+
+    return decorator
+
+
+def search_topics(posts=(), users=()):
+    """
+    Returns the topics of the cached searches whose results may include
+    these posts or users. Call it on the old state as well as the new one
+    when they are updated.
+    :param posts: iterable of Post
+    :param users: iterable of User
+    :return: set
+    """
+    topics = set()
+    for post in posts:
+        topics.add(("title", post.title))
+        topics.add(("text",))
+        topics.update(("tag", tag) for tag in parse_tags(post.tags))
+    for user in users:
+        topics.add(("user", user.username))
+        topics.add(("users",))
+    return topics
+
+
+def invalidate_search(topics):
+    """
+    Drops the cached searches depending on topics, once the writes are committed
+    :param topics: set, from search_topics
+    """
+    cache = search_cache()
+    if cache is not None and topics:
+        cache.invalidate(topics)
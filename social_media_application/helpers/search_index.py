@@ -0,0 +1,567 @@
+"""
+In-process inverted index of posts (title, content and tags), scored with BM25.
+Text is split into words the way Postgres' english text search configuration
+does (SEARCH_LANGUAGE): lower cased, stop words dropped, Snowball stemmed.
+
+The index is made of segments: immutable sets of numpy arrays holding the
+documents (post id, length, publication time) and the postings of every term
+(document numbers and term frequencies). The base segment is read from a
+snapshot file through a memory map, so that a worker starts with the whole
+index without parsing or copying it, and shares its pages with the other
+workers of the host. Posts indexed afterwards go to an in-memory buffer, sealed
+into a segment of its own every BUFFER_SIZE posts. Removing a post, or indexing
+a new version of it, masks its previous document; a segment is rewritten
+without its masked documents once they are COMPACT_RATIO of it.
+"""
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import uuid
+from array import array
+from datetime import timezone
+from functools import reduce
+
+import numpy as np
+import snowballstemmer
+
+_WORD = re.compile(r"\w+")
+# words of a web search query: "quoted phrases", -negations, or plain words
+_QUERY = re.compile(r'(-?)"([^"]*)"?|(-?)([^\s"]+)')
+
+# the stop words of Postgres' english dictionary
+_STOP_WORDS = frozenset(
+    """
+    i me my myself we our ours ourselves you your yours yourself yourselves
+    he him his himself she her hers herself it its itself they them their
+    theirs themselves what which who whom this that these those am is are was
+    were be been being have has had having do does did doing a an the and but
+    if or because as until while of at by for with about against between into
+    through during before after above below to from up down in out on off over
+    under again further then once here there when where why how all any both
+    each few more most other some such no nor not only own same so than too
+    very s t can will just don should now
+    """.split()
+)
+_stemmer = snowballstemmer.stemmer("english")
+_stems = {}
+
+# snapshot layout: header, then the sections below in order, each one
+# starting on an 8 bytes boundary. Bumped when the terms change.
+_MAGIC = b"SMIDX002"
+_HEADER = struct.Struct("<8sQQQQd")  # magic, docs, terms, postings, term bytes, watermark
+_SECTIONS = (
+    ("ids", "S16", "docs"),
+    ("order", np.uint32, "docs"),
+    ("lengths", np.uint32, "docs"),
+    ("pub_dates", np.float64, "docs"),
+    ("term_starts", np.uint64, "terms+1"),
+    ("starts", np.uint64, "terms+1"),
+    ("docs", np.uint32, "postings"),
+    ("tfs", np.uint32, "postings"),
+    ("terms", np.uint8, "term bytes"),
+)
+
+
+def _stem(word):
+    stem = _stems.get(word)
+    if stem is None:
+        if len(_stems) > 100000:
+            _stems.clear()
+        stem = _stems[word] = _stemmer.stemWord(word)
+    return stem
+
+
+def tokenize(text):
+    """
+    Returns the terms of text: its lower case words, stemmed, without stop words
+    :param text: str | None
+    :return: list of str
+    """
+    if not text:
+        return []
+    words = _WORD.findall(text.lower())
+    return [_stem(word) for word in words if word not in _STOP_WORDS]
+
+
+def parse_query(text):
+    """
+    Reads a web search query the way websearch_to_tsquery does: clauses
+    separated by `or`, each one matched by the documents having all of its
+    terms and none of its negated groups (-word, -"some phrase"). A quoted
+    phrase requires all of its words, in any order.
+    :param text: str
+    :return: list of (list of str, list of list of str), terms and negated groups
+    """
+    clauses = [([], [])]
+    for match in _QUERY.finditer(text):
+        phrase = match.group(2)
+        negated = bool(match.group(1) if phrase is not None else match.group(3))
+        if phrase is None and not negated and match.group(4).lower() == "or":
+            clauses.append(([], []))
+            continue
+        terms = tokenize(phrase if phrase is not None else match.group(4))
+        if not terms:
+            continue
+        if negated:
+            clauses[-1][1].append(terms)
+        else:
+            clauses[-1][0].extend(terms)
+    # a clause of negations only matches nothing
+    return [clause for clause in clauses if clause[0]]
+
+
+def timestamp(value):
+    """
+    Returns the POSIX timestamp of a naive utc datetime
+    :param value: datetime
+    :return: float
+    """
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _key(post_id):
+    # ids are compared as numpy S16 values, which drop trailing null bytes
+    return post_id.bytes.rstrip(b"\0")
+
+
+class _Segment:
+    """
+    Documents numbered 0..n-1 and the postings of their terms, sorted by term:
+    the postings of the i-th term are docs[starts[i]:starts[i + 1]].
+    """
+
+    def __init__(self, arrays, source=None):
+        for name, _, _ in _SECTIONS:
+            setattr(self, name, arrays[name])
+        self.source = source  # keeps the memory map open
+        self.deleted = np.zeros(len(self.ids), dtype=bool)
+        self.removed = 0  # number of documents masked
+
+    def _term(self, i):
+        return self.terms[int(self.term_starts[i]) : int(self.term_starts[i + 1])].tobytes()
+
+    def postings(self, term):
+        """
+        Returns the (docs, tfs) arrays of term, None when no document has it
+        :param term: str
+        :return: tuple | None
+        """
+        key = term.encode()
+        low, high = 0, len(self.term_starts) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.term_starts) - 1 or self._term(low) != key:
+            return None
+        start, stop = int(self.starts[low]), int(self.starts[low + 1])
+        return self.docs[start:stop], self.tfs[start:stop]
+
+    def locate(self, post_id):
+        """
+        Returns the number of the live document of post_id, or None
+        :param post_id: uuid
+        :return: int | None
+        """
+        key = _key(post_id)
+        low, high = 0, len(self.order)
+        while low < high:
+            middle = (low + high) // 2
+            if self.ids[self.order[middle]] < key:
+                low = middle + 1
+            else:
+                high = middle
+        while low < len(self.order) and self.ids[self.order[low]] == key:
+            doc = int(self.order[low])
+            if not self.deleted[doc]:
+                return doc
+            low += 1
+        return None
+
+
+class _Builder:
+    """
+    Mutable set of documents, turned into a _Segment by build()
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.lengths = array("I")
+        self.pub_dates = array("d")
+        self.postings = {}  # term -> (array of docs, array of tfs)
+        self.located = {}  # post id -> doc
+        self.deleted = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, post_id, pub_date, words):
+        doc = len(self.ids)
+        counts = {}
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+        for term, tf in counts.items():
+            docs, tfs = self.postings.setdefault(term, (array("I"), array("I")))
+            docs.append(doc)
+            tfs.append(tf)
+        self.ids.append(post_id.bytes)
+        self.lengths.append(len(words))
+        self.pub_dates.append(pub_date)
+        self.located[post_id] = doc
+
+    def remove(self, post_id):
+        doc = self.located.pop(post_id, None)
+        if doc is not None:
+            self.deleted.add(doc)
+        return doc
+
+    def build(self):
+        terms = sorted(self.postings, key=str.encode)
+        encoded = [term.encode() for term in terms]
+        counts = [len(self.postings[term][0]) for term in terms]
+        ids = np.array(self.ids, dtype="S16")
+        term_starts = np.zeros(len(terms) + 1, dtype=np.uint64)
+        term_starts[1:] = np.cumsum([len(term) for term in encoded], dtype=np.uint64)
+        starts = np.zeros(len(terms) + 1, dtype=np.uint64)
+        starts[1:] = np.cumsum(counts, dtype=np.uint64)
+        arrays = {
+            "ids": ids,
+            "order": np.argsort(ids, kind="stable").astype(np.uint32),
+            "lengths": np.frombuffer(self.lengths, dtype=np.uint32).copy(),
+            "pub_dates": np.frombuffer(self.pub_dates, dtype=np.float64).copy(),
+            "term_starts": term_starts,
+            "starts": starts,
+            "docs": np.concatenate(
+                [np.frombuffer(self.postings[t][0], dtype=np.uint32) for t in terms]
+                or [np.zeros(0, np.uint32)]
+            ),
+            "tfs": np.concatenate(
+                [np.frombuffer(self.postings[t][1], dtype=np.uint32) for t in terms]
+                or [np.zeros(0, np.uint32)]
+            ),
+            "terms": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+        segment = _Segment(arrays)
+        segment.deleted[list(self.deleted)] = True
+        segment.removed = len(self.deleted)
+        return segment
+
+
+def compact(segment):
+    """
+    Returns a copy of a segment without its masked documents, nor the terms
+    only they had. Documents are renumbered in the same order.
+    :param segment: _Segment
+    :return: _Segment
+    """
+    live = ~segment.deleted
+    renumber = (np.cumsum(live) - 1).astype(np.uint32)
+    counts = np.diff(segment.starts.astype(np.int64))
+    term_count = len(counts)
+    keep = live[segment.docs]
+    kept = np.bincount(
+        np.repeat(np.arange(term_count), counts)[keep], minlength=term_count
+    )
+    terms = kept > 0
+    term_lengths = np.diff(segment.term_starts.astype(np.int64))
+    term_starts = np.zeros(int(terms.sum()) + 1, dtype=np.uint64)
+    term_starts[1:] = np.cumsum(term_lengths[terms], dtype=np.uint64)
+    starts = np.zeros(len(term_starts), dtype=np.uint64)
+    starts[1:] = np.cumsum(kept[terms], dtype=np.uint64)
+    ids = segment.ids[live]
+    return _Segment(
+        {
+            "ids": ids,
+            "order": np.argsort(ids, kind="stable").astype(np.uint32),
+            "lengths": segment.lengths[live],
+            "pub_dates": segment.pub_dates[live],
+            "term_starts": term_starts,
+            "starts": starts,
+            "docs": renumber[segment.docs[keep]],
+            "tfs": segment.tfs[keep],
+            "terms": segment.terms[np.repeat(terms, term_lengths)],
+        }
+    )
+
+
+def write_snapshot(segment, path, watermark):
+    """
+    Writes a segment to path, atomically (through a temporary file renamed over it)
+    :param segment: _Segment
+    :param path: str
+    :param watermark: float, timestamp of the newest post indexed
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    _MAGIC,
+                    len(segment.ids),
+                    len(segment.term_starts) - 1,
+                    len(segment.docs),
+                    len(segment.terms),
+                    watermark,
+                )
+            )
+            for name, dtype, _ in _SECTIONS:
+                f.write(b"\0" * (-f.tell() % 8))
+                f.write(np.ascontiguousarray(getattr(segment, name), dtype=dtype).tobytes())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def read_snapshot(path):
+    """
+    Returns the segment stored in a snapshot file, and its watermark. The
+    arrays are views over a read only memory map of the file.
+    :param path: str
+    :return: tuple
+    """
+    with open(path, "rb") as f:
+        source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, docs, terms, postings, term_bytes, watermark = _HEADER.unpack_from(source)
+    if magic != _MAGIC:
+        raise ValueError("{} is not a search index snapshot".format(path))
+    sizes = {"docs": docs, "terms+1": terms + 1, "postings": postings, "term bytes": term_bytes}
+    arrays = {}
+    offset = _HEADER.size
+    for name, dtype, size in _SECTIONS:
+        offset += -offset % 8
+        arrays[name] = np.frombuffer(source, dtype=dtype, count=sizes[size], offset=offset)
+        offset += arrays[name].nbytes
+    return _Segment(arrays, source), watermark
+
+
+class InvertedIndex:
+    """
+    BM25 index of posts, see the module docstring. Thread safe.
+    """
+
+    # posts buffered in memory before they are sealed into a segment
+    BUFFER_SIZE = 1000
+    # share of masked documents above which a segment is compacted
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, k1=1.2, b=0.75):
+        """
+        :param k1: float, BM25 term frequency saturation
+        :param b: float, BM25 document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.segments = []
+        self.buffer = _Builder()
+        self.watermark = 0.0  # timestamp of the newest post indexed
+        self._buffered = None  # segment built from the buffer, until it changes
+        self._docs = 0
+        self._words = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Returns an index starting from a snapshot file
+        :param path: str
+        :return: InvertedIndex
+        """
+        index = cls(**kwargs)
+        segment, watermark = read_snapshot(path)
+        index._start(segment, watermark)
+        return index
+
+    @classmethod
+    def from_posts(cls, posts, path=None, **kwargs):
+        """
+        Returns an index of posts, built as a single segment. With path, the
+        segment is written to a snapshot file first, then read back from it.
+        :param posts: iterable of (id, title, content, tags, pub_date), one per post
+        :param path: str | None
+        :return: InvertedIndex
+        """
+        builder = _Builder()
+        watermark = 0.0
+        for post_id, title, content, tags, pub_date in posts:
+            published = timestamp(pub_date)
+            builder.add(post_id, published, tokenize(title) + tokenize(content) + tokenize(tags))
+            watermark = max(watermark, published)
+        segment = builder.build()
+        if path is None:
+            index = cls(**kwargs)
+            index._start(segment, watermark)
+            return index
+        write_snapshot(segment, path, watermark)
+        return cls.load(path, **kwargs)
+
+    def _start(self, segment, watermark):
+        self.segments.append(segment)
+        self.watermark = watermark
+        live = ~segment.deleted
+        self._docs = int(live.sum())
+        self._words = int(segment.lengths[live].sum(dtype=np.uint64))
+
+    def __len__(self):
+        return self._docs
+
+    def add(self, post_id, title, content, tags, pub_date):
+        """
+        Indexes a post, replacing the document of its previous version
+        :param post_id: uuid
+        :param title: str | None
+        :param content: str | None
+        :param tags: str | None
+        :param pub_date: datetime, naive utc
+        """
+        words = tokenize(title) + tokenize(content) + tokenize(tags)
+        published = timestamp(pub_date)
+        with self._lock:
+            self._remove(post_id)
+            self.buffer.add(post_id, published, words)
+            self._buffered = None
+            self._docs += 1
+            self._words += len(words)
+            self.watermark = max(self.watermark, published)
+            if len(self.buffer) >= self.BUFFER_SIZE:
+                self._seal()
+
+    def remove(self, post_id):
+        """
+        Removes a post from the index, if it is there
+        :param post_id: uuid
+        """
+        with self._lock:
+            self._remove(post_id)
+
+    def _remove(self, post_id):
+        doc = self.buffer.remove(post_id)
+        if doc is not None:
+            self._buffered = None
+            length = self.buffer.lengths[doc]
+        else:
+            for segment in self.segments:
+                doc = segment.locate(post_id)
+                if doc is not None:
+                    segment.deleted[doc] = True
+                    segment.removed += 1
+                    length = int(segment.lengths[doc])
+                    if segment.removed >= self.COMPACT_RATIO * len(segment.ids):
+                        self._compact(segment)
+                    break
+            else:
+                return
+        self._docs -= 1
+        self._words -= length
+
+    def _compact(self, segment):
+        # searches in progress keep the segments they started with
+        compacted = compact(segment)
+        self.segments = [
+            compacted if current is segment else current
+            for current in self.segments
+            if current is not segment or len(compacted.ids)
+        ]
+
+    def _seal(self):
+        if len(self.buffer):
+            self.segments.append(self.buffer.build())
+            self.buffer = _Builder()
+            self._buffered = None
+
+    def _snapshot(self):
+        # segments to query, the buffer built once per change
+        with self._lock:
+            if self._buffered is None and len(self.buffer):
+                self._buffered = self.buffer.build()
+            segments = list(self.segments)
+            if self._buffered is not None:
+                segments.append(self._buffered)
+            return segments, self._docs, self._words
+
+    def search(self, text, as_of, limit, after=None, half_life=168.0):
+        """
+        Returns the ids of the posts matching a web search query (see
+        parse_query), best first, with their score: BM25 of the query terms
+        / (1 + age / half_life), age in hours at as_of.
+        Ties are broken by id, descending.
+        :param text: str
+        :param as_of: datetime, naive utc
+        :param limit: int
+        :param after: tuple | None, (score, id) of the last post of the previous page
+        :param half_life: float, hours
+        :return: list of (uuid, float)
+        """
+        segments, docs, words = self._snapshot()
+        clauses = parse_query(text)
+        terms = list(dict.fromkeys(term for positive, _ in clauses for term in positive))
+        if not docs or not terms:
+            return []
+        negated = {term for _, groups in clauses for group in groups for term in group}
+        average = words / docs
+        now = timestamp(as_of)
+        # term -> live (docs, tfs) of each segment, docs sorted
+        found = {}
+        for term in set(terms) | negated:
+            found[term] = []
+            for segment in segments:
+                postings = segment.postings(term)
+                if postings is None:
+                    found[term].append((np.zeros(0, np.uint32), np.zeros(0, np.uint32)))
+                else:
+                    live = ~segment.deleted[postings[0]]
+                    found[term].append((postings[0][live], postings[1][live]))
+        idfs = {}
+        for term in terms:
+            frequency = sum(len(docs_) for docs_, _ in found[term])
+            idfs[term] = np.log1p((docs - frequency + 0.5) / (frequency + 0.5))
+
+        def having(group, i):
+            # documents of segment i having every term of group
+            return reduce(
+                lambda a, b: np.intersect1d(a, b, assume_unique=True),
+                (found[term][i][0] for term in group),
+            )
+
+        scores, ids = [], []
+        for i, segment in enumerate(segments):
+            matched = np.zeros(0, np.uint32)
+            for positive, groups in clauses:
+                clause = having(positive, i)
+                for group in groups:
+                    clause = np.setdiff1d(clause, having(group, i), assume_unique=True)
+                matched = np.union1d(matched, clause)
+            if not len(matched):
+                continue
+            score = np.zeros(len(matched))
+            for term in terms:
+                docs_, tfs = found[term][i]
+                keep = np.isin(docs_, matched, assume_unique=True)
+                docs_, tfs = docs_[keep], tfs[keep].astype(np.float64)
+                norm = self.k1 * (1 - self.b + self.b * segment.lengths[docs_] / average)
+                score[np.searchsorted(matched, docs_)] += (
+                    idfs[term] * tfs * (self.k1 + 1) / (tfs + norm)
+                )
+            age = np.maximum(now - segment.pub_dates[matched], 0.0) / 3600.0
+            scores.append(score / (1.0 + age / half_life))
+            ids.append(segment.ids[matched])
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        ids = np.concatenate(ids)
+        if after is not None:
+            score, post_id = after
+            key = _key(post_id)
+            keep = (scores < score) | ((scores == score) & (ids < key))
+            scores, ids = scores[keep], ids[keep]
+        best = np.lexsort((ids, scores))[::-1][:limit]
+        return [
+            (uuid.UUID(bytes=bytes(ids[i]).ljust(16, b"\0")), float(scores[i]))
+            for i in best
+        ]
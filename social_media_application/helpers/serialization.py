@@ -0,0 +1,108 @@
+import uuid
+from datetime import date, datetime, time
+
+from marshmallow import fields
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+
+from social_media_application import db, ma
+
+
+# how marshmallow's inferred fields render the column types this app uses,
+# values of other types go through the marshmallow field itself
+_PLAIN = frozenset((str, int, float, bool, type(None)))
+_CONVERTERS = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    time: time.isoformat,
+}
+
+
+def _converter(schema, name, field):
+    def convert(obj, value):
+        converter = _CONVERTERS.get(type(value))
+        if converter is None:
+            return field.serialize(name, obj, accessor=schema.get_attribute)
+        return converter(value)
+
+    return convert
+
+
+def _serializer(schema, name, field):
+    def serialize(obj):
+        return field.serialize(name, obj, accessor=schema.get_attribute)
+
+    return serialize
+
+
+def compile_serializer(schema):
+    """
+    Returns a function turning a model instance into the dict schema.dump
+    would return. Its source is generated from the schema's dump fields:
+    inferred fields read the loaded column values straight from the
+    instance state, method fields call the schema's method, other fields
+    are serialized by marshmallow.
+    :param schema: marshmallow.Schema
+    :return: callable
+    """
+    namespace = {"_PLAIN": _PLAIN, "_UUID": uuid.UUID}
+    lines = ["def serialize(obj):", "    state = obj.__dict__"]
+    items = []
+    for i, (name, field) in enumerate(schema.dump_fields.items()):
+        key = repr(field.data_key or name)
+        if isinstance(field, fields.Method):
+            namespace["f{}".format(i)] = getattr(schema, field.serialize_method_name)
+            items.append("{}: f{}(obj)".format(key, i))
+        elif type(field) is fields.Inferred:
+            attribute = repr(field.attribute or name)
+            namespace["f{}".format(i)] = _converter(schema, name, field)
+            # unloaded (expired, deferred) attributes are not in the state
+            lines.append(
+                "    v{0} = state[{1}] if {1} in state else getattr(obj, {1})".format(
+                    i, attribute
+                )
+            )
+            items.append(
+                "{0}: v{1} if type(v{1}) in _PLAIN"
+                " else str(v{1}) if type(v{1}) is _UUID"
+                " else f{1}(obj, v{1})".format(key, i)
+            )
+        else:
+            namespace["f{}".format(i)] = _serializer(schema, name, field)
+            items.append("{}: f{}(obj)".format(key, i))
+    lines.append("    return {")
+    lines.extend("        {},".format(item) for item in items)
+    lines.append("    }")
+    exec("\n".join(lines), namespace)
+    return namespace["serialize"]
+
+
+class CompiledSchema(ma.Schema):
+    """
+    ma.Schema whose dump of model instances skips the generic marshmallow
+    machinery: a serializer is compiled once per schema instance from its
+    dump fields (honouring only/exclude), then applied to every row.
+    Output is the same as Schema.dump, pre_dump hooks still run; anything
+    other than model instances is dumped by marshmallow.
+    """
+
+    def _row_serializer(self):
+        if "_compiled" not in self.__dict__:
+            self._compiled = compile_serializer(self)
+        return self._compiled
+
+    def dump(self, obj, *, many=None):
+        many = self.many if many is None else bool(many)
+        if self._hooks[POST_DUMP]:
+            return super().dump(obj, many=many)
+        rows = list(obj) if many else [obj]
+        if not all(isinstance(row, db.Model) for row in rows):
+            return super().dump(rows if many else obj, many=many)
+        if self._hooks[PRE_DUMP]:
+            processed = self._invoke_dump_processors(
+                PRE_DUMP, rows if many else obj, many=many, original_data=obj
+            )
+            rows = list(processed) if many else [processed]
+        serializer = self._row_serializer()
+        if many:
+            return [serializer(row) for row in rows]
+        return serializer(rows[0])
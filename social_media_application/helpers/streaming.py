@@ -0,0 +1,56 @@
+from flask import request, stream_with_context
+from flask import current_app as app
+
+from social_media_application.models import db
+
+
+NDJSON = "application/x-ndjson"
+
+
+def stream_format():
+    """
+    Returns how the client asked a list to be streamed: "ndjson" with
+    Accept: application/x-ndjson, "json" with ?stream=true, None otherwise
+    :return: str | None
+    """
+    if request.accept_mimetypes.best_match(["application/json", NDJSON]) == NDJSON:
+        return "ndjson"
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return "json"
+    return None
+
+
+def stream_query(query, schema, ndjson=False):
+    """
+    Returns a response streaming the rows of a select, dumped by schema.
+    Rows are fetched STREAM_BATCH_SIZE at a time through a server-side
+    cursor (yield_per), dumped and encoded batch by batch, so the memory used
+    does not grow with the number of rows.
+    The body is a JSON array, identical to the one a list view returns, or
+    one JSON document per line for ndjson.
+    :param query: sqlalchemy Select
+    :param schema: Schema, with many=True
+    :param ndjson: boolean
+    :return: Response
+    """
+    batch_size = app.config["STREAM_BATCH_SIZE"]
+    encode = app.json.encode
+
+    def generate():
+        result = db.session.execute(
+            query.execution_options(yield_per=batch_size)
+        ).scalars()
+        if ndjson:
+            for batch in result.partitions():
+                yield b"".join(encode(row) + b"\n" for row in schema.dump(batch))
+            return
+        separator = b"["
+        for batch in result.partitions():
+            yield separator + b",".join(encode(row) for row in schema.dump(batch))
+            separator = b","
+        yield b"]\n" if separator == b"," else b"[]\n"
+
+    return app.response_class(
+        stream_with_context(generate()),
+        mimetype=NDJSON if ndjson else "application/json",
+    )
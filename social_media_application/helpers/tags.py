@@ -0,0 +1,72 @@
+"""
+Tags of posts.
+
+Post.tags is the comma separated string the client sent. When a post is
+written its tags are parsed into `tag` rows, linked to the post by `post_tag`
+rows, which tag search reads through their (tag_id, pub_date) index.
+"""
+import uuid
+from itertools import chain
+from sqlalchemy import insert, delete
+from sqlalchemy.dialects.postgresql import insert as upsert
+
+from social_media_application.models import db, Tag, PostTag
+
+
+def normalize_tag(name):
+    """
+    Returns the canonical form of a tag: trimmed, without leading '#', lower case
+    (the backfill migration normalizes tags the same way)
+    :param name: str
+    :return: str
+    """
+    return name.strip().lstrip("#").strip().lower()
+
+
+def parse_tags(tags):
+    """
+    Returns the distinct normalized tags of a Post.tags string, in order
+    :param tags: str | None, comma separated
+    :return: list
+    """
+    names = (normalize_tag(name) for name in (tags or "").split(","))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def tag_posts(posts):
+    """
+    Links freshly written posts to their tags, creating the missing tags.
+    Every post is handled in the same three statements.
+    :param posts: list of Post, with id and pub_date set
+    """
+    names_of = {post.id: parse_tags(post.tags) for post in posts}
+    names = set(chain.from_iterable(names_of.values()))
+    if not names:
+        return
+    # tags created concurrently by another request are left as they are
+    db.session.execute(
+        upsert(Tag).on_conflict_do_nothing(index_elements=["name"]),
+        [{"id": uuid.uuid4(), "name": name} for name in names],
+    )
+    tag_ids = dict(
+        db.session.execute(
+            db.select(Tag.name, Tag.id).where(Tag.name.in_(names))
+        ).all()
+    )
+    db.session.execute(
+        insert(PostTag),
+        [
+            {"post_id": post.id, "tag_id": tag_ids[name], "pub_date": post.pub_date}
+            for post in posts
+            for name in names_of[post.id]
+        ],
+    )
+
+
+def retag_post(post):
+    """
+    Replaces the tags a post is linked to by the ones of its current Post.tags
+    :param post: Post
+    """
+    db.session.execute(delete(PostTag).where(PostTag.post_id == post.id))
+    tag_posts([post])
@@ -5,3 +5,5 @@ from .connection import *
 from .notification import *
 from .profile import *
 from .post_type import *
+from .timeline import *
+from .tag import *
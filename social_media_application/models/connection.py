@@ -16,8 +16,14 @@ class Connection(db.Model):
     sender = db.Column(UUID(as_uuid=True), db.ForeignKey("user.id"))
     receiver = db.Column(UUID(as_uuid=True), db.ForeignKey("user.id"))
     accepted = db.Column(db.Boolean, default=False, nullable=False)
+    accepted_at = db.Column(db.DateTime, default=None, nullable=True)
     archive = archive = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index("ix_connection_sender_id", "sender", "id"),
+        db.Index("ix_connection_receiver_id", "receiver", "id"),
+    )
+
     def __init__(self, sender, receiver, accepted=False):
         self.sender = sender
         self.receiver = receiver
@@ -19,6 +19,10 @@ class Notification(db.Model):
     read = db.Column(db.Boolean, default=False, nullable=False)
     published_at = db.Column(db.DateTime, nullable=False, default=dt.now())
 
+    __table_args__ = (
+        db.Index("ix_notification_user_published_at", "user", "published_at", "id"),
+    )
+
     def __init__(self, user, msg):
         self.user = user
         self.msg = msg
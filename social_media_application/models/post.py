@@ -1,10 +1,14 @@
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from datetime import datetime as dt
 
 from social_media_application import db
 
 
+# text search configuration of Post.search_vector and of the queries run against it
+SEARCH_LANGUAGE = "english"
+
+
 class Post(db.Model):
     __tablename__ = "post"
     id = db.Column(
@@ -22,3 +26,24 @@ class Post(db.Model):
     pub_date = db.Column(db.DateTime, nullable=False, default=dt.utcnow)
     post_type = db.Column(db.String(50), db.ForeignKey("posttype.name"))
     archive = db.Column(db.Boolean, default=False)
+    # title, content and tags weighted A, B, C, maintained by Postgres on write.
+    # Deferred, only full text search reads it.
+    search_vector = db.deferred(
+        db.Column(
+            TSVECTOR,
+            db.Computed(
+                "setweight(to_tsvector('{0}', coalesce(title, '')), 'A')"
+                " || setweight(to_tsvector('{0}', coalesce(content, '')), 'B')"
+                " || setweight(to_tsvector('{0}', coalesce(tags, '')), 'C')".format(
+                    SEARCH_LANGUAGE
+                ),
+                persisted=True,
+            ),
+        )
+    )
+
+    __table_args__ = (
+        db.Index("ix_post_creator_pub_date", "creator", "pub_date", "id"),
+        db.Index("ix_post_pub_date_id", "pub_date", "id"),
+        db.Index("ix_post_search_vector", "search_vector", postgresql_using="gin"),
+    )
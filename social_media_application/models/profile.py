@@ -19,3 +19,19 @@ class Profile(db.Model):
     bio = db.Column(db.String(255))
     profile_pic = db.Column(db.String(500), default=None)
     archive = db.Column(db.Boolean, default=False, nullable=False)
+
+    __table_args__ = (
+        # fuzzy and prefix search (/search/users)
+        db.Index(
+            "ix_profile_first_name_trgm",
+            "first_name",
+            postgresql_using="gin",
+            postgresql_ops={"first_name": "gin_trgm_ops"},
+        ),
+        db.Index(
+            "ix_profile_last_name_trgm",
+            "last_name",
+            postgresql_using="gin",
+            postgresql_ops={"last_name": "gin_trgm_ops"},
+        ),
+    )
@@ -0,0 +1,45 @@
+import uuid
+from sqlalchemy.dialects.postgresql import UUID
+
+from social_media_application import db
+
+
+class Tag(db.Model):
+    __tablename__ = "tag"
+    id = db.Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        unique=True,
+        nullable=False,
+    )
+    name = db.Column(db.String(500), unique=True, nullable=False)
+
+    def __str__(self) -> str:
+        return str(self.name)
+
+
+class PostTag(db.Model):
+    """
+    Tags of a post, parsed from Post.tags when the post is written.
+    pub_date is copied from the post so that the posts of a tag are listed
+    newest first from the index alone.
+    """
+
+    __tablename__ = "post_tag"
+    post_id = db.Column(
+        UUID(as_uuid=True),
+        db.ForeignKey("post.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tag_id = db.Column(
+        UUID(as_uuid=True),
+        db.ForeignKey("tag.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    pub_date = db.Column(db.DateTime, nullable=False)
+    post = db.relationship("Post")
+
+    __table_args__ = (
+        db.Index("ix_post_tag_tag_id_pub_date", "tag_id", "pub_date", "post_id"),
+    )
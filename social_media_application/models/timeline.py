@@ -0,0 +1,32 @@
+from sqlalchemy.dialects.postgresql import UUID
+
+from social_media_application import db
+
+
+class Timeline(db.Model):
+    """
+    Materialized feed entries, one row per (reader, post)
+    written when a post is published (fan-out on write)
+    """
+
+    __tablename__ = "timeline"
+    user_id = db.Column(
+        UUID(as_uuid=True),
+        db.ForeignKey("user.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    post_id = db.Column(
+        UUID(as_uuid=True),
+        db.ForeignKey("post.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    pub_date = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_timeline_user_id_pub_date", "user_id", "pub_date", "post_id"),
+    )
+
+    def __init__(self, user_id, post_id, pub_date):
+        self.user_id = user_id
+        self.post_id = post_id
+        self.pub_date = pub_date
@@ -1,4 +1,9 @@
+from flask import current_app as app
+
+import jwt
+import hashlib
 from datetime import datetime
+from datetime import timedelta as td
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -7,7 +12,8 @@ from social_media_application import db
 
 class BlacklistToken(db.Model):
     """
-    Token Model for storing JWT tokens
+    Token Model for storing revoked JWT tokens, by jti claim (or sha256 of
+    the token when it has none) until the token expires
     """
 
     __tablename__ = "blacklist_tokens"
@@ -19,21 +25,93 @@ class BlacklistToken(db.Model):
         unique=True,
         nullable=False,
     )
-    token = db.Column(db.String(500), unique=True, nullable=False)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, index=True, nullable=False)
     blacklisted_on = db.Column(db.DateTime, nullable=False)
 
     def __init__(self, token):
-        self.token = token
+        self.jti, self.expires_at = BlacklistToken.key_for(token)
         self.blacklisted_on = datetime.now()
 
+    @staticmethod
+    def key_for(auth_token):
+        """
+        Returns the revocation key of a token and its expiry date (utc).
+        The signature is not checked here, only ever call it with
+        tokens that were verified or that are being revoked.
+        :param auth_token: str
+        :return: tuple, (str, datetime)
+        """
+        try:
+            payload = jwt.decode(
+                str(auth_token),
+                options={"verify_signature": False, "verify_exp": False},
+            )
+        except jwt.InvalidTokenError:
+            payload = {}
+        jti = payload.get("jti") or hashlib.sha256(str(auth_token).encode()).hexdigest()
+        if "exp" in payload:
+            expires_at = datetime.utcfromtimestamp(payload["exp"])
+        else:
+            expires_at = datetime.utcnow() + td(days=1)
+        return jti, expires_at
+
     @staticmethod
     def check_blacklist(auth_token):
+        jti, _ = BlacklistToken.key_for(auth_token)
+        return BlacklistToken.is_revoked(jti)
+
+    @staticmethod
+    def is_revoked(jti):
+        """
+        Returns true when the token of this revocation key was blacklisted
+        :param jti: str, from key_for
+        :return: boolean
+        """
+        # the in-memory filter answers for tokens that were definitely not blacklisted
+        revocation_filter = app.extensions.get("revocation_filter")
+        if revocation_filter and not revocation_filter.might_be_revoked(jti):
+            return False
         # check whether auth token has been blacklisted
-        res = BlacklistToken.query.filter_by(token=str(auth_token)).first()
+        res = BlacklistToken.query.filter_by(jti=jti).first()
         if res:
             return True
         else:
             return False
 
+    @staticmethod
+    def revoked_since(since=None):
+        """
+        Yields (jti, blacklisted_on) of the tokens blacklisted since a date
+        :param since: datetime, everything when None
+        """
+        query = db.select(BlacklistToken.jti, BlacklistToken.blacklisted_on)
+        if since is not None:
+            query = query.where(BlacklistToken.blacklisted_on >= since)
+        yield from db.session.execute(query.execution_options(yield_per=1000))
+
+    @staticmethod
+    def purge_expired(batch_size=1000):
+        """
+        Deletes the rows of expired tokens, batch_size rows per transaction.
+        Expired tokens are rejected by jwt.decode anyway.
+        :param batch_size: int
+        :return: int, number of rows deleted
+        """
+        deleted = 0
+        while True:
+            batch = (
+                db.select(BlacklistToken.id)
+                .where(BlacklistToken.expires_at < datetime.utcnow())
+                .limit(batch_size)
+            )
+            result = db.session.execute(
+                db.delete(BlacklistToken).where(BlacklistToken.id.in_(batch))
+            )
+            db.session.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+
     def __repr__(self):
-        return "<id: token: {}".format(self.token)
+        return "<id: jti: {}".format(self.jti)
@@ -2,8 +2,8 @@ from flask import current_app as app
 
 import jwt
 import uuid
+from sqlalchemy import DDL, event
 from sqlalchemy.dialects.postgresql import UUID
-from passlib.hash import bcrypt
 from datetime import timedelta as td
 from datetime import datetime as dt
 
@@ -11,6 +11,14 @@ from social_media_application import db
 from social_media_application.models.token import BlacklistToken
 
 
+# trigram operator classes of the search indexes, created along with the tables
+event.listen(
+    db.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 class User(db.Model):
     __tablename__ = "user"
     id = db.Column(
@@ -29,64 +37,129 @@ class User(db.Model):
     forget_password_token = db.Column(
         UUID(as_uuid=True), default=None, unique=True, nullable=True
     )
+    # posts of users above FEED_FANOUT_THRESHOLD connections are pulled into feeds
+    pull_posts = db.Column(
+        db.Boolean, default=False, server_default=db.false(), nullable=False
+    )
+    # carried by every token as `ver`, bumping it revokes all the user's tokens
+    token_version = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
+    # bumped when one of the user's posts is edited or deleted, part of the feed ETags
+    posts_version = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
+    # one-to-one, through the profile.user foreign key
+    profile = db.relationship("Profile", uselist=False)
+
+    __table_args__ = (
+        # fuzzy and prefix search (/search/users)
+        db.Index(
+            "ix_user_username_trgm",
+            "username",
+            postgresql_using="gin",
+            postgresql_ops={"username": "gin_trgm_ops"},
+        ),
+    )
 
     def __init__(self, email, password, username):
         self.username = username
         self.email = email
-        self.password_hash = bcrypt.hash(password)
+        self.token_version = 0
+        self.posts_version = 0
+        self.hash_password(password)
 
     def hash_password(self, password):
         """
         Returns encrypted password from real-one
+        Hashing runs on the password hasher's process pool
         :param password: str
         :return: str
         """
-        self.password_hash = bcrypt.hash(password)
+        self.password_hash = app.extensions["password_hasher"].hash(password)
 
     def verify_password(self, password):
         """
         Returns true when password is correct
+        A hash computed at a lower cost than BCRYPT_ROUNDS is replaced by one at
+        the current cost, the caller commits it
         :param password: str
         :return: boolean
         """
-        return bcrypt.verify(password, self.password_hash)
+        hasher = app.extensions["password_hasher"]
+        if not hasher.verify(password, self.password_hash):
+            return False
+        if hasher.needs_rehash(self.password_hash):
+            self.password_hash = hasher.hash(password)
+        return True
+
+    def _encode_token(self, token_type, expires_in):
+        now = dt.utcnow()
+        payload = {
+            "exp": now + expires_in,
+            "iat": now,
+            "jti": uuid.uuid4().hex,
+            "sub": str(self.id),
+            "ver": self.token_version,
+            "type": token_type,
+        }
+        return jwt.encode(payload, app.config.get("SECRET_KEY"), algorithm="HS256")
+
+    def generate_auth_token(self, expires_in=None):
+        """
+        Returns a short-lived jwt access token, valid ACCESS_TOKEN_TTL seconds
+        :param expires_in: timedelta
+        :return: str
+        """
+        try:
+            expires_in = expires_in or td(seconds=app.config["ACCESS_TOKEN_TTL"])
+            return self._encode_token("access", expires_in)
+        except Exception as e:
+            return e
 
-    def generate_auth_token(self, expires_in=td(days=1)):
+    def generate_refresh_token(self, expires_in=None):
         """
-        Returns jwt token for jwt-authentication
+        Returns a jwt refresh token, valid REFRESH_TOKEN_TTL seconds,
+        exchanged at /token/refresh for a new pair of tokens
         :param expires_in: timedelta
         :return: str
         """
         try:
-            payload = {
-                "exp": dt.utcnow() + expires_in,
-                "iat": dt.utcnow(),
-                "username": self.username,
-            }
-            return jwt.encode(payload, app.config.get("SECRET_KEY"), algorithm="HS256")
+            expires_in = expires_in or td(seconds=app.config["REFRESH_TOKEN_TTL"])
+            return self._encode_token("refresh", expires_in)
         except Exception as e:
             return e
 
+    @staticmethod
+    def decode_auth_token(token, token_type="access"):
+        """
+        Returns the claims of a token after checking its signature, expiry and type.
+        Raises jwt.InvalidTokenError otherwise
+        :param token: str
+        :param token_type: str, access | refresh
+        :return: dict
+        """
+        payload = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])
+        if payload.get("type") != token_type or "sub" not in payload:
+            raise jwt.InvalidTokenError("Invalid token type")
+        return payload
+
     @staticmethod
     def verify_auth_token(token):
         """
-        Returns true when token is correct
+        Returns (user id, token version, expiry timestamp) of a valid access token, or None.
+        Only the in-memory revocation filter is consulted for tokens that were
+        not logged out, the version is compared by the caller with the user's
         :param token: str
-        :return: boolean
+        :return: tuple | None
         """
         try:
-            is_blacklisted_token = BlacklistToken.check_blacklist(token)
-            if is_blacklisted_token:
-                return "Token expired. Please log in again."
-            else:
-                payload = jwt.decode(
-                    token, app.config["SECRET_KEY"], algorithms=["HS256"]
-                )
-                return payload["username"]
-        except jwt.ExpiredSignatureError:
-            return "Signature expired. Please log in again."
+            payload = User.decode_auth_token(token)
         except jwt.InvalidTokenError:
-            return "Invalid token. Please log in again."
+            return None
+        if BlacklistToken.check_blacklist(token):
+            return None
+        return uuid.UUID(payload["sub"]), payload["ver"], payload["exp"]
 
     def __repr__(self):
         return f"<User {self.username}>"
@@ -1,18 +1,27 @@
-from marshmallow import fields
+from marshmallow import fields, pre_dump
 
-from social_media_application import ma
-from social_media_application.models import User
+from social_media_application.helpers.serialization import CompiledSchema
+from social_media_application.helpers.loader import usernames
 
 
-class ConnectionSchema(ma.Schema):
+class ConnectionSchema(CompiledSchema):
     sender = fields.Method("get_sender")
     receiver = fields.Method("get_receiver")
 
+    @pre_dump(pass_many=True)
+    def queue_usernames(self, data, many, **kwargs):
+        # the usernames of the whole collection are loaded by one query
+        connections = data if many else [data]
+        usernames().queue(
+            user_id for obj in connections for user_id in (obj.sender, obj.receiver)
+        )
+        return data
+
     def get_sender(self, obj):
-        return User.query.filter_by(id=obj.sender).first().username
+        return usernames().load(obj.sender)
 
     def get_receiver(self, obj):
-        return User.query.filter_by(id=obj.receiver).first().username
+        return usernames().load(obj.receiver)
 
     class Meta:
         fields = ("id", "sender", "receiver", "accepted", "archive")
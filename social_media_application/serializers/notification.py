@@ -1,14 +1,21 @@
-from marshmallow import fields
+from marshmallow import fields, pre_dump
 
-from social_media_application import ma
-from social_media_application.models import User
+from social_media_application.helpers.serialization import CompiledSchema
+from social_media_application.helpers.loader import usernames
 
 
-class NotificationSchema(ma.Schema):
+class NotificationSchema(CompiledSchema):
     user = fields.Method("get_user")
 
+    @pre_dump(pass_many=True)
+    def queue_usernames(self, data, many, **kwargs):
+        # the usernames of the whole collection are loaded by one query
+        notifications = data if many else [data]
+        usernames().queue(obj.user for obj in notifications)
+        return data
+
     def get_user(self, obj):
-        return User.query.filter_by(id=obj.user).first().username
+        return usernames().load(obj.user)
 
     class Meta:
         fields = ["id", "user", "msg", "read", "published_at"]
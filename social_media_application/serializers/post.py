@@ -1,7 +1,7 @@
-from social_media_application import ma
+from social_media_application.helpers.serialization import CompiledSchema
 
 
-class PostSchema(ma.Schema):
+class PostSchema(CompiledSchema):
     class Meta:
         fields = (
             "id",
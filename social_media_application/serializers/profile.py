@@ -1,7 +1,7 @@
-from social_media_application import ma
+from social_media_application.helpers.serialization import CompiledSchema
 
 
-class ProfileSchema(ma.Schema):
+class ProfileSchema(CompiledSchema):
     class Meta:
         fields = ("first_name", "last_name", "bio", "profile_pic")
 
@@ -1,15 +1,15 @@
 from marshmallow import fields
 
 from social_media_application import ma
-from social_media_application.models import Profile
+from social_media_application.helpers.serialization import CompiledSchema
 from social_media_application.serializers import profile_schema
 
 
-class UserSchema(ma.Schema):
+class UserSchema(CompiledSchema):
     profile = fields.Method("get_profile")
 
     def get_profile(self, obj):
-        return profile_schema.dump(Profile.query.filter_by(user=obj.id).first())
+        return profile_schema.dump(obj.profile)
 
     class Meta:
         fields = ("id", "username", "email", "profile")
@@ -17,3 +17,16 @@ class UserSchema(ma.Schema):
 
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
+
+
+class UserSuggestionSchema(ma.Schema):
+    """
+    What user search (/search/users) returns about each user, read from a
+    single row joining the user and their profile
+    """
+
+    class Meta:
+        fields = ("id", "username", "first_name", "last_name", "profile_pic")
+
+
+user_suggestions_schema = UserSuggestionSchema(many=True)
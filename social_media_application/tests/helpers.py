@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+from social_media_application import db
+
+
+@contextmanager
+def count_queries(app):
+    """
+    Collects the statements run on the database of app inside the block.
+    The revocation filter is refreshed first, to keep its query out of the count
+    :param app: Flask
+    :return: list of str, filled on the way
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+        app.extensions["revocation_filter"].refresh()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
@@ -3,7 +3,10 @@ import os
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
-from social_media_application.models import User
+from social_media_application.tests.helpers import count_queries
+from social_media_application.models import User, BlacklistToken
+from social_media_application.helpers.cache import TTLCache
+from social_media_application.helpers.hashing import PasswordHasher, HashingBusy
 
 
 def app():
@@ -160,6 +163,49 @@ class TestUserOps(unittest.TestCase):
         )
         self.assertEqual(response.status_code, 205)
 
+    def test_user_logout_token_revoked(self):
+        response = self.client.post(
+            "/login",
+            json={
+                "username": "testuser1",
+                "password": "Test@Abcd",
+            },
+            content_type="application/json",
+        )
+        token = response.json["token"]
+        response = self.client.post(
+            "/logout", headers={"Authorization": "Token " + token}
+        )
+        self.assertEqual(response.status_code, 205)
+        response = self.client.post(
+            "/logout", headers={"Authorization": "Token " + token}
+        )
+        self.assertEqual(response.status_code, 401)
+        with self.app_test.app_context():
+            jti = BlacklistToken.key_for(token)[0]
+            self.assertTrue(BlacklistToken.query.filter_by(jti=jti).first())
+
+    def test_user_logout_invalid_refresh_token(self):
+        response = self.client.post(
+            "/login",
+            json={
+                "username": "testuser1",
+                "password": "Test@Abcd",
+            },
+            content_type="application/json",
+        )
+        token = response.json["token"]
+        response = self.client.post(
+            "/logout",
+            headers={"Authorization": "Token " + token},
+            json={"refresh_token": "dhibchbv"},
+        )
+        self.assertEqual(response.status_code, 205)
+        response = self.client.post(
+            "/logout", headers={"Authorization": "Token " + token}
+        )
+        self.assertEqual(response.status_code, 401)
+
     def test_user_logout_fail_invalid_token(self):
         token = "dhibchbv"
         response = self.client.post(
@@ -173,3 +219,356 @@ class TestUserOps(unittest.TestCase):
         response = self.client.post("/logout")
         self.assertEqual(response.status_code, 401)
         self.assertTrue("error" in response.json.keys())
+
+    def test_token_refresh(self):
+        response = self.client.post(
+            "/login",
+            json={
+                "username": "testuser1",
+                "password": "Test@Abcd",
+            },
+            content_type="application/json",
+        )
+        self.assertTrue("refresh_token" in response.json.keys())
+        refresh_token = response.json["refresh_token"]
+        response = self.client.post(
+            "/token/refresh", json={"refresh_token": refresh_token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue("token" in response.json.keys())
+        self.assertTrue("refresh_token" in response.json.keys())
+        response = self.client.post(
+            "/logout", headers={"Authorization": "Token " + response.json["token"]}
+        )
+        self.assertEqual(response.status_code, 205)
+        # refresh tokens are single use
+        response = self.client.post(
+            "/token/refresh", json={"refresh_token": refresh_token}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_refresh_fail_token_type(self):
+        response = self.client.post(
+            "/login",
+            json={
+                "username": "testuser1",
+                "password": "Test@Abcd",
+            },
+            content_type="application/json",
+        )
+        token = response.json["token"]
+        refresh_token = response.json["refresh_token"]
+        response = self.client.post("/token/refresh", json={"refresh_token": token})
+        self.assertEqual(response.status_code, 401)
+        # nor is a refresh token an access token
+        response = self.client.post(
+            "/logout", headers={"Authorization": "Token " + refresh_token}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_user_logout_all_sessions(self):
+        tokens = []
+        for _ in range(2):
+            response = self.client.post(
+                "/login",
+                json={
+                    "username": "testuser1",
+                    "password": "Test@Abcd",
+                },
+                content_type="application/json",
+            )
+            tokens.append(response.json)
+        response = self.client.post(
+            "/logout",
+            headers={"Authorization": "Token " + tokens[0]["token"]},
+            json={"all": True},
+        )
+        self.assertEqual(response.status_code, 205)
+        response = self.client.post(
+            "/logout", headers={"Authorization": "Token " + tokens[1]["token"]}
+        )
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post(
+            "/token/refresh", json={"refresh_token": tokens[1]["refresh_token"]}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class TestAuthQueries(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app_test = app_test
+        cls.client = app_test.test_client()
+        cls.client.post(
+            "/register",
+            json={
+                "username": "queryuser",
+                "password": "Test@Abcd",
+                "email": "queryuser@gmail.com",
+                "first_name": "query",
+                "last_name": "user",
+                "bio": "test bio",
+                "profile_pic": "https://unsplash.com/photos/man-wearing-green-polo-shirt-6anudmpILw4",
+            },
+            content_type="application/json",
+        )
+        response = cls.client.post(
+            "/login",
+            json={"username": "queryuser", "password": "Test@Abcd"},
+            content_type="application/json",
+        )
+        cls.token = response.json["token"]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        with cls.app_test.app_context():
+            meta = db.metadata
+            for table in reversed(meta.sorted_tables):
+                db.session.execute(
+                    text(
+                        f'TRUNCATE TABLE public."{table.name}" CONTINUE IDENTITY CASCADE;'
+                    )
+                )
+                db.session.commit()
+
+    def request_queries(self, send=None):
+        """
+        Counts the statements run by an authenticated request, by default
+        one whose view does not query the database itself
+        """
+        with count_queries(self.app_test) as statements:
+            if send:
+                send()
+            else:
+                response = self.client.post(
+                    "/change-password",
+                    headers={"Authorization": "Token " + self.token},
+                    json={"current_password": "incorrect"},
+                )
+                self.assertEqual(response.status_code, 400)
+        return len(statements)
+
+    def test_authenticated_request_queries(self):
+        # the user, by primary key: the token is checked in memory
+        self.assertEqual(self.request_queries(), 1)
+
+    def test_authenticated_request_queries_principal_cache(self):
+        cache = self.app_test.extensions["principal_cache"]
+        ttl = self.app_test.config["AUTH_CACHE_TTL"]
+        self.app_test.extensions["principal_cache"] = TTLCache(100, 60)
+        self.app_test.config["AUTH_CACHE_TTL"] = 60
+        try:
+            self.assertEqual(self.request_queries(), 1)
+            self.assertEqual(len(self.app_test.extensions["principal_cache"]), 1)
+            # only the user is loaded, by primary key
+            self.assertEqual(self.request_queries(), 1)
+        finally:
+            self.app_test.extensions["principal_cache"] = cache
+            self.app_test.config["AUTH_CACHE_TTL"] = ttl
+
+    def test_principal_cache_revoked_by_other_process(self):
+        cache = self.app_test.extensions["principal_cache"]
+        ttl = self.app_test.config["AUTH_CACHE_TTL"]
+        self.app_test.extensions["principal_cache"] = TTLCache(100, 60)
+        self.app_test.config["AUTH_CACHE_TTL"] = 60
+        try:
+            response = self.client.post(
+                "/login",
+                json={"username": "queryuser", "password": "Test@Abcd"},
+                content_type="application/json",
+            )
+            token = response.json["token"]
+            response = self.client.get(
+                "/users", headers={"Authorization": "Token " + token}
+            )
+            self.assertEqual(response.status_code, 200)
+            # logged out by another process: its principal cache is not
+            # cleared, the revocation filter learns of it at the next refresh
+            with self.app_test.app_context():
+                db.session.add(BlacklistToken(token=token))
+                db.session.commit()
+                self.app_test.extensions["revocation_filter"].refresh()
+            response = self.client.get(
+                "/users", headers={"Authorization": "Token " + token}
+            )
+            self.assertEqual(response.status_code, 401)
+        finally:
+            self.app_test.extensions["principal_cache"] = cache
+            self.app_test.config["AUTH_CACHE_TTL"] = ttl
+
+    def test_stacked_policies_queries(self):
+        def send():
+            response = self.client.delete(
+                "/users/00000000-0000-0000-0000-000000000000",
+                headers={"Authorization": "Token " + self.token},
+            )
+            self.assertEqual(response.status_code, 403)
+
+        # authenticate_user and is_owner share the principal
+        self.assertEqual(self.request_queries(send), 1)
+
+    def test_revocation_filter(self):
+        from social_media_application.helpers.revocation import BloomFilter
+
+        bloom = BloomFilter(1000)
+        keys = ["token-{}".format(i) for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum("other-{}".format(i) in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_revocation_filter_concurrent_rebuild(self):
+        import threading
+        from datetime import datetime
+        from social_media_application.helpers.revocation import RevocationFilter
+
+        rows = [("token-{}".format(i), datetime.utcnow()) for i in range(50)]
+
+        def load_since(since):
+            # a token is revoked before every refresh, which overflows the
+            # filter over and over
+            rows.append(("token-{}".format(len(rows)), datetime.utcnow()))
+            return list(rows)
+
+        # capacity 1 and no refresh interval: lookups keep rebuilding the filter
+        revocation_filter = RevocationFilter(1, 0, load_since)
+        errors = []
+
+        def lookup():
+            try:
+                for i in range(200):
+                    self.assertTrue(revocation_filter.might_be_revoked("token-1"))
+                    revocation_filter.add("token-x")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookup) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_revocation_filter_overlap_not_counted(self):
+        from datetime import datetime
+        from social_media_application.helpers.revocation import RevocationFilter
+
+        rows = [("token-{}".format(i), datetime.utcnow()) for i in range(50)]
+        loads = []
+
+        def load_since(since):
+            loads.append(since)
+            # every row is in the overlap window
+            return rows
+
+        revocation_filter = RevocationFilter(100, 0, load_since)
+        for i in range(100):
+            self.assertTrue(revocation_filter.might_be_revoked("token-1"))
+        self.assertEqual(revocation_filter.bloom.count, 50)
+        self.assertEqual(loads.count(None), 1)
+
+
+class TestPasswordHashing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app_test = app_test
+        cls.client = app_test.test_client()
+        cls.client.post(
+            "/register",
+            json={
+                "username": "hashuser",
+                "password": "Test@Abcd",
+                "email": "hashuser@gmail.com",
+                "first_name": "hash",
+                "last_name": "user",
+                "bio": "test bio",
+                "profile_pic": "https://unsplash.com/photos/man-wearing-green-polo-shirt-6anudmpILw4",
+            },
+            content_type="application/json",
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        with cls.app_test.app_context():
+            meta = db.metadata
+            for table in reversed(meta.sorted_tables):
+                db.session.execute(
+                    text(
+                        f'TRUNCATE TABLE public."{table.name}" CONTINUE IDENTITY CASCADE;'
+                    )
+                )
+                db.session.commit()
+
+    def test_login_rehashes_weaker_hash(self):
+        rounds = self.app_test.config["BCRYPT_ROUNDS"]
+        weak = PasswordHasher(4, 0, 1, 1)
+        with self.app_test.app_context():
+            user = User.query.filter_by(username="hashuser").first()
+            user.password_hash = weak.hash("Test@Abcd")
+            db.session.commit()
+        response = self.client.post(
+            "/login",
+            json={"username": "hashuser", "password": "Test@Abcd"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        with self.app_test.app_context():
+            user = User.query.filter_by(username="hashuser").first()
+            hasher = self.app_test.extensions["password_hasher"]
+            self.assertFalse(hasher.needs_rehash(user.password_hash))
+            self.assertIn("${}$".format(rounds), user.password_hash)
+            self.assertTrue(user.verify_password("Test@Abcd"))
+
+    def test_hasher_busy(self):
+        hasher = PasswordHasher(4, 0, 1, 0.01)
+        self.assertTrue(hasher.verify("secret", hasher.hash("secret")))
+        hasher._slots.acquire()
+        try:
+            with self.assertRaises(HashingBusy):
+                hasher.hash("secret")
+        finally:
+            hasher._slots.release()
+
+    def test_change_password_hasher_busy(self):
+        response = self.client.post(
+            "/login",
+            json={"username": "hashuser", "password": "Test@Abcd"},
+            content_type="application/json",
+        )
+        token = response.json["token"]
+        hasher = self.app_test.extensions["password_hasher"]
+        busy = PasswordHasher(4, 0, 1, 0.01)
+        busy._slots.acquire()
+        self.app_test.extensions["password_hasher"] = busy
+        try:
+            response = self.client.post(
+                "/change-password",
+                headers={"Authorization": "Token " + token},
+                json={"current_password": "Test@Abcd", "new_password": "Test@Efgh"},
+            )
+        finally:
+            self.app_test.extensions["password_hasher"] = hasher
+            busy._slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_hasher_timeout(self):
+        hasher = PasswordHasher(16, 1, 1, 0.01)
+        try:
+            with self.assertRaises(HashingBusy):
+                hasher.hash("secret")
+        finally:
+            hasher.shutdown()
+
+    def test_hasher_broken_pool(self):
+        import signal
+
+        hasher = PasswordHasher(4, 1, 1, 10)
+        try:
+            password_hash = hasher.hash("secret")
+            for pid in list(hasher._pool._processes):
+                os.kill(pid, signal.SIGKILL)
+            self.assertTrue(hasher.verify("secret", password_hash))
+        finally:
+            hasher.shutdown()
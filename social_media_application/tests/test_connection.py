@@ -3,6 +3,7 @@ import os
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
+from social_media_application.tests.helpers import count_queries
 
 
 def app():
@@ -149,6 +150,31 @@ class TestConnection(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(type(response.json) == list)
 
+    def request_queries(self, url, token):
+        with count_queries(self.app_test) as statements:
+            response = self.client.get(url, headers={"Authorization": "Token " + token})
+            self.assertEqual(response.status_code, 200)
+        return len(response.json), len(statements)
+
+    def test_get_connections_queries(self):
+        before = self.request_queries("/connections", self.token2)
+        response = self.client.post(
+            "/follow-requests",
+            headers={"Authorization": "Token " + self.token3},
+            json={"user": "testuser2"},
+        )
+        self.assertEqual(self.request_queries("/follow-requests", self.token2)[1], 3)
+        self.client.patch(
+            f"/follow-requests/{response.json['id']}",
+            headers={"Authorization": "Token " + self.token2},
+            json={"response": "accept"},
+        )
+        after = self.request_queries("/connections", self.token2)
+        self.assertEqual(after[0], before[0] + 1)
+        # user, connections and one query for all the usernames
+        self.assertEqual(after[1], before[1])
+        self.assertEqual(after[1], 3)
+
     def test_get_connections_fail_unauthenticated(self):
         response = self.client.get("/connections")
         self.assertEqual(response.status_code, 401)
@@ -3,6 +3,7 @@ import os
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
+from social_media_application.models import User, Timeline
 
 
 def app():
@@ -206,3 +207,282 @@ class TestFeed(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(type(response.json) == list)
         self.assertTrue(len(response.json) == 0)
+
+    def test_get_feed_connection_post_present(self):
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.token1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["id"] for post in response.json], [self.post2_id])
+
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.token2}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["id"] for post in response.json], [self.post1_id])
+
+    def test_get_feed_limit(self):
+        response = self.client.get(
+            "/feed?limit=1", headers={"Authorization": "Token " + self.token1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(len(response.json) == 1)
+        self.assertTrue("X-Next-Cursor" not in response.headers)
+
+    def test_get_feed_fail_invalid_cursor(self):
+        response = self.client.get(
+            "/feed?cursor=invalid", headers={"Authorization": "Token " + self.token1}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
+
+    def test_get_feed_fail_invalid_limit(self):
+        response = self.client.get(
+            "/feed?limit=0", headers={"Authorization": "Token " + self.token1}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
+
+    def test_merge_runs_dedupes_and_orders(self):
+        from social_media_application.helpers.feed import merge_runs
+
+        runs = [
+            [(3, "c", None), (1, "a", None)],
+            [(4, "d", None), (3, "c", None), (2, "b", None)],
+        ]
+        merged = merge_runs(runs, 3)
+        self.assertEqual([entry[1] for entry in merged], ["d", "c", "b"])
+
+    def test_get_feed_ranked(self):
+        response = self.client.get(
+            "/feed?mode=ranked", headers={"Authorization": "Token " + self.token2}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(type(response.json) == list)
+        self.assertEqual([post["id"] for post in response.json], [self.post1_id])
+
+    def test_get_feed_fail_unknown_mode(self):
+        response = self.client.get(
+            "/feed?mode=unknown", headers={"Authorization": "Token " + self.token2}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
+
+    def test_score_posts(self):
+        import numpy as np
+        from social_media_application.helpers.ranking import score_posts
+
+        scores = score_posts(
+            ages=np.array([0.0, 24.0, 24.0]),
+            affinities=np.array([0.0, 0.0, 1.0]),
+            type_weights=np.array([1.0, 1.0, 2.0]),
+            half_life=24.0,
+            recency_weight=1.0,
+            affinity_weight=0.5,
+        )
+        np.testing.assert_allclose(scores, [1.0, 0.5, 2.0])
+
+    def test_rank_posts_connection_without_accepted_at(self):
+        from types import SimpleNamespace
+        from datetime import datetime as dt
+        from social_media_application.helpers.ranking import rank_posts
+
+        now = dt.utcnow()
+        recent = SimpleNamespace(pub_date=now, creator="recent", post_type="text")
+        legacy = SimpleNamespace(pub_date=now, creator="legacy", post_type="text")
+        with self.app_test.app_context():
+            # a connection accepted before accepted_at existed is long established
+            ranked = rank_posts(
+                [recent, legacy], {"recent": now, "legacy": None}, now=now
+            )
+        self.assertEqual(ranked, [legacy, recent])
+
+    def test_get_feed_not_modified(self):
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.token1}
+        )
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers["ETag"]
+
+        response = self.client.get(
+            "/feed",
+            headers={"Authorization": "Token " + self.token1, "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b"")
+
+    def test_get_feed_modified_by_edit(self):
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.token1}
+        )
+        etag = response.headers["ETag"]
+        response = self.client.patch(
+            f"/posts/{self.post2_id}",
+            headers={"Authorization": "Token " + self.token2},
+            json={"title": "Test Post 1 by user2, edited"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            "/feed",
+            headers={"Authorization": "Token " + self.token1, "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 200)
+        titles = [post["title"] for post in response.json]
+        self.assertTrue("Test Post 1 by user2, edited" in titles)
+
+    def test_get_feed_since_latest(self):
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.token1}
+        )
+        latest = response.headers["X-Latest-Cursor"]
+
+        response = self.client.get(
+            f"/feed?since={latest}", headers={"Authorization": "Token " + self.token1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(type(response.json) == list)
+        self.assertTrue(len(response.json) == 0)
+
+
+class TestFeedFanout(unittest.TestCase):
+    @classmethod
+    def register(cls, username):
+        response = cls.client.post(
+            "/register",
+            json={
+                "username": username,
+                "password": "Test@Abcd",
+                "email": f"{username}@gmail.com",
+                "first_name": username,
+                "last_name": username,
+                "bio": "test bio",
+                "profile_pic": "https://unsplash.com/photos/man-wearing-green-polo-shirt-6anudmpILw4",
+            },
+            content_type="application/json",
+        )
+        user_id = response.json["id"]
+        response = cls.client.post(
+            "/login",
+            json={"username": username, "password": "Test@Abcd"},
+            content_type="application/json",
+        )
+        return user_id, response.json["token"]
+
+    @classmethod
+    def connect(cls, token, username, other_token):
+        response = cls.client.post(
+            "/follow-requests",
+            headers={"Authorization": "Token " + token},
+            json={"user": username},
+        )
+        follow_request_id = response.json["id"]
+        cls.client.patch(
+            f"/follow-requests/{follow_request_id}",
+            headers={"Authorization": "Token " + other_token},
+            json={"response": "accept"},
+        )
+        return follow_request_id
+
+    @classmethod
+    def post(cls, token, title):
+        response = cls.client.post(
+            "/posts",
+            headers={"Authorization": "Token " + token},
+            json={
+                "title": title,
+                "url": "https://unsplash.com/photos/a-bunch-of-pink-donuts-are-stacked-on-top-of-each-other-obyYZVKwCNI",
+                "content": "lorem ipsum dolor test content",
+                "post_type": "text",
+                "tags": "text,fanout",
+            },
+        )
+        return response.json["id"]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app_test = app_test
+        cls.client = app_test.test_client()
+        # authors with more than one connection are pulled
+        cls.threshold = app_test.config["FEED_FANOUT_THRESHOLD"]
+        app_test.config["FEED_FANOUT_THRESHOLD"] = 1
+
+        cls.author_id, cls.author_token = cls.register("fanoutauthor")
+        cls.reader_id, cls.reader_token = cls.register("fanoutreader")
+        cls.friend_id, cls.friend_token = cls.register("fanoutfriend")
+        cls.other_id, cls.other_token = cls.register("fanoutother")
+        cls.client.post(
+            "/post-types",
+            headers={"Authorization": "Token " + cls.author_token},
+            json={"name": "text"},
+        )
+
+        cls.connect(cls.author_token, "fanoutreader", cls.reader_token)
+        cls.other_connection_id = cls.connect(
+            cls.author_token, "fanoutother", cls.other_token
+        )
+        cls.connect(cls.friend_token, "fanoutreader", cls.reader_token)
+
+        cls.post_ids = [
+            cls.post(cls.author_token, "pulled post 1"),
+            cls.post(cls.friend_token, "pushed post"),
+            cls.post(cls.author_token, "pulled post 2"),
+        ]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        app_test.config["FEED_FANOUT_THRESHOLD"] = cls.threshold
+        with cls.app_test.app_context():
+            meta = db.metadata
+            for table in reversed(meta.sorted_tables):
+                db.session.execute(
+                    text(
+                        f'TRUNCATE TABLE public."{table.name}" CONTINUE IDENTITY CASCADE;'
+                    )
+                )
+                db.session.commit()
+
+    def timeline_post_ids(self):
+        with self.app_test.app_context():
+            return {
+                str(post_id)
+                for post_id in db.session.execute(
+                    db.select(Timeline.post_id).where(
+                        Timeline.user_id == self.reader_id
+                    )
+                ).scalars()
+            }
+
+    def test_get_feed_merges_pulled_posts(self):
+        with self.app_test.app_context():
+            author = User.query.filter_by(id=self.author_id).first()
+            self.assertTrue(author.pull_posts)
+        # only the post of the friend was pushed
+        self.assertEqual(self.timeline_post_ids(), {self.post_ids[1]})
+
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.reader_token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post["id"] for post in response.json], list(reversed(self.post_ids))
+        )
+
+    def test_unfollow_switches_back_to_push(self):
+        response = self.client.delete(
+            f"/connections/{self.other_connection_id}",
+            headers={"Authorization": "Token " + self.other_token},
+        )
+        self.assertEqual(response.status_code, 204)
+        with self.app_test.app_context():
+            author = User.query.filter_by(id=self.author_id).first()
+            self.assertFalse(author.pull_posts)
+        self.assertEqual(self.timeline_post_ids(), set(self.post_ids))
+
+        response = self.client.get(
+            "/feed", headers={"Authorization": "Token " + self.reader_token}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post["id"] for post in response.json], list(reversed(self.post_ids))
+        )
@@ -3,6 +3,7 @@ import os
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
+from social_media_application.tests.helpers import count_queries
 from social_media_application.models import Notification
 
 
@@ -133,6 +134,24 @@ class TestNotification(unittest.TestCase):
         self.assertTrue(type(response.json) == list)
         self.assertTrue(len(response.json) != 0)
 
+    def test_notification_queries(self):
+        def get_notifications():
+            with count_queries(self.app_test) as statements:
+                response = self.client.get(
+                    "/notifications", headers={"Authorization": "Token " + self.token1}
+                )
+            self.assertEqual(response.status_code, 200)
+            return len(response.json), len(statements)
+
+        count, queries = get_notifications()
+        with self.app_test.app_context():
+            for i in range(5):
+                db.session.add(Notification(user=self.user1_id, msg=f"batch msg {i}"))
+            db.session.commit()
+        # the user and the notifications, whatever their number
+        self.assertEqual(get_notifications(), (count + 5, queries))
+        self.assertEqual(queries, 2)
+
     def test_notification_update_fail_unauthorized(self):
         response = self.client.patch(
             f"/notifications/{self.notification1_id}",
@@ -1,8 +1,15 @@
 import unittest
 import os
+import gzip
+import json
+from marshmallow import Schema
+from flask.json.provider import DefaultJSONProvider
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
+from social_media_application.models import Post
+from social_media_application.serializers import posts_schema
+from social_media_application.helpers.object_cache import ObjectCache
 
 
 def app():
@@ -176,6 +183,61 @@ class TestPosts(unittest.TestCase):
         self.assertEqual(response.status_code, 401)
         self.assertTrue("error" in response.json.keys())
 
+    def test_create_posts_bulk(self):
+        data = {
+            "title": "Bulk post by user1",
+            "url": "",
+            "content": "lorem ipsum dolor test content",
+            "post_type": "text",
+            "tags": "text,bulk,user1",
+        }
+        response = self.client.post(
+            "/posts/bulk",
+            headers={"Authorization": "Token " + self.token1},
+            json={"posts": [data, {**data, "post_type": "image", "url": "https://a.b"}]},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result["status"] for result in response.json], [201, 201])
+        self.assertEqual(response.json[0]["post"]["url"], None)
+        self.assertEqual(response.json[1]["post"]["post_type"], "image")
+
+    def test_create_posts_bulk_partial(self):
+        data = {
+            "title": "Bulk post by user1",
+            "url": "",
+            "content": "lorem ipsum dolor test content",
+            "post_type": "text",
+            "tags": "text,bulk,user1",
+        }
+        response = self.client.post(
+            "/posts/bulk",
+            headers={"Authorization": "Token " + self.token1},
+            json={"posts": [data, {**data, "post_type": "some random type"}, {}]},
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(
+            [result["status"] for result in response.json], [201, 400, 400]
+        )
+        self.assertTrue("id" in response.json[0]["post"].keys())
+        self.assertTrue("error" in response.json[1].keys())
+
+    def test_create_posts_bulk_fail_too_large(self):
+        data = {
+            "title": "Bulk post by user1",
+            "url": "",
+            "content": "lorem ipsum dolor test content",
+            "post_type": "text",
+            "tags": "text,bulk,user1",
+        }
+        max_size = self.app_test.config["POST_BULK_MAX_SIZE"]
+        response = self.client.post(
+            "/posts/bulk",
+            headers={"Authorization": "Token " + self.token1},
+            json={"posts": [data] * (max_size + 1)},
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertTrue("error" in response.json.keys())
+
     def test_get_all_posts(self):
         response = self.client.get(
             "/posts", headers={"Authorization": "Token " + self.token1}
@@ -184,6 +246,104 @@ class TestPosts(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(type(response.json) == list)
 
+    def test_get_all_posts_output_unchanged(self):
+        data = {
+            "title": "Ünïcode post ✓",
+            "url": "",
+            "content": "lorem ipsum dolor test content",
+            "post_type": "text",
+            "tags": "text,unicode",
+        }
+        self.client.post(
+            "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+        )
+        with self.app_test.test_request_context():
+            posts = Post.query.all()
+            dumped = posts_schema.dump(posts)
+            # compiled schema and orjson provider against marshmallow and Flask's provider
+            self.assertEqual(dumped, Schema.dump(posts_schema, posts, many=True))
+            self.assertEqual(
+                self.app_test.json.response(dumped).get_data(),
+                DefaultJSONProvider(self.app_test).response(dumped).get_data(),
+            )
+
+    def test_get_all_posts_stream(self):
+        headers = {"Authorization": "Token " + self.token1}
+        response = self.client.get("/posts", headers=headers)
+        streamed = self.client.get("/posts?stream=true", headers=headers)
+        self.assertEqual(streamed.status_code, 200)
+        self.assertEqual(streamed.get_data(), response.get_data())
+        ndjson = self.client.get(
+            "/posts", headers={**headers, "Accept": "application/x-ndjson"}
+        )
+        self.assertEqual(ndjson.mimetype, "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line) for line in ndjson.get_data().splitlines()],
+            response.json,
+        )
+
+    def test_get_all_posts_paginated(self):
+        headers = {"Authorization": "Token " + self.token1}
+        posts = self.client.get("/posts", headers=headers).json
+        self.assertTrue(len(posts) > 1)
+        pages = []
+        url = "/posts?limit=1"
+        while url:
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json), 1)
+            pages += response.json
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor:
+                self.assertTrue("cursor=" + cursor in response.headers["Link"])
+            url = cursor and "/posts?limit=1&cursor=" + cursor
+        self.assertEqual(pages, posts)
+        pub_dates = [post["pub_date"] for post in posts]
+        self.assertEqual(pub_dates, sorted(pub_dates, reverse=True))
+
+    def test_get_all_posts_fail_invalid_cursor(self):
+        response = self.client.get(
+            "/posts?cursor=not-a-cursor",
+            headers={"Authorization": "Token " + self.token1},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
+
+    def test_get_all_posts_fields(self):
+        response = self.client.get(
+            "/posts?fields=id,title",
+            headers={"Authorization": "Token " + self.token1},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(set(post) == {"id", "title"} for post in response.json))
+
+    def test_get_all_posts_fields_fail_unknown_field(self):
+        response = self.client.get(
+            "/posts?fields=id,password",
+            headers={"Authorization": "Token " + self.token1},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
+
+    def test_get_all_posts_gzip(self):
+        headers = {"Authorization": "Token " + self.token1}
+        response = self.client.get("/posts", headers=headers)
+        middleware = self.app_test.wsgi_app
+        min_size = middleware.min_size
+        middleware.min_size = 0
+        try:
+            for url in ("/posts", "/posts?stream=true"):
+                compressed = self.client.get(
+                    url, headers={**headers, "Accept-Encoding": "gzip"}
+                )
+                self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+                self.assertIn("Accept-Encoding", compressed.headers["Vary"])
+                self.assertEqual(
+                    gzip.decompress(compressed.get_data()), response.get_data()
+                )
+        finally:
+            middleware.min_size = min_size
+
     def test_get_all_posts_fail_unauthenticated(self):
         response = self.client.get("/posts")
         # print(response.json)
@@ -207,6 +367,42 @@ class TestPosts(unittest.TestCase):
         # print(response.json)
         self.assertEqual(response.status_code, 200)
 
+    def test_get_post_by_id_cached_then_updated(self):
+        url = f"/posts/{self.post1_id}"
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        response = self.client.patch(
+            url,
+            headers={"Authorization": "Token " + self.token1},
+            json={"title": "cached then updated"},
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(response.json["title"], "cached then updated")
+
+    def test_object_cache_shared_backend(self):
+        class SharedBackend(dict):
+            def get(self, key):
+                return dict.get(self, key)
+
+            def set(self, key, value, ttl):
+                self[key] = value
+
+            def add(self, key, value, ttl):
+                self.setdefault(key, value)
+
+        shared = SharedBackend()
+        worker1 = ObjectCache(10, 60, 0, shared)
+        worker2 = ObjectCache(10, 60, 0, shared)
+        worker1.set("post", self.post1_id, b"old")
+        self.assertEqual(worker2.get("post", self.post1_id), b"old")
+        worker2.invalidate("post", [self.post1_id])
+        self.assertIsNone(worker1.get("post", self.post1_id))
+        # a lookup that read the post before the write cannot cache it back
+        worker1.set("post", self.post1_id, b"old")
+        self.assertIsNone(worker2.get("post", self.post1_id))
+
     def test_update_post_by_id_fail_invalid_id(self):
         data = {"content": "updated content"}
         response = self.client.patch(
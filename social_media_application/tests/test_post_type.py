@@ -98,3 +98,21 @@ class TestPostType(unittest.TestCase):
         response = self.client.get("/post-types")
         self.assertEqual(response.status_code, 200)
         self.assertTrue(type(response.json) == list)
+
+    def test_get_post_type_paginated(self):
+        names = [post_type["name"] for post_type in self.client.get("/post-types").json]
+        response = self.client.get("/post-types?limit=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post_type["name"] for post_type in response.json], names[:1])
+        if len(names) > 1:
+            cursor = response.headers["X-Next-Cursor"]
+            response = self.client.get("/post-types?limit=1&cursor=" + cursor)
+            self.assertEqual(
+                [post_type["name"] for post_type in response.json], names[1:2]
+            )
+        self.assertEqual(names, sorted(names))
+
+    def test_get_post_type_fail_invalid_limit(self):
+        response = self.client.get("/post-types?limit=0")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
@@ -1,8 +1,13 @@
 import unittest
 import os
+import uuid
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
+from social_media_application.helpers.search import (
+    IndexSearchBackend,
+    SQLSearchBackend,
+)
 
 
 def app():
@@ -154,3 +159,291 @@ class TestSearch(unittest.TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 400)
         self.assertTrue("error" in response.json.keys())
+
+    def test_search_tag_exact(self):
+        data = {
+            "title": "Tagged post by user1",
+            "url": "",
+            "content": "lorem ipsum dolor test content",
+            "post_type": "text",
+            "tags": " #Concatenate,Felines",
+        }
+        response = self.client.post(
+            "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+        )
+        post_id = response.json["id"]
+        response = self.client.get("/search?tag=cat")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/search?tag=concatenate")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["id"] for post in response.json], [post_id])
+
+    def test_search_tag_paginated(self):
+        response = self.client.get(f"/search?tag={self.post1_tags}&limit=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json), 1)
+        self.assertFalse("X-Next-Cursor" in response.headers)
+
+    def test_search_full_text(self):
+        data = {
+            "title": "Zebras of the savanna",
+            "url": "",
+            "content": "a quixotic herd grazing at dawn",
+            "post_type": "text",
+            "tags": "wildlife",
+        }
+        response = self.client.post(
+            "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+        )
+        post_id = response.json["id"]
+        for query in ("zebra", "quixotic herds", "wildlife"):
+            response = self.client.get(f"/search?q={query}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json[0]["id"], post_id)
+
+    def test_search_full_text_fail(self):
+        response = self.client.get("/search?q=jvbifhvhjibbivb")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
+
+    def test_search_full_text_index(self):
+        backend = self.app_test.extensions["search_backend"]
+        self.app_test.extensions["search_backend"] = IndexSearchBackend()
+        try:
+            post_ids = []
+            for i in range(3):
+                data = {
+                    "title": f"Quokka sighting {i}",
+                    "url": "",
+                    "content": "a smiling quokka on rottnest island",
+                    "post_type": "text",
+                    "tags": "wildlife",
+                }
+                response = self.client.post(
+                    "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+                )
+                post_ids.append(response.json["id"])
+            response = self.client.get("/search?q=quokka&limit=2")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json), 2)
+            found = [post["id"] for post in response.json]
+            response = self.client.get(
+                "/search?q=quokka&limit=2&cursor=" + response.headers["X-Next-Cursor"]
+            )
+            found += [post["id"] for post in response.json]
+            self.assertEqual(sorted(found), sorted(post_ids))
+
+            self.client.delete(
+                f"/posts/{post_ids[0]}", headers={"Authorization": "Token " + self.token1}
+            )
+            response = self.client.get("/search?q=quokka")
+            self.assertEqual(len(response.json), 2)
+            self.assertFalse(post_ids[0] in [post["id"] for post in response.json])
+        finally:
+            self.app_test.extensions["search_backend"] = backend
+
+    def test_search_full_text_backends_agree(self):
+        posts = [
+            ("Meerkats on sentry duty", "a mob watching the desert", "wildlife,desert"),
+            ("Desert foxes", "fennec foxes hunting at night", "wildlife,desert"),
+            ("Sentry post", "a lonely guard watching", "army"),
+        ]
+        for title, content, tags in posts:
+            self.client.post(
+                "/posts",
+                headers={"Authorization": "Token " + self.token1},
+                json={
+                    "title": title,
+                    "url": "",
+                    "content": content,
+                    "post_type": "text",
+                    "tags": tags,
+                },
+            )
+        queries = (
+            "meerkat",
+            "desert watching",
+            "desert -foxes",
+            '"sentry duty"',
+            "fennec or guard",
+            "the deserts",
+            'watching -"sentry duty"',
+        )
+        backend = self.app_test.extensions["search_backend"]
+        cache = self.app_test.extensions.get("search_cache")
+        self.app_test.extensions["search_cache"] = None
+        try:
+            results = {}
+            for name, search_backend in (
+                ("sql", SQLSearchBackend()),
+                ("index", IndexSearchBackend()),
+            ):
+                self.app_test.extensions["search_backend"] = search_backend
+                for query in queries:
+                    response = self.client.get("/search", query_string={"q": query})
+                    ids = []
+                    if response.status_code == 200:
+                        ids = sorted(post["id"] for post in response.json)
+                    results.setdefault(query, {})[name] = (response.status_code, ids)
+            for query in queries:
+                self.assertEqual(results[query]["sql"], results[query]["index"], query)
+        finally:
+            self.app_test.extensions["search_backend"] = backend
+            self.app_test.extensions["search_cache"] = cache
+
+    def test_search_index_snapshot_keeps_local_writes(self):
+        import tempfile
+        import time
+        from datetime import datetime
+        from social_media_application.helpers.search_index import InvertedIndex
+
+        path = os.path.join(tempfile.mkdtemp(), "posts.idx")
+        backend = self.app_test.extensions["search_backend"]
+        index_backend = IndexSearchBackend(path, refresh_interval=0)
+        self.app_test.extensions["search_backend"] = index_backend
+        try:
+            data = {
+                "title": "Platypus spotted",
+                "url": "",
+                "content": "by the creek",
+                "post_type": "text",
+                "tags": "wildlife",
+            }
+            response = self.client.post(
+                "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+            )
+            post_id = response.json["id"]
+            response = self.client.get("/search?q=platypus")
+            self.assertEqual([post["id"] for post in response.json], [post_id])
+            self.client.patch(
+                f"/posts/{post_id}",
+                headers={"Authorization": "Token " + self.token1},
+                json={"title": "Echidna spotted"},
+            )
+            # a snapshot built from the post before the edit
+            with self.app_test.app_context():
+                InvertedIndex.from_posts(
+                    [(uuid.UUID(post_id), "Platypus spotted", "", "", datetime.utcnow())],
+                    path,
+                )
+            os.utime(path, (time.time() + 1, time.time() + 1))
+            response = self.client.get("/search?q=echidna")
+            self.assertEqual([post["id"] for post in response.json], [post_id])
+        finally:
+            self.app_test.extensions["search_backend"] = backend
+
+    def test_search_index_compaction(self):
+        from datetime import datetime
+        from social_media_application.helpers.search_index import InvertedIndex
+
+        index = InvertedIndex()
+        index.BUFFER_SIZE = 10
+        posts = [
+            (uuid.uuid4(), f"Wombat {i}", "burrow", "", datetime.utcnow())
+            for i in range(50)
+        ]
+        for _ in range(100):
+            for post in posts:
+                index.add(*post)
+        stored = sum(len(segment.ids) for segment in index.segments)
+        self.assertTrue(stored + len(index.buffer) <= 2 * len(posts))
+        self.assertEqual(len(index), len(posts))
+        hits = index.search("wombat burrow", datetime.utcnow(), 100)
+        self.assertEqual(sorted(id for id, _ in hits), sorted(id for id, *_ in posts))
+
+    def test_search_index_refresh_skips_indexed(self):
+        backend = self.app_test.extensions["search_backend"]
+        index_backend = IndexSearchBackend(refresh_interval=0)
+        self.app_test.extensions["search_backend"] = index_backend
+        try:
+            data = {
+                "title": "Numbat foraging",
+                "url": "",
+                "content": "termites everywhere",
+                "post_type": "text",
+                "tags": "wildlife",
+            }
+            self.client.post(
+                "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+            )
+            response = self.client.get("/search?q=numbat")
+            self.assertEqual(len(response.json), 1)
+            with self.app_test.app_context():
+                index_backend.refresh()
+                index = index_backend.index
+                stored = sum(len(segment.ids) for segment in index.segments)
+                stored += len(index.buffer)
+                for _ in range(3):
+                    index_backend.refresh()
+                self.assertEqual(
+                    sum(len(segment.ids) for segment in index.segments)
+                    + len(index.buffer),
+                    stored,
+                )
+        finally:
+            self.app_test.extensions["search_backend"] = backend
+
+    def test_search_cache(self):
+        data = {
+            "title": "Cached post by user1",
+            "url": "",
+            "content": "lorem ipsum dolor test content",
+            "post_type": "text",
+            "tags": "cachedtag",
+        }
+        self.client.post(
+            "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+        )
+        response = self.client.get("/search/cache")
+        self.assertEqual(response.status_code, 401)
+        hits = self.client.get(
+            "/search/cache", headers={"Authorization": "Token " + self.token1}
+        ).json["hits"]
+        response = self.client.get("/search?tag=cachedtag")
+        self.assertEqual(len(response.json), 1)
+        response = self.client.get("/search?tag=%23CachedTag")
+        self.assertEqual(len(response.json), 1)
+        stats = self.client.get(
+            "/search/cache", headers={"Authorization": "Token " + self.token1}
+        ).json
+        self.assertEqual(stats["hits"], hits + 1)
+        self.assertTrue(stats["latency_saved_seconds"] > 0)
+
+        self.client.post(
+            "/posts", headers={"Authorization": "Token " + self.token1}, json=data
+        )
+        response = self.client.get("/search?tag=cachedtag")
+        self.assertEqual(len(response.json), 2)
+
+    def test_search_cache_invalidated_fill(self):
+        from social_media_application.helpers.search_cache import SearchCache
+
+        cache = SearchCache(1 << 20, 60)
+        response = self.app_test.response_class(b"[]", status=200)
+        # a write committing while the response is computed drops it
+        fill = cache.reserve({("tag", "racetag")})
+        cache.invalidate({("tag", "racetag")})
+        self.assertFalse(cache.complete(fill, "stale", response, 0.1))
+        self.assertIsNone(cache.get("stale"))
+        fill = cache.reserve({("tag", "racetag")})
+        cache.invalidate({("tag", "othertag")})
+        self.assertTrue(cache.complete(fill, "fresh", response, 0.1))
+        self.assertIsNotNone(cache.get("fresh"))
+
+    def test_search_users_prefix(self):
+        response = self.client.get(f"/search/users?prefix={self.username1[:5].upper()}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.username1 in [user["username"] for user in response.json])
+        self.assertTrue(all("email" not in user.keys() for user in response.json))
+        self.assertTrue("first_name" in response.json[0].keys())
+
+    def test_search_users_fuzzy(self):
+        typo = self.username1[:-1] + "x"
+        response = self.client.get(f"/search/users?prefix={typo}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.username1 in [user["username"] for user in response.json])
+
+    def test_search_users_fail_no_prefix(self):
+        response = self.client.get("/search/users")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue("error" in response.json.keys())
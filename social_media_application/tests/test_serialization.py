@@ -0,0 +1,137 @@
+import unittest
+import os
+from sqlalchemy.sql import text
+
+from social_media_application import create_app, db, ma
+from social_media_application.models import (
+    User,
+    Profile,
+    Post,
+    Connection,
+    Notification,
+)
+from social_media_application.serializers import (
+    UserSchema,
+    ProfileSchema,
+    PostSchema,
+    ConnectionSchema,
+    NotificationSchema,
+)
+
+
+def app():
+    db_uri = f'postgresql://{os.environ.get("POSTGRES_USERNAME")}:{os.environ.get("PASSWORD")}@{os.environ.get("HOST")}/social_media_test'
+    app = create_app(db_uri=db_uri)
+    with app.app_context():
+        from social_media_application import views
+        from social_media_application import models
+        from social_media_application import serializers
+
+        db.create_all()
+    return app
+
+
+app_test = app()
+client = app_test.test_client()
+
+
+class TestCompiledSchema(unittest.TestCase):
+    """
+    CompiledSchema relies on private marshmallow APIs: its dump must stay
+    the same as the one of ma.Schema for every schema using it
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app_test = app_test
+        cls.client = app_test.test_client()
+
+        tokens = []
+        for i in (1, 2):
+            cls.client.post(
+                "/register",
+                json={
+                    "username": f"serialuser{i}",
+                    "password": "Test@Abcd",
+                    "email": f"serial{i}@gmail.com",
+                    "first_name": f"serial{i}",
+                    "last_name": f"serial{i}",
+                    "bio": f"test bio {i}",
+                    "profile_pic": "https://unsplash.com/photos/man-wearing-green-polo-shirt-6anudmpILw4",
+                },
+                content_type="application/json",
+            )
+            response = cls.client.post(
+                "/login",
+                json={"username": f"serialuser{i}", "password": "Test@Abcd"},
+                content_type="application/json",
+            )
+            tokens.append(response.json["token"])
+
+        # a connection, and the notifications of the follow request
+        response = cls.client.post(
+            "/follow-requests",
+            headers={"Authorization": "Token " + tokens[0]},
+            json={"user": "serialuser2"},
+        )
+        cls.client.patch(
+            f"/follow-requests/{response.json['id']}",
+            headers={"Authorization": "Token " + tokens[1]},
+            json={"response": "accept"},
+        )
+
+        cls.client.post(
+            "/post-types",
+            headers={"Authorization": "Token " + tokens[0]},
+            json={"name": "text"},
+        )
+        cls.client.post(
+            "/posts",
+            headers={"Authorization": "Token " + tokens[0]},
+            json={
+                "title": "Serialized post",
+                "url": "https://unsplash.com/photos/a-bunch-of-pink-donuts-are-stacked-on-top-of-each-other-obyYZVKwCNI",
+                "content": "lorem ipsum dolor test content",
+                "post_type": "text",
+                "tags": "text,serialization",
+            },
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        with cls.app_test.app_context():
+            meta = db.metadata
+            for table in reversed(meta.sorted_tables):
+                db.session.execute(
+                    text(
+                        f'TRUNCATE TABLE public."{table.name}" CONTINUE IDENTITY CASCADE;'
+                    )
+                )
+                db.session.commit()
+
+    def assertSameDump(self, schema_class, model, **kwargs):
+        with self.app_test.app_context():
+            rows = model.query.all()
+            self.assertTrue(rows)
+            schema = schema_class(many=True, **kwargs)
+            self.assertEqual(schema.dump(rows), ma.Schema.dump(schema, rows))
+            schema = schema_class(**kwargs)
+            self.assertEqual(schema.dump(rows[0]), ma.Schema.dump(schema, rows[0]))
+
+    def test_user_schema(self):
+        self.assertSameDump(UserSchema, User)
+
+    def test_user_schema_only(self):
+        self.assertSameDump(UserSchema, User, only=("username",))
+
+    def test_profile_schema(self):
+        self.assertSameDump(ProfileSchema, Profile)
+
+    def test_post_schema(self):
+        self.assertSameDump(PostSchema, Post)
+
+    def test_connection_schema(self):
+        self.assertSameDump(ConnectionSchema, Connection)
+
+    def test_notification_schema(self):
+        self.assertSameDump(NotificationSchema, Notification)
@@ -3,6 +3,7 @@ import os
 from sqlalchemy.sql import text
 
 from social_media_application import create_app, db
+from social_media_application.tests.helpers import count_queries
 from social_media_application.models import User
 
 
@@ -97,6 +98,24 @@ class TestUser(unittest.TestCase):
         self.assertTrue(type(response.json) == list)
         self.assertTrue(len(response.json) > 0)
 
+    def test_get_all_users_queries(self):
+        with count_queries(self.app_test) as statements:
+            response = self.client.get(
+                "/users", headers={"Authorization": "Token " + self.token1}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all("profile" in user for user in response.json))
+        # the authenticated user, then the users and their profiles
+        self.assertEqual(len(statements), 3)
+
+    def test_get_all_users_fields(self):
+        response = self.client.get(
+            "/users?fields=username",
+            headers={"Authorization": "Token " + self.token1},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(set(user) == {"username"} for user in response.json))
+
     def test_get_all_users_fail_unauthenticated(self):
         response = self.client.get("/users")
         self.assertEqual(response.status_code, 401)
@@ -132,6 +151,18 @@ class TestUser(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json["profile"]["first_name"], "updated_first_name")
 
+    def test_update_user_after_get(self):
+        url = f"/users/{self.user1_id}"
+        self.client.get(url, headers={"Authorization": "Token " + self.token2})
+        response = self.client.patch(
+            url,
+            headers={"Authorization": "Token " + self.token1},
+            json={"bio": "bio after get"},
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, headers={"Authorization": "Token " + self.token2})
+        self.assertEqual(response.json["profile"]["bio"], "bio after get")
+
     def test_update_user_fail_others_id(self):
         update_info = {"first_name": "updated_first_name"}
         response = self.client.patch(
@@ -1,6 +1,7 @@
 from flask import request, jsonify, make_response
 from flask import current_app as app
 
+import jwt
 import uuid
 
 from social_media_application.models import (
@@ -10,7 +11,18 @@ from social_media_application.models import (
     BlacklistToken,
 )
 from social_media_application.serializers import user_schema
-from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.hashing import HashingBusy
+from social_media_application.helpers.permissions import (
+    authenticate_user,
+    invalidate_principal,
+)
+from social_media_application.helpers.search_cache import (
+    search_topics,
+    invalidate_search,
+)
+
+# a request refused by the saturated password hasher is worth retrying soon
+RETRY_AFTER = {"Retry-After": "1"}
 
 
 @app.route("/register", methods=["POST"])
@@ -36,6 +48,7 @@ def new_user():
                 return make_response(jsonify(response_object)), 400
 
             user = User(username=username, email=email, password=password)
+            topics = search_topics(users=[user])
             db.session.add(user)
             db.session.commit()
             profile = Profile(
@@ -47,11 +60,15 @@ def new_user():
             )
             db.session.add(profile)
             db.session.commit()
+            invalidate_search(topics)
             data_dict = user_schema.dump(user)
             response_object = data_dict
             return make_response(jsonify(response_object)), 201
         response_object = {"error": "Invalid credentials"}
         return make_response(jsonify(response_object)), 400
+    except HashingBusy as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object), 503, RETRY_AFTER)
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
@@ -66,9 +83,15 @@ def change_password(**kwargs):
         if user:
             if user.verify_password(post_data.get("current_password")):
                 user.hash_password(post_data.get("new_password"))
+                # every session is logged out, this one gets new tokens
+                user.token_version += 1
                 db.session.add(user)
                 db.session.commit()
-                response_object = {}
+                invalidate_principal(user_id=user.id)
+                response_object = {
+                    "token": user.generate_auth_token(),
+                    "refresh_token": user.generate_refresh_token(),
+                }
                 return make_response(jsonify(response_object)), 200
             else:
                 response_object = {"error": "current password is incorrect"}
@@ -76,6 +99,9 @@ def change_password(**kwargs):
         else:
             response_object = {"error": "user not found"}
             return make_response(jsonify(response_object)), 400
+    except HashingBusy as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object), 503, RETRY_AFTER)
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
@@ -113,13 +139,18 @@ def forgot_password_reset(token, **kwargs):
         if user:
             user.hash_password(post_data.get("new_password"))
             user.forget_password_token = None
+            user.token_version += 1
             db.session.add(user)
             db.session.commit()
+            invalidate_principal(user_id=user.id)
             response_object = {}
             return make_response(jsonify(response_object)), 200
         else:
             response_object = {"error": "user not found"}
             return make_response(jsonify(response_object)), 400
+    except HashingBusy as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object), 503, RETRY_AFTER)
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
@@ -128,7 +159,8 @@ def forgot_password_reset(token, **kwargs):
 @app.route("/login", methods=["Post"])
 def login():
     """
-    Returns json in which is token based on expired-time PyJWT
+    Returns json with a short-lived access token (token) and the refresh
+    token exchanging it at /token/refresh (refresh_token)
     :return: json
     """
 
@@ -141,6 +173,8 @@ def login():
             and user.verify_password(post_data.get("password"))
             and (not user.archive)
         ):
+            # persists the hash when verify_password upgraded its cost
+            db.session.commit()
             auth_token = user.generate_auth_token()
         else:
             response_object = {"error": "incorrect credentials"}
@@ -148,8 +182,50 @@ def login():
         if auth_token:
             response_object = {
                 "token": auth_token,
+                "refresh_token": user.generate_refresh_token(),
             }
             return make_response(jsonify(response_object)), 200
+    except HashingBusy as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object), 503, RETRY_AFTER)
+    except Exception as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object)), 400
+
+
+@app.route("/token/refresh", methods=["Post"])
+def refresh_token():
+    """
+    Exchanges a refresh token for a new access token and a new refresh token.
+    Refresh tokens are single use, the one exchanged is blacklisted.
+    This is where revocation is checked against the database.
+    :param refresh_token: str
+    :return: json
+    """
+    try:
+        token = request.get_json().get("refresh_token")
+        try:
+            claims = User.decode_auth_token(token, token_type="refresh")
+        except jwt.InvalidTokenError:
+            response_object = {"error": "Invalid token. Please log in again."}
+            return make_response(jsonify(response_object)), 401
+        user = db.session.get(User, uuid.UUID(claims["sub"]))
+        if (
+            not user
+            or user.archive
+            or user.token_version != claims["ver"]
+            or BlacklistToken.query.filter_by(jti=claims["jti"]).first()
+        ):
+            response_object = {"error": "Token revoked. Please log in again."}
+            return make_response(jsonify(response_object)), 401
+        # the unique jti makes a concurrent exchange of the same token fail here
+        db.session.add(BlacklistToken(token=token))
+        db.session.commit()
+        response_object = {
+            "token": user.generate_auth_token(),
+            "refresh_token": user.generate_refresh_token(),
+        }
+        return make_response(jsonify(response_object)), 200
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
@@ -159,14 +235,40 @@ def login():
 @authenticate_user
 def logout(**kwargs):
     """
-    Makes logout from current account,
+    Makes logout from current account, revoking the access token and the
+    refresh token when one is sent. With all=true every session of the user is logged out
+    :param refresh_token: str, optional
+    :param all: boolean, optional
     :return: response
     """
     try:
+        post_data = request.get_json(silent=True) or {}
+        user = kwargs.get("current_user")
         token = request.headers.get("Authorization").split(" ")[1]
         blacklist_token = BlacklistToken(token=token)
         db.session.add(blacklist_token)
+        claims = None
+        if post_data.get("refresh_token"):
+            # an expired or invalid refresh token can't be used anymore, the
+            # access token is still revoked
+            try:
+                claims = User.decode_auth_token(
+                    post_data.get("refresh_token"), token_type="refresh"
+                )
+            except jwt.InvalidTokenError:
+                pass
+            if (
+                claims is not None
+                and claims["sub"] == str(user.id)
+                and not BlacklistToken.query.filter_by(jti=claims["jti"]).first()
+            ):
+                db.session.add(BlacklistToken(token=post_data.get("refresh_token")))
+        if post_data.get("all"):
+            user.token_version += 1
         db.session.commit()
+        invalidate_principal(
+            token=token, user_id=user.id if post_data.get("all") else None
+        )
         response_object = {}
         return make_response(jsonify(response_object)), 205
     except Exception as e:
@@ -6,36 +6,57 @@ from sqlalchemy import or_
 from social_media_application.models import db, Connection
 from social_media_application.serializers import connections_schema
 from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.feed import unlink_connection
+from social_media_application.helpers.fieldsets import (
+    requested_fields,
+    expand_fields,
+    sparse_schema,
+    load_columns,
+)
+from social_media_application.helpers.pagination import paginate, set_next_cursor
 
 
 @app.route("/connections", methods=["GET"])
 @authenticate_user
 def get_connections(**kwargs):
+    """
+    Returns json where the accepted connections of the user are listed,
+    `user` being the other end of each
+    Connections are listed one page at a time, the cursor of the next page
+    is sent back in the X-Next-Cursor and Link headers
+    With fields=<name>,... only these fields are loaded and returned
+    :param limit: int
+    :param cursor: str
+    :param fields: str
+    :return: json
+    """
     try:
         user = kwargs.get("current_user")
-        connections = (
-            db.session.execute(
-                db.select(Connection)
-                .where(Connection.accepted == True)
-                .where(
-                    or_(Connection.sender == user.id, Connection.receiver == user.id)
-                )
-                .where(Connection.archive == False)
-            )
-            .scalars()
-            .all()
+        fields = requested_fields(("id", "user", "accepted", "archive"))
+        schema_fields = expand_fields(fields, {"user": ("sender", "receiver")})
+        connections, next_cursor = paginate(
+            db.select(Connection)
+            .options(*load_columns(Connection, schema_fields))
+            .where(Connection.accepted == True)
+            .where(or_(Connection.sender == user.id, Connection.receiver == user.id))
+            .where(Connection.archive == False),
+            (Connection.id,),
         )
-        connections = connections_schema.dump(connections)
-        for connection in connections:
-            if connection["sender"] == user.username:
-                connection["user"] = connection.pop("receiver")
-                del_key = "sender"
-            elif connection["receiver"] == user.username:
-                connection["user"] = connection.pop("sender")
-                del_key = "receiver"
-            del connection[del_key]
+        connections = sparse_schema(connections_schema, schema_fields).dump(
+            connections
+        )
+        if fields is None or "user" in fields:
+            for connection in connections:
+                if connection["sender"] == user.username:
+                    connection["user"] = connection.pop("receiver")
+                    del_key = "sender"
+                elif connection["receiver"] == user.username:
+                    connection["user"] = connection.pop("sender")
+                    del_key = "receiver"
+                del connection[del_key]
         response_object = connections
-        return make_response(jsonify(response_object)), 200
+        response = set_next_cursor(make_response(jsonify(response_object)), next_cursor)
+        return response, 200
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
@@ -50,6 +71,7 @@ def unfollow(id, **kwargs):
         if connection:
             if connection.sender == user.id or connection.receiver == user.id:
                 Connection.query.filter_by(id=id).delete()
+                unlink_connection(connection)
                 db.session.commit()
                 response_object = {}
                 return make_response(jsonify(response_object)), 204
@@ -1,19 +1,29 @@
-from flask import jsonify, make_response
+from flask import request, jsonify, make_response
 from flask import current_app as app
 
-from sqlalchemy import or_
+import uuid
+from datetime import datetime
 
-from social_media_application.models import (
-    db,
-    User,
-    Post,
-    Connection,
+from social_media_application.models import Post
+from social_media_application.serializers import posts_schema
+from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.feed import (
+    read_feed,
+    feed_etag,
+    connected_since,
 )
-from social_media_application.serializers import (
-    posts_schema,
-    connections_schema,
+from social_media_application.helpers.ranking import rank_posts
+from social_media_application.helpers.fieldsets import (
+    requested_fields,
+    sparse_schema,
+    load_columns,
+)
+from social_media_application.helpers.pagination import (
+    encode_cursor,
+    decode_cursor,
+    page_args,
+    set_next_cursor,
 )
-from social_media_application.helpers.permissions import authenticate_user
 
 
 @app.route("/feed", methods=["GET"])
@@ -21,38 +31,71 @@ from social_media_application.helpers.permissions import authenticate_user
 def get_user_feed(**kwargs):
     """
     Returns json where posts from Connectioning users are listed (posts_schema)
+    Posts are read from the user's materialized timeline merged with the posts
+    of pulled connections, newest first, one page at a time. The cursor of the
+    next page is sent back in the X-Next-Cursor and Link headers, and the
+    cursor of the newest post of the first page in X-Latest-Cursor.
+    With since=<cursor>, only posts newer than that cursor are returned.
+    With mode=ranked, the FEED_RANK_CANDIDATES newest posts are scored by
+    recency, connection age and post type, and the best `limit` are returned
+    without a cursor.
+    Responses carry a weak ETag derived from the connection set and the newest
+    visible post; a matching If-None-Match is answered with 304.
+    :param mode: str, latest | ranked
+    :param limit: int
+    :param cursor: str
+    :param since: str
+    :param fields: str, only these post fields are loaded and returned
     :return: json
     """
     try:
         user = kwargs.get("current_user")
-        connections = (
-            db.session.execute(
-                db.select(Connection)
-                .where(Connection.accepted == True)
-                .where(
-                    or_(Connection.sender == user.id, Connection.receiver == user.id)
-                )
-                .where(Connection.archive == False)
-            )
-            .scalars()
-            .all()
+        limit, cursor = page_args(
+            app.config["FEED_PAGE_SIZE"], app.config["FEED_MAX_PAGE_SIZE"]
         )
-        connections = connections_schema.dump(connections)
-        if len(connections) != 0:
-            users = set()
-            for connection in connections:
-                users.add(connection["sender"])
-                users.add(connection["receiver"])
-            users.remove(user.username)
-            creators = [
-                User.query.filter_by(username=user).first().id for user in users
-            ]
-            response_object = posts_schema.dump(
-                db.session.query(Post).filter(Post.creator.in_(creators)).all()
+        mode = request.args.get("mode", "latest")
+        if mode not in ("latest", "ranked"):
+            response_object = {"error": "unknown feed mode {}".format(mode)}
+            return make_response(jsonify(response_object)), 400
+        since = request.args.get("since")
+        after = decode_cursor(cursor, datetime, uuid.UUID) if cursor else None
+        newer_than = decode_cursor(since, datetime, uuid.UUID) if since else None
+
+        fields = requested_fields(posts_schema.fields)
+        # merging and ranking read these whatever the fields asked for
+        options = load_columns(Post, fields, "creator", "pub_date", "post_type")
+
+        etag, pulled = feed_etag(user.id, mode, limit, cursor, since, fields)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        next_cursor = None
+        if mode == "ranked":
+            entries = read_feed(
+                user.id,
+                app.config["FEED_RANK_CANDIDATES"] - 1,
+                pulled=pulled,
+                options=options,
             )
+            posts = rank_posts(
+                [post for _, _, post in entries], connected_since(user.id)
+            )[:limit]
         else:
-            response_object = []
-        return make_response(jsonify(response_object)), 200
+            entries = read_feed(user.id, limit, after, newer_than, pulled, options)
+            if len(entries) > limit:
+                entries = entries[:limit]
+                next_cursor = encode_cursor(*entries[-1][:2])
+            posts = [post for _, _, post in entries]
+        response_object = sparse_schema(posts_schema, fields).dump(posts)
+        response = set_next_cursor(make_response(jsonify(response_object)), next_cursor)
+        if mode == "latest" and not cursor:
+            latest = encode_cursor(*entries[0][:2]) if entries else since
+            if latest:
+                response.headers["X-Latest-Cursor"] = latest
+        response.set_etag(etag, weak=True)
+        return response, 200
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
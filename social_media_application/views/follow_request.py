@@ -1,30 +1,60 @@
 from flask import request, jsonify, make_response
 from flask import current_app as app
 
+from datetime import datetime as dt
+
 from social_media_application.models import db, User, Connection, Notification
 from social_media_application.serializers import connections_schema, connection_schema
 from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.feed import link_connection
+from social_media_application.helpers.fieldsets import (
+    requested_fields,
+    expand_fields,
+    sparse_schema,
+    load_columns,
+)
+from social_media_application.helpers.pagination import paginate, set_next_cursor
 
 
 @app.route("/follow-requests", methods=["GET"])
 @authenticate_user
 def get_my_follow_requests(**kwargs):
+    """
+    Returns json where the pending follow requests sent to the user are
+    listed, `user` being their sender
+    Requests are listed one page at a time, the cursor of the next page
+    is sent back in the X-Next-Cursor and Link headers
+    With fields=<name>,... only these fields are loaded and returned
+    :param limit: int
+    :param cursor: str
+    :param fields: str
+    :return: json
+    """
     try:
         user = kwargs.get("current_user")
-        follow_requests = Connection.query.filter_by(
-            receiver=user.id, accepted=False
-        ).all()
+        fields = requested_fields(("id", "user", "accepted", "archive"))
+        schema_fields = expand_fields(fields, {"user": ("sender",)})
+        follow_requests, next_cursor = paginate(
+            db.select(Connection)
+            .options(*load_columns(Connection, schema_fields))
+            .filter_by(receiver=user.id, accepted=False),
+            (Connection.id,),
+        )
 
         if len(follow_requests) == 0:
             response_object = []
             return make_response(jsonify(response_object)), 200
 
-        follow_requests = connections_schema.dump(follow_requests)
+        follow_requests = sparse_schema(connections_schema, schema_fields).dump(
+            follow_requests
+        )
         for follow_request in follow_requests:
-            follow_request.pop("receiver")
-            follow_request["user"] = follow_request.pop("sender")
+            follow_request.pop("receiver", None)
+            if "sender" in follow_request:
+                follow_request["user"] = follow_request.pop("sender")
         response_object = follow_requests
-        return make_response(jsonify(response_object)), 200
+        response = set_next_cursor(make_response(jsonify(response_object)), next_cursor)
+        return response, 200
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
@@ -87,6 +117,8 @@ def respond_to_follow_request(id, **kwargs):
             else:
                 if request.get_json()["response"] == "accept":
                     setattr(follow_request, "accepted", True)
+                    setattr(follow_request, "accepted_at", dt.utcnow())
+                    link_connection(follow_request)
                     db.session.commit()
                     notification_object = Notification(
                         user=follow_request.sender,
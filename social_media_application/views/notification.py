@@ -4,17 +4,43 @@ from flask import current_app as app
 from social_media_application.models import db, Notification
 from social_media_application.serializers import notifications_schema
 from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.fieldsets import (
+    requested_fields,
+    sparse_schema,
+    load_columns,
+)
+from social_media_application.helpers.pagination import paginate, set_next_cursor
 
 
 @app.route("/notifications", methods=["GET"])
 @authenticate_user
 def get_all_notifications(**kwargs):
+    """
+    Returns json where the notifications of the user are listed
+    Notifications are listed newest first, one page at a time, the cursor
+    of the next page is sent back in the X-Next-Cursor and Link headers
+    With fields=<name>,... only these fields are loaded and returned
+    :param limit: int
+    :param cursor: str
+    :param fields: str
+    :return: json
+    """
     try:
         user = kwargs.get("current_user")
-        notifications = Notification.query.filter_by(user=user.id).all()
-        notifications_object = notifications_schema.dump(notifications)
+        fields = requested_fields(notifications_schema.fields)
+        notifications, next_cursor = paginate(
+            db.select(Notification)
+            .options(*load_columns(Notification, fields, "published_at"))
+            .filter_by(user=user.id),
+            (Notification.published_at, Notification.id),
+            descending=True,
+        )
+        notifications_object = sparse_schema(notifications_schema, fields).dump(
+            notifications
+        )
         response_object = notifications_object
-        return make_response(jsonify(response_object)), 200
+        response = set_next_cursor(make_response(jsonify(response_object)), next_cursor)
+        return response, 200
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
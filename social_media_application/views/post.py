@@ -1,9 +1,14 @@
 from flask import request, jsonify, make_response
 from flask import current_app as app
 
+import uuid
+from datetime import datetime as dt
+from sqlalchemy import insert
+
 from social_media_application.models import (
     db,
     Post,
+    PostType,
 )
 from social_media_application.serializers import (
     post_schema,
@@ -13,6 +18,35 @@ from social_media_application.helpers.permissions import (
     is_post_owner,
     authenticate_user,
 )
+from social_media_application.helpers.feed import (
+    fan_out_post,
+    fan_out_posts,
+    retract_post,
+    touch_posts_of,
+)
+from social_media_application.helpers.tags import tag_posts, retag_post
+from social_media_application.helpers.search import search_backend
+from social_media_application.helpers.search_cache import (
+    search_topics,
+    invalidate_search,
+)
+from social_media_application.helpers.object_cache import (
+    cached_body,
+    cache_body,
+    invalidate_objects,
+    body_response,
+)
+from social_media_application.helpers.streaming import stream_format, stream_query
+from social_media_application.helpers.fieldsets import (
+    requested_fields,
+    sparse_schema,
+    load_columns,
+)
+from social_media_application.helpers.pagination import (
+    seek,
+    paginate,
+    set_next_cursor,
+)
 
 
 @app.route("/posts", methods=["GET"])
@@ -20,10 +54,27 @@ from social_media_application.helpers.permissions import (
 def get_all_posts(**kwargs):
     """
     Returns json where noticed details about all posts (posts_schema)
+    Posts are listed newest first, one page at a time, the cursor of the
+    next page is sent back in the X-Next-Cursor and Link headers
+    Streamed with ?stream=true, or as ndjson with Accept: application/x-ndjson,
+    from the cursor to the last post
+    With fields=<name>,... only these fields are loaded and returned
+    :param limit: int
+    :param cursor: str
+    :param fields: str
     :return: json
     """
-    response_object = posts_schema.dump(Post.query.all())
-    return make_response(jsonify(response_object)), 200
+    fields = requested_fields(posts_schema.fields)
+    schema = sparse_schema(posts_schema, fields)
+    query = db.select(Post).options(*load_columns(Post, fields, "pub_date"))
+    keyset = (Post.pub_date, Post.id)
+    streaming = stream_format()
+    if streaming:
+        query = seek(query, keyset, request.args.get("cursor"), descending=True)
+        return stream_query(query, schema, streaming == "ndjson")
+    posts, next_cursor = paginate(query, keyset, descending=True)
+    response_object = schema.dump(posts)
+    return set_next_cursor(make_response(jsonify(response_object)), next_cursor), 200
 
 
 @app.route("/posts", methods=["POST"])
@@ -55,7 +106,13 @@ def new_post(**kwargs):
                 creator=user.id,
             )
             db.session.add(post_object)
+            db.session.flush()
+            tag_posts([post_object])
+            fan_out_post(post_object, user)
+            topics = search_topics(posts=[post_object])
             db.session.commit()
+            search_backend().posts_written([post_object])
+            invalidate_search(topics)
             response_object = post_schema.dump(post_object)
             return make_response(jsonify(response_object)), 201
 
@@ -67,12 +124,137 @@ def new_post(**kwargs):
         return make_response(jsonify(response_object)), 400
 
 
+# fields every post of a bulk request must have, as for POST /posts
+_POST_FIELDS = ("title", "url", "content", "post_type", "tags")
+
+
+def _invalid_post(item, post_types):
+    """
+    Returns why an item of a bulk request cannot be registered, or None
+    :param item: object, from the request json
+    :param post_types: set, names of the existing post types
+    :return: str | None
+    """
+    if not isinstance(item, dict):
+        return "post must be an object"
+    missing = [name for name in _POST_FIELDS if name not in item]
+    if missing:
+        return "missing fields: {}".format(",".join(missing))
+    for name in _POST_FIELDS:
+        value = item[name]
+        if value is None and name == "url":
+            continue
+        if not isinstance(value, str):
+            return "{} must be a string".format(name)
+        length = Post.__table__.c[name].type.length
+        if length is not None and len(value) > length:
+            return "{} is longer than {} characters".format(name, length)
+    if item["post_type"] not in post_types:
+        return "invalid post type {}".format(item["post_type"])
+    return None
+
+
+@app.route("/posts/bulk", methods=["POST"])
+@authenticate_user
+def new_posts(**kwargs):
+    """
+    Register a batch of posts, from the `posts` list of the body json, each one
+    with title, url, content, post_type, tags like for POST /posts
+    Valid posts are inserted at once in a single transaction, invalid ones are
+    left out. Returns json listing the result of each post, in the order of the
+    batch: its status and either the registered post (post_schema) or the error.
+    The response status is 201 when every post was registered, 207 when only
+    some were, 400 when none was. Batches are at most POST_BULK_MAX_SIZE posts.
+    :param posts: list
+    :return: json
+    """
+    try:
+        user = kwargs.get("current_user")
+        items = request.json["posts"]
+        if not isinstance(items, list) or not items:
+            response_object = {"error": "posts must be a non empty list"}
+            return make_response(jsonify(response_object)), 400
+        max_size = app.config["POST_BULK_MAX_SIZE"]
+        if len(items) > max_size:
+            response_object = {"error": "at most {} posts per batch".format(max_size)}
+            return make_response(jsonify(response_object)), 413
+
+        names = {
+            item["post_type"]
+            for item in items
+            if isinstance(item, dict) and isinstance(item.get("post_type"), str)
+        }
+        post_types = set(
+            db.session.execute(
+                db.select(PostType.name).where(PostType.name.in_(names))
+            ).scalars()
+        )
+        pub_date = dt.utcnow()
+        rows = []
+        results = []
+        for item in items:
+            error = _invalid_post(item, post_types)
+            if error is not None:
+                results.append({"status": 400, "error": error})
+                continue
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "creator": user.id,
+                    "title": item["title"],
+                    "url": None if item["post_type"] == "text" else item["url"],
+                    "content": item["content"],
+                    "post_type": item["post_type"],
+                    "tags": item["tags"],
+                    "pub_date": pub_date,
+                    "archive": False,
+                }
+            )
+            results.append({"status": 201})
+
+        if rows:
+            # executemany, sent as multi-row INSERTs by the driver
+            db.session.execute(insert(Post), rows)
+            posts = [Post(**row) for row in rows]
+            tag_posts(posts)
+            fan_out_posts(posts, user)
+            topics = search_topics(posts=posts)
+            db.session.commit()
+            search_backend().posts_written(posts)
+            invalidate_search(topics)
+            dumped = iter(posts_schema.dump(posts))
+            for result in results:
+                if result["status"] == 201:
+                    result["post"] = next(dumped)
+
+        if len(rows) == len(items):
+            status = 201
+        elif rows:
+            status = 207
+        else:
+            status = 400
+        response_object = results
+        return make_response(jsonify(response_object)), status
+    except Exception as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object)), 400
+
+
 @app.route("/posts/<id>", methods=["GET"])
 def get_post(id):
     try:
-        post_object = Post.query.get({"id": id})
-        response_object = post_schema.dump(post_object)
-        return make_response(jsonify(response_object)), 200
+        fields = requested_fields(post_schema.fields)
+        body = cached_body("post", id) if fields is None else None
+        if body is not None:
+            return body_response(body), 200
+        post_object = db.session.get(
+            Post, id, options=load_columns(Post, fields)
+        )
+        response_object = sparse_schema(post_schema, fields).dump(post_object)
+        response = make_response(jsonify(response_object))
+        if fields is None and post_object is not None:
+            cache_body("post", id, response.get_data())
+        return response, 200
 
     except Exception as e:
         response_object = {"error": str(e)}
@@ -81,17 +263,25 @@ def get_post(id):
 
 @app.route("/posts/<id>", methods=["PUT", "PATCH"])
 @is_post_owner
-def update_post(id):
+def update_post(id, post, **kwargs):
     try:
         post_data = request.get_json()
         if "post_type" in post_data.keys():
             if post_data["post_type"] == "text":
                 if "url" in post_data.keys():
                     post_data["url"] = None
-        post_object = Post.query.get({"id": id})
+        post_object = post
+        topics = search_topics(posts=[post_object])
         for k, v in post_data.items():
             setattr(post_object, k, v)
+        if "tags" in post_data.keys():
+            retag_post(post_object)
+        topics |= search_topics(posts=[post_object])
+        touch_posts_of(post_object.creator)
         db.session.commit()
+        search_backend().posts_written([post_object])
+        invalidate_search(topics)
+        invalidate_objects("post", [id])
         response_object = post_schema.dump(post_object)
         return make_response(jsonify(response_object)), 200
     except Exception as e:
@@ -101,12 +291,19 @@ def update_post(id):
 
 @app.route("/posts/<id>", methods=["DELETE"])
 @is_post_owner
-def delete_post(id):
+def delete_post(id, post, **kwargs):
     try:
-        post_object = Post.query.get({"id": id})
+        post_object = post
         if post_object:
-            Post.query.filter_by(id=id).delete()
+            post_id = post_object.id
+            topics = search_topics(posts=[post_object])
+            retract_post(post_id)
+            touch_posts_of(post_object.creator)
+            db.session.delete(post_object)
             db.session.commit()
+            search_backend().posts_removed([post_id])
+            invalidate_search(topics)
+            invalidate_objects("post", [post_id])
             response_object = {}
         return make_response(jsonify(response_object)), 204
     except Exception as e:
@@ -10,16 +10,27 @@ from social_media_application.serializers import (
     post_types_schema,
 )
 from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.pagination import paginate, set_next_cursor
 
 
 @app.route("/post-types", methods=["GET"])
 def get_all_post_types():
     """
     Returns json where noticed details about all post types (post_types_schema)
+    Post types are listed by name, one page at a time, the cursor of the
+    next page is sent back in the X-Next-Cursor and Link headers
+    :param limit: int
+    :param cursor: str
     :return: json
     """
-    response_object = post_types_schema.dump(PostType.query.all())
-    return make_response(jsonify(response_object)), 200
+    try:
+        post_types, next_cursor = paginate(db.select(PostType), (PostType.name,))
+        response_object = post_types_schema.dump(post_types)
+        response = set_next_cursor(make_response(jsonify(response_object)), next_cursor)
+        return response, 200
+    except Exception as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object)), 400
 
 
 @app.route("/post-types", methods=["POST"])
@@ -1,16 +1,24 @@
 from flask import jsonify, make_response, request
 from flask import current_app as app
 
-from social_media_application.models import User, Post
-from social_media_application.serializers import user_schema, posts_schema
+from social_media_application.serializers import (
+    user_schema,
+    posts_schema,
+    user_suggestions_schema,
+)
+from social_media_application.helpers.search import search_backend
+from social_media_application.helpers.permissions import authenticate_user
+from social_media_application.helpers.pagination import page_args, set_next_cursor
+from social_media_application.helpers.search_cache import cached_search, search_cache
 
 
 @app.route("/search", methods=["GET"])
+@cached_search
 def search():
     try:
         username = request.args.get("username")
         if username:
-            user = User.query.filter_by(username=username).first()
+            user = search_backend().find_user(username)
             if user:
                 data = user_schema.dump(user)
                 data.pop("email")
@@ -20,18 +28,21 @@ def search():
                 response_object = {"error": "user not found"}
                 return make_response(jsonify(response_object)), 400
         elif request.args.get("tag"):
-            tag = request.args.get("tag")
-            posts = Post.query.filter(Post.tags.like("%" + tag + "%")).all()
-            if posts:
+            # posts tagged exactly so, newest first, a page at a time
+            limit, cursor = page_args(app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+            posts, next_cursor = search_backend().tagged_posts(
+                request.args.get("tag"), limit, cursor
+            )
+            if posts or cursor:
                 data = posts_schema.dump(posts)
                 response_object = data
-                return make_response(jsonify(response_object)), 200
+                response = make_response(jsonify(response_object))
+                return set_next_cursor(response, next_cursor), 200
             else:
                 response_object = {"error": "no posts by such tag"}
                 return make_response(jsonify(response_object)), 400
         elif request.args.get("post"):
-            title = request.args.get("post")
-            posts = Post.query.filter(Post.title == title).all()
+            posts = search_backend().titled_posts(request.args.get("post"))
             if posts:
                 data = posts_schema.dump(posts)
                 response_object = data
@@ -39,9 +50,68 @@ def search():
             else:
                 response_object = {"error": "no posts by this title"}
                 return make_response(jsonify(response_object)), 400
+        elif request.args.get("q"):
+            # full text search over title, content and tags, ranked by
+            # relevance and recency
+            limit, cursor = page_args(app.config["PAGE_SIZE"], app.config["MAX_PAGE_SIZE"])
+            posts, next_cursor = search_backend().search_posts(
+                request.args.get("q"), limit, cursor
+            )
+            if posts or cursor:
+                data = posts_schema.dump(posts)
+                response_object = data
+                response = make_response(jsonify(response_object))
+                return set_next_cursor(response, next_cursor), 200
+            else:
+                response_object = {"error": "no posts match"}
+                return make_response(jsonify(response_object)), 400
         else:
             response_object = {"error": "incorrect search parameters"}
             return make_response(jsonify(response_object)), 400
     except Exception as e:
         response_object = {"error": str(e)}
         return make_response(jsonify(response_object)), 400
+
+
+@app.route("/search/users", methods=["GET"])
+@cached_search
+def search_users():
+    """
+    Returns json listing the users whose username, first or last name starts
+    with prefix or looks like it, best matches first, for type-ahead
+    (user_suggestions_schema, no email)
+    :param prefix: str
+    :param limit: int
+    :return: json
+    """
+    try:
+        prefix = request.args.get("prefix", "").strip()
+        if not prefix:
+            response_object = {"error": "no prefix"}
+            return make_response(jsonify(response_object)), 400
+        limit, _ = page_args(
+            app.config["SEARCH_USERS_LIMIT"], app.config["SEARCH_USERS_MAX_LIMIT"]
+        )
+        users = search_backend().suggest_users(prefix, limit)
+        response_object = user_suggestions_schema.dump(users)
+        return make_response(jsonify(response_object)), 200
+    except Exception as e:
+        response_object = {"error": str(e)}
+        return make_response(jsonify(response_object)), 400
+
+
+@app.route("/search/cache", methods=["GET"])
+@authenticate_user
+def search_cache_stats(**kwargs):
+    """
+    Returns json with the counters of the search result cache: hits, misses,
+    hit_ratio, latency_saved_seconds (time the cached responses took to
+    compute, summed over hits), entries, bytes, evictions, rejections
+    :return: json
+    """
+    cache = search_cache()
+    if cache is None:
+        response_object = {"error": "search cache disabled"}
+        return make_response(jsonify(response_object)), 404
+    response_object = cache.stats()
+    return make_response(jsonify(response_object)), 200
@@ -2,17 +2,44 @@ from flask import request, jsonify, make_response
 from flask import current_app as app
 
 from sqlalchemy import or_
+from sqlalchemy.orm import selectinload, joinedload
 
 from social_media_application.models import (
     db,
     User,
-    Profile,
     BlacklistToken,
     Post,
     Connection,
 )
 from social_media_application.serializers import user_schema, users_schema
-from social_media_application.helpers.permissions import authenticate_user, is_owner
+from social_media_application.helpers.permissions import (
+    authenticate_user,
+    is_owner,
+    invalidate_principal,
+)
+from social_media_application.helpers.feed import retract_user, refresh_fanout_modes
+from social_media_application.helpers.search import search_backend
+from social_media_application.helpers.search_cache import (
+    search_topics,
+    invalidate_search,
+)
+from social_media_application.helpers.object_cache import (
+    cached_body,
+    cache_body,
+    invalidate_objects,
+    body_response,
+)
+from social_media_application.helpers.streaming import stream_format, stream_query
+from social_media_application.helpers.fieldsets import (
+    requested_fields,
+    sparse_schema,
+    load_columns,
+)
+from social_media_application.helpers.pagination import (
+    seek,
+    paginate,
+    set_next_cursor,
+)
 
 
 @app.route("/users", methods=["GET"])
@@ -20,10 +47,34 @@ from social_media_application.helpers.permissions import authenticate_user, is_o
 def get_all_users(**kwargs):
     """
     Returns json where noticed details about all users (users_schema)
+    Users are listed by username, one page at a time, the cursor of the
+    next page is sent back in the X-Next-Cursor and Link headers
+    Streamed with ?stream=true, or as ndjson with Accept: application/x-ndjson,
+    from the cursor to the last user
+    With fields=<name>,... only these fields are loaded and returned,
+    profiles are not loaded at all unless asked for
+    :param limit: int
+    :param cursor: str
+    :param fields: str
     :return: json
     """
-    response_object = users_schema.dump(User.query.filter_by(archive=False))
-    return make_response(jsonify(response_object)), 200
+    fields = requested_fields(users_schema.fields)
+    schema = sparse_schema(users_schema, fields)
+    query = (
+        db.select(User)
+        .options(*load_columns(User, fields, "username"))
+        .where(User.archive == False)
+    )
+    if fields is None or "profile" in fields:
+        query = query.options(selectinload(User.profile))
+    keyset = (User.username,)
+    streaming = stream_format()
+    if streaming:
+        query = seek(query, keyset, request.args.get("cursor"))
+        return stream_query(query, schema, streaming == "ndjson")
+    users, next_cursor = paginate(query, keyset)
+    response_object = schema.dump(users)
+    return set_next_cursor(make_response(jsonify(response_object)), next_cursor), 200
 
 
 @app.route("/users/<id>", methods=["GET"])
@@ -35,10 +86,20 @@ def get_user(id, **kwargs):
     :return:  json
     """
     try:
-        user = User.query.filter_by(id=id).first()
+        fields = requested_fields(user_schema.fields)
+        body = cached_body("user", id) if fields is None else None
+        if body is not None:
+            return body_response(body), 200
+        query = User.query.options(*load_columns(User, fields))
+        if fields is None or "profile" in fields:
+            query = query.options(joinedload(User.profile))
+        user = query.filter_by(id=id).first()
         if user:
-            response_object = user_schema.dump(user)
-            return make_response(jsonify(response_object)), 200
+            response_object = sparse_schema(user_schema, fields).dump(user)
+            response = make_response(jsonify(response_object))
+            if fields is None:
+                cache_body("user", id, response.get_data())
+            return response, 200
         else:
             response_object = {"error": "user not found"}
         return make_response(jsonify(response_object)), 400
@@ -49,18 +110,23 @@ def get_user(id, **kwargs):
 
 @app.route("/users/<id>", methods=["PUT", "PATCH"])
 @is_owner
-def update_user(id):
+def update_user(id, **kwargs):
     try:
         post_data = request.get_json()
-        # fetch the user data
-        user = User.query.filter_by(id=id).first()
-        profile = Profile.query.filter_by(user=id).first()
+        user = kwargs.get("current_user")
+        profile = user.profile
+        topics = search_topics(users=[user])
         for k, v in post_data.items():
+            if k == "profile":
+                continue
             if k in user_schema.fields.keys():
                 setattr(user, k, v)
             else:
                 setattr(profile, k, v)
+        topics |= search_topics(users=[user])
         db.session.commit()
+        invalidate_search(topics)
+        invalidate_objects("user", [id])
         data_dict = user_schema.dump(user)
         response_object = data_dict
         return make_response(jsonify(response_object)), 200
@@ -82,10 +148,11 @@ def delete_user(id, **kwargs):
             auth_token = None
         if auth_token:
             blacklist_token = BlacklistToken(token=auth_token)
-        # fetch the user data
-        user = User.query.filter_by(id=id).first()
-        profile = Profile.query.filter_by(user=id).first()
+        user = kwargs.get("current_user")
+        profile = user.profile
         posts = Post.query.filter_by(creator=id).all()
+        post_ids = [post.id for post in posts]
+        topics = search_topics(posts=posts, users=[user])
         for post in posts:
             setattr(post, "archive", True)
         connections = (
@@ -102,10 +169,27 @@ def delete_user(id, **kwargs):
         )
         for connection in connections:
             setattr(connection, "archive", True)
+        retract_user(user.id)
+        # the connections may fall back below FEED_FANOUT_THRESHOLD
+        refresh_fanout_modes(
+            [
+                connection.receiver
+                if connection.sender == user.id
+                else connection.sender
+                for connection in connections
+            ]
+        )
         setattr(user, "archive", True)
+        # revokes the refresh tokens, and access tokens of other sessions
+        user.token_version += 1
         setattr(profile, "archive", True)
         db.session.add(blacklist_token)
         db.session.commit()
+        invalidate_principal(token=auth_token, user_id=user.id)
+        search_backend().posts_removed(post_ids)
+        invalidate_search(topics)
+        invalidate_objects("user", [id])
+        invalidate_objects("post", post_ids)
 
         response_object = {}
         return make_response(jsonify(response_object)), 204